@@ -211,8 +211,7 @@ for field in fieldReqs:
             Compute x,y coordinates in map projection; shift cell-center lat/lon 
             values to ULC values for use with matplotlib's pcolor() function.
             """
-            x, y = mOz(*np.meshgrid(conAUS.lons-0.5*conAUS.dLon, 
-                                    conAUS.lats+0.5*conAUS.dLat))
+            x, y = conAUS.getCellCornerXY(mOz)
             
             im = mOz.pcolor(x, y, fieldData, cmap=cMap)
             plt.clim(vmin=minVal, vmax=maxVal)
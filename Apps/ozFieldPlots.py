@@ -239,8 +239,7 @@ for field in fieldReqs:
             values to ULC values for use with matplotlib's pcolor() function.
             """
             startTime = time.time()
-            x, y = mOz(*np.meshgrid(conAUS.lons-0.5*conAUS.dLon, 
-                                    conAUS.lats+0.5*conAUS.dLat))            
+            x, y = conAUS.getCellCornerXY(mOz)
             meshGridTimes.append(time.time() - startTime)
 
             startTime = time.time()
@@ -61,10 +61,13 @@ rootID = 0
 """
 The .conf file supplied as the first command-line
 argument.  It contains a number of hard-wired parameter
-definitions that will all be pulled in as a dictionary.
+definitions that will all be pulled in as a dictionary,
+read on the root rank and broadcast to the others.
 """
-jobConfig = {}
-execfile(sys.argv[1], jobConfig)
+jobConfig = None
+if myRank == rootID:
+    jobConfig = aio.readJobConfig(sys.argv[1])
+jobConfig = myComm.bcast(jobConfig, root=rootID)
 
 """
 Check readability of input data directory tree.
@@ -159,16 +162,16 @@ else:
 Working from a list of SubRegion IDs, create a  List of 
 SubRegion class instances.
 """
-subRegions = []
+srNames = []
 for srID in subRegionIDs:
     """
     Reverse look-up from what is *meant* to be a nondegenerate
     dictionary (i.e., unique values, one for each key).
     """
     srInd = (conAUS.subRegionFlags.values()).index(srID)
-    srName = (conAUS.subRegionFlags.keys())[srInd]
-    subRegions.append(ar.SubRegion(conAUS, srID, RegionName=srName,
-                                   RegionType=srType))
+    srNames.append((conAUS.subRegionFlags.keys())[srInd])
+subRegions = ar.buildSubRegions(conAUS, subRegionIDs, RegionNames=srNames,
+                                RegionType=srType)
 
 """
 Safe mkdir for region type directory layer.
@@ -390,8 +393,7 @@ for field in myFieldReqs:
                 values to ULC values for use with matplotlib's pcolor() function.
                 """
                 startTime = time.time()
-                x, y = myBaseMap(*np.meshgrid(sReg.lons-0.5*sReg.dLon, 
-                                              sReg.lats+0.5*sReg.dLat))            
+                x, y = sReg.getCellCornerXY(myBaseMap)
                 meshGridTimes.append(time.time() - startTime)
 
                 startTime = time.time()
@@ -4,17 +4,31 @@ Parallel continental-scale field plotting app.
 Uses mpi4py.
 """
 
+import os
 import sys
 import time
 import math
+import itertools
+import multiprocessing
+from multiprocessing.pool import ThreadPool
 
 import numpy as np
 import numpy.ma as ma
+try:
+    import numexpr as ne
+except ImportError:
+    ne = None
+try:
+    from numba import njit
+except ImportError:
+    njit = None
 
 import dirTools as dt
 
 import awapIO as aio
 import awapRegion as ar
+import awapImage as aimg
+import mpiTools as mpit
 
 from mpi4py import MPI
 # added these two lines below because burnet was using
@@ -23,7 +37,18 @@ import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 from mpl_toolkits.basemap import Basemap
+try:
+    import pyproj
+except ImportError:
+    from mpl_toolkits.basemap import pyproj
+try:
+    import shapefile
+except ImportError:
+    from mpl_toolkits.basemap import shapefile
 from matplotlib import colors as cols
+from matplotlib import cm
+from matplotlib.collections import LineCollection
+from matplotlib import transforms as mtransforms
 from matplotlib import rc
 
 """
@@ -57,10 +82,13 @@ rootID = 0
 """
 The .conf file supplied as the first command-line
 argument.  It contains a number of hard-wired parameter
-definitions that will all be pulled in as a dictionary.
+definitions that will all be pulled in as a dictionary,
+read on the root rank and broadcast to the others.
 """
-jobConfig = {}
-execfile(sys.argv[1], jobConfig)
+jobConfig = None
+if myRank == rootID:
+    jobConfig = aio.readJobConfig(sys.argv[1])
+jobConfig = myComm.bcast(jobConfig, root=rootID)
 
 """
 Check readability of input data directory tree.
@@ -86,18 +114,44 @@ configuration.
 renormalisations = jobConfig['fieldTagsToRenormCoeffs']
 
 """
-Read plot parameters file into nested dictionary plotPars.  
-Used for all fields.
+Frame decoration switches from the job configuration.
 """
-plotPars = aio.readAWAP_PlotPars(jobConfig['plotParsFile'])
+showColorBar = jobConfig['DisplayColorBarOnFR']
+showRegionName = jobConfig['DisplayRegionNameOnFR']
+showRegionType = jobConfig['DisplayRegionTypeOnFR']
 
 """
-Set up Continental Region for Australia.  Used for all fields.
+Static inputs shared by every rank:  the plot parameters, the colour
+tables of the requested fields, and the Continental Region for
+Australia.  Read them once, on the root, and broadcast them, rather
+than have every rank hit the same files.
 """
-ozDict = aio.readAWAP_hdr(jobConfig['regionMask'])
-regName = jobConfig['parentRegionName']
-regType = jobConfig['parentRegionType']
-conAUS = ar.Region(ozDict, RegionName=regName, RegionType=regType)
+if myRank == rootID:
+    """
+    Read plot parameters file into nested dictionary plotPars.  
+    Used for all fields.
+    """
+    plotPars = aio.readAWAP_PlotPars(jobConfig['plotParsFile'])
+
+    """
+    Colour tables, keyed by field tag.
+    """
+    colourDicts = {}
+    for field in fieldReqs:
+        colourDicts[field] = aio.readAWAP_ColourTable(
+            jobConfig['colourTablePath'], field)
+
+    """
+    Set up Continental Region for Australia.  Used for all fields.
+    """
+    ozDict = aio.readAWAP_hdr(jobConfig['regionMask'])
+    regName = jobConfig['parentRegionName']
+    regType = jobConfig['parentRegionType']
+    conAUS = ar.Region(ozDict, RegionName=regName, RegionType=regType)
+    staticInputs = (plotPars, colourDicts, conAUS)
+else:
+    staticInputs = None
+plotPars, colourDicts, conAUS = myComm.bcast(staticInputs, root=rootID)
 
 """
 Set map projection parameters for Lambert conformal conic.
@@ -115,6 +169,500 @@ westDisp and northDisp to shift the domain to taste.
 westDisp = 7.
 northDisp = 2.
 
+"""
+Map set-up shared by every file of every field:  the Basemap, the AWAP
+CONAUS shapefile outlines, and the projected grid-cell corners.  All of
+these are invariant over the run, so build them once here; the plotting
+processes inherit them when the pool is forked.
+"""
+startTime = time.time()
+mOz = None
+if myRank == rootID:
+    """
+    Building the Basemap reads its coastline data; do that on the
+    root only.
+    """
+    mOz = Basemap(llcrnrlon=conAUS.minLon-westDisp, 
+                  llcrnrlat=conAUS.minLat,
+                  urcrnrlon=conAUS.maxLon, 
+                  urcrnrlat=conAUS.maxLat+northDisp,
+                  rsphere=(rEquat,rPolar), anchor='C', resolution='f',
+                  area_thresh=1000.,projection='lcc',
+                  lat_1=trueLat1,lat_2=trueLat2,lat_0=centerLat,
+                  lon_0=centerLon)
+mOz = myComm.bcast(mOz, root=rootID)
+baseMapTime = time.time() - startTime
+
+"""
+Map projection used to place data and outlines on mOz.  Calling PROJ
+directly on whole arrays avoids Basemap's per-call overhead; Basemap
+puts the lower left corner of the map at the origin, so shift by the
+projected lower left corner to land in mOz coordinates.
+"""
+ozProj = pyproj.Proj(proj=projType, lat_1=trueLat1, lat_2=trueLat2,
+                     lat_0=centerLat, lon_0=centerLon, a=rEquat, b=rPolar)
+ozProjX0, ozProjY0 = ozProj(mOz.llcrnrlon, mOz.llcrnrlat)
+
+def projectLonLat(Lons, Lats):
+    """
+    Project longitude/latitude arrays to mOz map coordinates.
+
+    Parameters
+    ----------
+    Lons, Lats : array_like
+        Longitudes and latitudes in degrees; broadcast against each other.
+
+    Returns
+    -------
+    tuple of ndarrays
+        x, y map projection coordinates.
+    """
+    lons, lats = np.broadcast_arrays(np.asarray(Lons, dtype=np.float64),
+                                     np.asarray(Lats, dtype=np.float64))
+    x, y = ozProj(np.ascontiguousarray(lons), np.ascontiguousarray(lats))
+    return np.asarray(x) - ozProjX0, np.asarray(y) - ozProjY0
+
+"""
+Compute x,y coordinates in map projection; shift cell-center lat/lon 
+values to ULC values, which bound the cells drawn on the map.  The
+1D longitudes and latitudes broadcast to the 2D grid in a single
+projection call.
+"""
+startTime = time.time()
+x, y = projectLonLat((conAUS.lons-0.5*conAUS.dLon)[np.newaxis,:],
+                     (conAUS.lats+0.5*conAUS.dLat)[:,np.newaxis])
+
+"""
+The AWAP grid is regular in lat/lon but not in LCC map coordinates, so
+imshow() cannot place it directly.  Instead, lay a regular raster over
+the map and find, once, the grid cell under each raster pixel centre
+(the cell pcolormesh() would have drawn there).  Pixels outside the
+grid point past the end of the field, at an always-masked sentinel.
+Each frame is then a single take() onto the raster.
+"""
+rasterCols = 2 * x.shape[1]
+rasterRows = int(round(rasterCols * (mOz.urcrnry - mOz.llcrnry) /
+                       (mOz.urcrnrx - mOz.llcrnrx)))
+dxRaster = (mOz.urcrnrx - mOz.llcrnrx) / rasterCols
+dyRaster = (mOz.urcrnry - mOz.llcrnry) / rasterRows
+xRaster = mOz.llcrnrx + dxRaster * (np.arange(rasterCols) + 0.5)
+yRaster = mOz.llcrnry + dyRaster * (np.arange(rasterRows) + 0.5)
+xRaster, yRaster = np.broadcast_arrays(xRaster[np.newaxis,:],
+                                       yRaster[:,np.newaxis])
+lonRaster, latRaster = ozProj(xRaster + ozProjX0, yRaster + ozProjY0,
+                              inverse=True)
+lonCorners = conAUS.lons - 0.5*conAUS.dLon
+latCorners = conAUS.lats + 0.5*conAUS.dLat
+iCol = np.floor((np.asarray(lonRaster) - lonCorners[0]) /
+                (lonCorners[1] - lonCorners[0])).astype(np.intp)
+iRow = np.floor((np.asarray(latRaster) - latCorners[0]) /
+                (latCorners[1] - latCorners[0])).astype(np.intp)
+inGrid = ((iCol >= 0) & (iCol < len(lonCorners) - 1) &
+          (iRow >= 0) & (iRow < len(latCorners) - 1))
+gridSize = len(latCorners) * len(lonCorners)
+rasterIndex = np.where(inGrid, iRow * len(lonCorners) + iCol, gridSize)
+del xRaster, yRaster, lonRaster, latRaster, iCol, iRow, inGrid
+meshGridTime = time.time() - startTime
+
+def readShapeOutlines(ShapeFile):
+    """
+    Read shapefile outlines and project them to mOz map coordinates.
+
+    Parameters
+    ----------
+    ShapeFile : string
+        Shapefile path, without extension, in lon/lat coordinates.
+
+    Returns
+    -------
+    list of ndarrays
+        One (N, 2) array of map coordinates for each shape part.
+    """
+    sf = shapefile.Reader(ShapeFile)
+    lonLats = []
+    parts = []
+    for shape in sf.shapes():
+        numPoints = len(shape.points)
+        if numPoints == 0:
+            continue
+        bounds = list(shape.parts) + [numPoints]
+        for iPart in range(len(bounds) - 1):
+            parts.append(bounds[iPart+1] - bounds[iPart])
+        lonLats.extend(shape.points)
+    if len(lonLats) == 0:
+        return []
+    lonLats = np.asarray(lonLats, dtype=np.float64)[:,:2]
+    """
+    Project every vertex in one call, then split back into parts.
+    """
+    xy = np.column_stack(projectLonLat(lonLats[:,0], lonLats[:,1]))
+    return np.split(xy, np.cumsum(parts)[:-1])
+
+"""
+Read in the AWAP CONAUS shapefile outlines, projected once on the root
+and broadcast; each figure adds them as a LineCollection.
+"""
+startTime = time.time()
+ozOutlines = None
+if myRank == rootID:
+    ozOutlines = readShapeOutlines(jobConfig['shapeFile'])
+ozOutlines = myComm.bcast(ozOutlines, root=rootID)
+shapeFileTime = time.time() - startTime
+
+"""
+Per-process plotting state.  Each plotting process builds the colour
+maps once, on first use, and reuses them for every file it renders.
+Likewise, the figure--axes, shapefile outlines, image, colour bar,
+and labels--is built once per process; each frame merely swaps in new
+field data and label text.
+"""
+cMaps = {}
+frame = None
+
+"""
+Per-process file reader threads, started on first use.  File reads
+release the GIL, so they overlap rendering of the previous file.
+"""
+readPool = None
+numReadThreads = 2
+filesPerBatch = 8
+
+"""
+Output image settings.  Frames are rendered once at 300 dpi; thumbnails
+are downsampled from that raster to fit 1.38 x 1.14 inches at 150 dpi.
+"""
+thumbnailSize = (207, 171)
+jpegQuality = 85
+
+def buildFrame():
+    """
+    Build the persistent figure used for every frame in this process.
+
+    Returns
+    -------
+    dict
+        Figure, axes, image, colour bar, and label artists.
+    """
+    """
+    Figure set-up:  Set up figure so that no viewport 
+    frame nor axes are visible.
+    """
+    fig = plt.figure(frameon=False)
+    ax = plt.axes()
+    fig.patch.set_visible(False)
+    ax.patch.set_visible(False)
+    ax.axis('off')
+    fig.set_size_inches(5.25,4.5)
+    fig.set_dpi(300)
+
+    """
+    Draw the shapefile outlines.
+    """
+    ax.add_collection(LineCollection(ozOutlines, linewidths=0.5,
+                                     colors='k', antialiaseds=1))
+
+    """
+    The image starts out fully masked; frames supply the raster as
+    colour table indices, so it maps them straight through its lookup
+    table without normalisation.
+    """
+    im = mOz.imshow(ma.masked_all(rasterIndex.shape, dtype=np.uint8), ax=ax,
+                    norm=cols.NoNorm(), interpolation='nearest')
+
+    """
+    The colour bar shows field values, so it follows a separate
+    mappable carrying the field's continuous colour map and range.
+    """
+    cbarMappable = cm.ScalarMappable(norm=cols.Normalize(vmin=0., vmax=1.))
+    cbarMappable.set_array(np.array([]))
+
+    """
+    Add in color bar (if desired).
+    """
+    cbar = None
+    if showColorBar:
+        cbar = mOz.colorbar(cbarMappable,"right", size="3%", pad="2%", ax=ax)
+        cbar.ax.tick_params(axis='y', direction='out', labelsize=8)
+
+    """
+    Add Labels for field/units, time period, region name.
+    """
+    """
+    Date label.
+    """
+    xDate = x.max()
+    yDate = y.min()
+    dateText = ax.text(xDate, yDate, '', ha='right', va='top', 
+                       family='monospace', fontsize=8)
+    """
+    Title string
+    """
+    xTitle = x.min()
+    yTitle = y.max()
+    titleText = ax.text(xTitle, yTitle, '', ha='left', va='bottom', fontsize=8)
+    
+    """
+    Region Name
+    """
+    regText = None
+    if showRegionName:
+        xRegLabel = x.min()
+        yRegLabel = y.min()
+        if showRegionType:
+            regLabel = conAUS.regionType + ':  ' + conAUS.name 
+        else:
+            regLabel = conAUS.name
+
+        regText = ax.text(xRegLabel, yRegLabel, regLabel, ha='left', va='top',
+                          fontsize=8)
+
+    return {'fig': fig, 'ax': ax, 'im': im, 'cbar': cbar,
+            'cbarMappable': cbarMappable,
+            'dateText': dateText, 'titleText': titleText, 'regText': regText,
+            'cmapName': None, 'fullBBox': None, 'mapBBox': None}
+
+if njit is not None:
+    @njit(fastmath=True)
+    def quantiseKernel(Data, A, B, Top, Out):
+        """
+        Compiled quantise loop:  Out = floor(A * Data + B), clipped to
+        [0, Top], in one pass with no temporaries.  Serial, as the
+        plotting pool already occupies this rank's cores.
+        """
+        for i in range(Data.shape[0]):
+            for j in range(Data.shape[1]):
+                v = A * Data[i,j] + B
+                if v < 0.:
+                    v = 0.
+                elif v > Top:
+                    v = Top
+                Out[i,j] = np.uint8(v)
+
+def quantiseField(Field, MinVal, MaxVal, NumLevels, Coeff=1.0):
+    """
+    Map (renormalised) field values to colour table indices.
+
+    Values, multiplied by Coeff, are binned into NumLevels equal
+    intervals over [MinVal, MaxVal] exactly as matplotlib's Normalize
+    and Colormap would bin them; values outside the range take the end
+    colours.  Renormalisation, shift, scale, and clip are fused into a
+    single affine map and clip, evaluated in one pass by a Numba
+    kernel or numexpr if either is available.
+
+    Parameters
+    ----------
+    Field : masked array
+        Field values.
+    MinVal, MaxVal : float
+        Colour bar range, in renormalised units.
+    NumLevels : int
+        Number of colour table entries (at most 256).
+    Coeff : float
+        Multiplicative renormalisation coefficient.
+
+    Returns
+    -------
+    masked array of uint8
+        Colour table indices, masked where Field is.
+    """
+    data = ma.getdata(Field)
+    if MaxVal > MinVal:
+        """
+        Level = floor(a * data + b), clipped to [0, NumLevels-1].  The
+        clip makes every value non-negative before the cast to uint8,
+        and truncation of non-negative values is floor.
+        """
+        a = np.float32(Coeff * NumLevels / float(MaxVal - MinVal))
+        b = np.float32(-MinVal * NumLevels / float(MaxVal - MinVal))
+        top = np.float32(NumLevels - 1)
+        if njit is not None:
+            levels = np.empty(data.shape, dtype=np.uint8)
+            quantiseKernel(data, a, b, top, levels)
+        elif ne is not None:
+            levels = ne.evaluate('where(a*data + b < 0, 0, '
+                                 'where(a*data + b > top, top, a*data + b))')
+            levels = levels.astype(np.uint8)
+        else:
+            levels = np.multiply(data, a, dtype=np.float32)
+            levels += b
+            np.clip(levels, 0, top, out=levels)
+            levels = levels.astype(np.uint8)
+    else:
+        levels = np.zeros(data.shape, dtype=np.uint8)
+    return ma.array(levels, mask=ma.getmaskarray(Field))
+
+def readField(fn, ctx):
+    """
+    Read in one masked field file.  Renormalisation is applied as the
+    field is quantised for plotting (see quantiseField()).
+
+    Parameters
+    ----------
+    fn : string
+        Filename stem of the field data file.
+    ctx : dict
+        Per-field plotting context (see renderOne()).
+
+    Returns
+    -------
+    tuple
+        The masked field and its read time.
+    """
+    fieldDataFile = ctx['inputDir'] + '/' + fn + aio.headerFilenameExt
+    fieldDict = aio.readAWAP_hdr(fieldDataFile)
+    startTime = time.time()
+    fieldData = aio.readAWAP_flt(fieldDict)
+    readTime = time.time() - startTime
+
+    return fieldData, readTime
+
+def renderOne(fn, fieldData, ctx):
+    """
+    Save the thumbnail and full-res images of one field file.
+
+    Parameters
+    ----------
+    fn : string
+        Filename stem of the field data file.
+    fieldData : masked array
+        The field, as returned by readField().
+    ctx : dict
+        Per-field plotting context:  input/output directories, colour
+        table, colourbar range, renormalisation coefficient, and frame
+        labels.
+
+    Returns
+    -------
+    dict
+        Profile timings for this file, keyed by operation.
+    """
+    global frame
+    times = {}
+
+    if frame is None:
+        frame = buildFrame()
+    fig = frame['fig']
+    im = frame['im']
+    cmapName = ctx['cmapName']
+    minVal = ctx['minVal']
+    maxVal = ctx['maxVal']
+
+    """
+    Switch colour map, colour bar range, and title when the field changes.
+    """
+    if frame['cmapName'] != cmapName:
+        if cmapName not in cMaps:
+            cMap = cols.LinearSegmentedColormap(cmapName, ctx['colourDict'])
+            lut = cols.ListedColormap(cMap(np.arange(cMap.N)))
+            cMaps[cmapName] = (cMap, lut)
+        cMap, lut = cMaps[cmapName]
+        im.set_cmap(lut)
+        frame['cbarMappable'].set_cmap(cMap)
+        frame['cbarMappable'].set_clim(vmin=minVal, vmax=maxVal)
+        if frame['cbar'] is not None:
+            frame['cbar'].set_label(ctx['cbarCaption'], size=8)
+        frame['titleText'].set_text(ctx['plotTitle'])
+        frame['cmapName'] = cmapName
+        frame['fullBBox'] = None
+
+    """
+    Swap this file's data, as colour table indices, into the image.
+    """
+    startTime = time.time()
+    levels = quantiseField(fieldData, minVal, maxVal, im.get_cmap().N,
+                           Coeff=ctx['renormCoeff'])
+    flatLevels = np.zeros(gridSize + 1, dtype=np.uint8)
+    flatLevels[:-1] = ma.getdata(levels).ravel()
+    flatMask = np.ones(gridSize + 1, dtype=bool)
+    flatMask[:-1] = ma.getmaskarray(levels).ravel()
+    im.set_data(ma.array(flatLevels.take(rasterIndex),
+                         mask=flatMask.take(rasterIndex)))
+    times['pColor'] = time.time() - startTime
+    frame['dateText'].set_text(aio.getDateRange(fn))
+
+    """
+    Frame geometry depends only on the field's labels, so lay out the
+    figure to fit them once per field rather than on every draw.
+    """
+    startTime = time.time()
+    if frame['fullBBox'] is None:
+        fig.tight_layout()
+
+    """
+    Render the frame once, at full resolution, into the Agg buffer.
+    """
+    fig.canvas.draw()
+    rgba = aimg.getCanvasRGBA(fig)
+
+    """
+    Crop boxes, in pixels:  the figure's tight bounding box (padded by
+    0.1 inch) for the full plot, and the map axes (padded by 0.02 inch)
+    for the thumbnail.  Like the layout, they are found once per field.
+    """
+    if frame['fullBBox'] is None:
+        renderer = fig.canvas.get_renderer()
+        tightBBox = fig.get_tightbbox(renderer).padded(0.1)
+        frame['fullBBox'] = mtransforms.Bbox(tightBBox.get_points() * fig.dpi)
+        frame['mapBBox'] = frame['ax'].get_window_extent(renderer).padded(
+            0.02 * fig.dpi)
+
+    """
+    Save full plot as a .jpeg file.
+    """
+    frFile = ctx['fullImDir'] + '/' + fn + '.jpeg'
+    fullRGBA = aimg.cropToBBox(rgba, frame['fullBBox'])
+    aimg.saveJPEG(fullRGBA, frFile, Quality=jpegQuality)
+    times['saveFullRes'] = time.time() - startTime
+
+    """
+    Save thumbnail as a .jpeg file.  The thumbnail is the bare map, so
+    crop the already-rasterised map axes and downsample it.
+    """
+    tnFile = ctx['thumbnailImDir'] + '/' + fn + '.jpeg'
+    startTime = time.time()
+    tnRGB = aimg.makeThumbnail(aimg.cropToBBox(rgba, frame['mapBBox']),
+                               thumbnailSize)
+    aimg.saveJPEG(tnRGB, tnFile, Quality=jpegQuality)
+    times['saveThumbnail'] = time.time() - startTime
+
+    return times
+
+def renderBatch(Task):
+    """
+    Render a batch of files of one field; used with Pool.imap.
+
+    Reads are prefetched by this process's reader threads, so the next
+    files are read while the current one is rasterised and encoded.
+
+    Parameters
+    ----------
+    Task : tuple
+        (fns, ctx):  filename stems and their per-field plotting context.
+
+    Returns
+    -------
+    list of dicts
+        Profile timings for each file, keyed by operation.
+    """
+    global readPool
+    fns, ctx = Task
+    if readPool is None:
+        readPool = ThreadPool(processes=numReadThreads)
+    reads = readPool.imap(readTask, [(fn, ctx) for fn in fns])
+    batchTimes = []
+    for fn in fns:
+        fieldData, readTime = next(reads)
+        times = renderOne(fn, fieldData, ctx)
+        times['readFile'] = readTime
+        batchTimes.append(times)
+    return batchTimes
+
+def readTask(Task):
+    """
+    Unpack an (fn, ctx) task tuple for readField(); used with ThreadPool.imap.
+    """
+    return readField(*Task)
+
 
 """
 Create (safely) the directory tree for output images.  Do this on the root
@@ -151,252 +699,156 @@ if myRank == rootID:
 myComm.Barrier()
 
 """
-Domain decomposition over field requests.  Card-deal
-them so that the maximum load imbalance is one field.
+Domain decomposition over individual files.  The root lists every
+(field, sampling interval, file) task and broadcasts the list; each
+rank card-deals itself every numPEs-th task, so the maximum load
+imbalance is one file whatever the number of fields.
 """
-numFields = len(fieldReqs)
-quotient = numFields / numPEs
-remainder = numFields % numPEs
-if remainder == 0:
-    myStart = myRank * quotient
-    myStop = myStart + quotient
-    myFieldReqs = fieldReqs[myStart:myStop]
-else:
-    print myName,':: Number of requested fields must be an integral number of numPEs.'
+allTasks = None
+if myRank == rootID:
+    allTasks = []
+    for field in fieldReqs:
+        """
+        Is this field's input directory valid?
+        """
+        fieldName = jobConfig['fieldTagsToDirName'][field]
+        inputDir = jobConfig['inputDataRoot'] + '/' + fieldName
+        if not dt.isReadableDir(inputDir):
+            print myName,':: FATAL--Directory',inputDir,' is invalid.'
+            allTasks = None
+            break
+
+        """
+        Retrieve list of all of the filename stems (i.e., minus filetype
+        extension) in inputDir.
+        """
+        fieldDataFiles = aio.getFileList(inputDir)
+
+        for ts in timeSamplingIntervals:
+            """
+            Filter list of filename stems to retrieve files for this time
+            sampling strategy only.
+            """
+            allFiles = aio.filterBySamplingInterval(fieldDataFiles, ts)
+            if aio.isPercentileRankField(field):
+                sampFiles = [x for x in allFiles if aio.isPercentileRankFile(x)]
+            else:
+                sampFiles = [x for x in allFiles if not aio.isPercentileRankFile(x)]
+            allTasks.extend([(field, ts, fn) for fn in sampFiles])
+
+allTasks = myComm.bcast(allTasks, root=rootID)
+if allTasks is None:
     sys.exit()
+myTasks = allTasks[myRank::numPEs]
 
 """
-Loop over requested fields list fieldReqs[:]
+Size of this rank's pool of plotting processes.  By default, share the
+node's cores evenly among the MPI ranks; OMP_NUM_THREADS overrides this.
+"""
+numPlotProcs = int(os.environ.get('OMP_NUM_THREADS',
+                                  multiprocessing.cpu_count() // numPEs))
+numPlotProcs = max(1, numPlotProcs)
+plotPool = multiprocessing.Pool(processes=numPlotProcs)
+
+"""
+Group this rank's tasks by (field, sampling interval), and batch the
+files of each group for the plotting pool.
 """
 readFileTimes = []
-baseMapTimes = []
-meshGridTimes = []
-shapeFileTimes = []
+baseMapTimes = [baseMapTime]
+meshGridTimes = [meshGridTime]
+shapeFileTimes = [shapeFileTime]
 pColorTimes = []
 saveFullResFileTimes = []
 saveThumbnailFileTimes = []
-noBackground = True
 
-for field in myFieldReqs:
+fieldDirNames = jobConfig['fieldTagsToDirName']
+inputDataRoot = jobConfig['inputDataRoot']
+outputImageRoot = jobConfig['outputImageRoot']
+
+batches = []
+for (field, ts), group in itertools.groupby(myTasks, lambda task: task[:2]):
+    sampFiles = [fn for (f, t, fn) in group]
+
     """
     Set data input directory and image output directories.
     """
-    fieldName = jobConfig['fieldTagsToDirName'][field]
-    inputDir = jobConfig['inputDataRoot'] + '/' + fieldName
+    fieldName = fieldDirNames[field]
+    inputDir = inputDataRoot + '/' + fieldName
+    outputDir = outputImageRoot + '/' + fieldName
+    thumbnailImDir = outputDir + '/Thumbnail' 
+    fullImDir = outputDir + '/Full' 
+
     """
-    Is inputDir a valid directory?
+    Multiplicative renormalisation coefficient for this field (if any).
     """
-    if not dt.isReadableDir(inputDir):
-        print myName,':: FATAL--Directory',inputDir,' is invalid.'
-        sys.exit()
+    renormCoeff = float(renormalisations.get(field, 1.0))
 
     """
-    Set thumbnail- and full-res image directories for this field.
+    Colour table for monthly files.  The colour map itself is built
+    by the plotting processes.
     """
-    outputDir = jobConfig['outputImageRoot'] + '/' + fieldName
-    thumbnailImDir = outputDir + '/Thumbnail' 
-    fullImDir = outputDir + '/Full' 
-
+    colourDict = colourDicts[field]
     """
-    Retrieve list of all of the filename stems (i.e., minus filetype extension) 
-    in fieldDataDir.
+    Colourbar range settings.
     """
-    fieldDataFiles = aio.getFileList(inputDir)
+    fieldPlotPars = plotPars[field]
+    minVal = fieldPlotPars['minVal'] * renormCoeff
+    maxVal = fieldPlotPars['maxVal'] * renormCoeff
 
     """
-    Iterate over sampling intervals:
+    Frame labels.  If no colour bar, append units to title.
     """
-    for ts in timeSamplingIntervals:
-        """
-        Filter list of filename stems to retrieve files for this time
-        sampling strategy only.
-        """
-        allFiles = aio.filterBySamplingInterval(fieldDataFiles, ts)
-        if aio.isPercentileRankField(field):
-            sampFiles = [x for x in allFiles if aio.isPercentileRankFile(x)]
-        else:
-            sampFiles = [x for x in allFiles if not aio.isPercentileRankFile(x)]
-
-        """
-        Create colourMap for monthly files.
-        """
-        cmapName = field + 'Scale'
-        colourDict = aio.readAWAP_ColourTable(jobConfig['colourTablePath'],
-                                              field)
-        cMap = cols.LinearSegmentedColormap(cmapName, colourDict)
-        """
-        Colourbar range settings.
-        """
-        minVal = plotPars[field]['minVal']
-        maxVal = plotPars[field]['maxVal']
-
-        if field in renormalisations.keys():
-            """
-            Apply multiplicative renormalisation.
-            """
-            minVal *= renormalisations[field]
-            maxVal *= renormalisations[field]
-         
-        """
-        Loop over monthly aggregate files.
-        """
-        for fn in sampFiles:
-            """
-            Read in masked field.
-            """
-            fieldDataFile = inputDir + '/' + fn + aio.headerFilenameExt
-            fieldDict = aio.readAWAP_hdr(fieldDataFile)
-            startTime = time.time()
-            fieldData = aio.readAWAP_flt(fieldDict)
-            readFileTimes.append(time.time() - startTime)
-            
-            """
-            Renormalise field if neccesary.
-            """
-            if field in renormalisations.keys():
-                """
-                Apply multiplicative renormalisation.
-                """
-                fieldData *= renormalisations[field]
-                    
-            """
-            Figure set-up:  Set up figure so that no viewport 
-            frame nor axes are visible.
-            """
-            fig = plt.figure(frameon=False, tight_layout=True)
-            ax = plt.axes()
-            fig.patch.set_visible(False)
-            ax.patch.set_visible(False)
-            ax.axis('off')
-
-            startTime = time.time()
-            if noBackground:
-                mOz = Basemap(llcrnrlon=conAUS.minLon-westDisp, 
-                              llcrnrlat=conAUS.minLat,
-                              urcrnrlon=conAUS.maxLon, 
-                              urcrnrlat=conAUS.maxLat+northDisp,
-                              rsphere=(rEquat,rPolar), anchor='C', resolution='f',
-                              area_thresh=1000.,projection='lcc',
-                              lat_1=trueLat1,lat_2=trueLat2,lat_0=centerLat,
-                              lon_0=centerLon)
-
-                noBackground = False
-                
-            baseMapTimes.append(time.time() - startTime)
-            
-            """
-            Read in the AWAP CONAUS shapefile information.
-            """
-            startTime = time.time()
-            mOzShapes = mOz.readshapefile(jobConfig['shapeFile'], 
-                                          'scalerank', drawbounds=True)
-            shapeFileTimes.append(time.time() - startTime)
-            """
-            Compute x,y coordinates in map projection; shift cell-center lat/lon 
-            values to ULC values for use with matplotlib's pcolor() function.
-            """
-            startTime = time.time()
-            x, y = mOz(*np.meshgrid(conAUS.lons-0.5*conAUS.dLon, 
-                                    conAUS.lats+0.5*conAUS.dLat))            
-            meshGridTimes.append(time.time() - startTime)
-
-            startTime = time.time()
-            im = mOz.pcolormesh(x, y, fieldData, cmap=cMap)
-            pColorTimes.append(time.time() - startTime)
-            plt.clim(vmin=minVal, vmax=maxVal)
-            """
-            Save thumbnail as a .jpeg file.
-            """
-            tnFile = thumbnailImDir + '/' + fn + '.jpeg'
-            tnFig = plt.gcf()
-            tnFig.set_size_inches(1.38,1.14)
-            startTime = time.time()
-            plt.savefig(tnFile, bbox_inches='tight', pad_inches=0.02, dpi=150)
-            saveThumbnailFileTimes.append(time.time() - startTime)
-            tnFig.set_size_inches(5.25,4.5)
-
-            """
-            Add in color bar (if desired).
-            """
-            if jobConfig['DisplayColorBarOnFR']:
-                cbar = mOz.colorbar(im,"right", size="3%", pad="2%")
-                cbar.ax.tick_params(axis='y', direction='out', labelsize=8)
-                cbar.set_label(plotPars[field]['cbarCaption'], size=8)
-
-            """
-            Add Labels for field/units, time period, region name.
-            """
-            xRange = x.max() - x.min()
-            yRange = y.max() - y.min()
-            """
-            Date label.
-            """
-            plotDateRange = aio.getDateRange(fn)
-            xDate = x.max()
-            yDate = y.min()
-            plt.text(xDate, yDate, plotDateRange, ha='right', va='top', 
-                     family='monospace', fontsize=8)
-            """
-            Title string
-            """
-            plotTitle = plotPars[field]['plotTitle']
-            """
-            If no colour bar, append units to title.
-            """
-            if not jobConfig['DisplayColorBarOnFR']:
-                plotTitle += ' ' + plotPars[field]['cbarCaption']
-
-            xTitle = x.min()
-            yTitle = y.max()
-            plt.text(xTitle, yTitle, plotTitle, ha='left', va='bottom', fontsize=8)
-            
-            """
-            Region Name
-            """
-            if jobConfig['DisplayRegionNameOnFR']:
-                xRegLabel = x.min()
-                yRegLabel = y.min()
-                if jobConfig['DisplayRegionTypeOnFR']:
-                    regLabel = conAUS.regionType + ':  ' + conAUS.name 
-                else:
-                    regLabel = conAUS.name
-
-                plt.text(xRegLabel, yRegLabel, regLabel, ha='left', va='top', fontsize=8)
-
-            """
-            Save full plot as a .jpeg file.
-            """
-            frFile = fullImDir + '/' + fn + '.jpeg'
-            startTime = time.time()
-            plt.savefig(frFile, bbox_inches='tight', pad_inches=0.1, dpi=300)
-            saveFullResFileTimes.append(time.time() - startTime)
-            plt.close()
-
-
-"""
-Print out the profile:
-"""
-print myName,':: myRank = ',myRank,':: Total Run TIme = ',time.time() - totalStartTime,' s.'
-avgRFTime = sum(readFileTimes) / float(len(readFileTimes))
-print myName,':: myRank = ',myRank,':: Total Read File Time = ',sum(readFileTimes),' s.'
-print myName,':: myRank = ',myRank,':: Number of Read File Operations = ',len(readFileTimes),' with time/op of ',avgRFTime,' s.'
-print myName,':: myRank = ',myRank,':: Total BaseMap TIme = ',sum(baseMapTimes),' s.'
-avgBMTime = sum(baseMapTimes) / float(len(baseMapTimes))
-print myName,':: myRank = ',myRank,':: Number of BaseMap Operations = ',len(baseMapTimes),' with time/op of ',avgBMTime,' s.'
-print myName,':: myRank = ',myRank,':: Total shapeFile read onto basemap Time = ',sum(shapeFileTimes),' s.'
-avgShFTime = sum(shapeFileTimes) / float(len(shapeFileTimes))
-print myName,':: myRank = ',myRank,':: Number of shapeFile Operations = ',len(shapeFileTimes),' with time/op of ',avgShFTime,' s.'
-print myName,':: myRank = ',myRank,':: Total np.meshgrid TIme = ',sum(meshGridTimes),' s.'
-avgMGTime = sum(meshGridTimes) / float(len(meshGridTimes))
-print myName,':: myRank = ',myRank,':: Number of meshgrid Operations = ',len(meshGridTimes),' with time/op of ',avgMGTime,' s.'
-print myName,':: myRank = ',myRank,':: Total bmap.pcolormesh() Times = ',sum(pColorTimes),' s.'
-avgPCTime = sum(pColorTimes) / float(len(pColorTimes))
-print myName,':: myRank = ',myRank,':: Number of bmap.pcolormesh() Operations = ',len(pColorTimes),' with time/op of ',avgPCTime,' s.'
-print myName,':: myRank = ',myRank,':: Total save thumbnail image file time = ',sum(saveThumbnailFileTimes),' s.'
-avgSTnFTime = sum(saveThumbnailFileTimes) / float(len(saveThumbnailFileTimes))
-print myName,':: myRank = ',myRank,':: Number of saveFile Operations = ',len(saveThumbnailFileTimes),' with time/op of ',avgSTnFTime,' s.'
-print myName,':: myRank = ',myRank,':: Total save full-res image file time = ',sum(saveFullResFileTimes),' s.'
-avgSFRFTime = sum(saveFullResFileTimes) / float(len(saveFullResFileTimes))
-print myName,':: myRank = ',myRank,':: Number of saveFile Operations = ',len(saveFullResFileTimes),' with time/op of ',avgSFRFTime,' s.'
-sys.stdout.flush()
+    cbarCaption = fieldPlotPars['cbarCaption']
+    plotTitle = fieldPlotPars['plotTitle']
+    if not showColorBar:
+        plotTitle += ' ' + cbarCaption
 
+    """
+    Everything the plotting processes need to render this field.
+    """
+    ctx = {'field': field,
+           'inputDir': inputDir,
+           'thumbnailImDir': thumbnailImDir,
+           'fullImDir': fullImDir,
+           'cmapName': field + 'Scale',
+           'colourDict': colourDict,
+           'minVal': minVal,
+           'maxVal': maxVal,
+           'renormCoeff': renormCoeff,
+           'plotTitle': plotTitle,
+           'cbarCaption': cbarCaption}
+
+    batches.extend([(sampFiles[i:i+filesPerBatch], ctx)
+                    for i in range(0, len(sampFiles), filesPerBatch)])
+
+"""
+Farm the batches of monthly aggregate files out to the plotting pool.
+"""
+for batchTimes in plotPool.imap_unordered(renderBatch, batches):
+    for times in batchTimes:
+        readFileTimes.append(times['readFile'])
+        pColorTimes.append(times['pColor'])
+        saveThumbnailFileTimes.append(times['saveThumbnail'])
+        saveFullResFileTimes.append(times['saveFullRes'])
+
+plotPool.close()
+plotPool.join()
+
+
+"""
+Print out the profile, summed over all ranks, on the root:
+"""
+runTimes = [time.time() - totalStartTime]
+profile = [('Run', runTimes),
+           ('Read File', readFileTimes),
+           ('BaseMap', baseMapTimes),
+           ('shapeFile read and projection', shapeFileTimes),
+           ('Grid projection and raster index', meshGridTimes),
+           ('image set_data()', pColorTimes),
+           ('save thumbnail image file', saveThumbnailFileTimes),
+           ('save full-res image file', saveFullResFileTimes)]
+profileSummary = mpit.reduceProfile(myComm, profile, Root=rootID)
+if myRank == rootID:
+    mpit.printProfile(myName, profileSummary, numPEs)
+    sys.stdout.flush()
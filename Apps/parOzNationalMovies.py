@@ -8,6 +8,8 @@ Uses ffmpeg version >= 2 (so that input globbing is available).
 import sys
 import subprocess
 import time
+import multiprocessing
+from multiprocessing.pool import ThreadPool
 
 from mpi4py import MPI
 
@@ -32,10 +34,13 @@ rootID = 0
 """
 The .conf file supplied as the first command-line
 argument.  It contains a number of hard-wired parameter
-definitions that will all be pulled in as a dictionary.
+definitions that will all be pulled in as a dictionary,
+read on the root rank and broadcast to the others.
 """
-jobConfig = {}
-execfile(sys.argv[1], jobConfig)
+jobConfig = None
+if myRank == rootID:
+    jobConfig = aio.readJobConfig(sys.argv[1])
+jobConfig = myComm.bcast(jobConfig, root=rootID)
 
 """
 Check readability of input image directory tree.
@@ -86,6 +91,16 @@ else:
     print myName,':: Number of requested fields must be an integral number of numPEs.'
     sys.exit()
 
+"""
+Pool for this rank's ffmpeg jobs.  Each pool thread runs one ffmpeg
+process and waits on it, so at most numMovieJobs encodes--this rank's
+share of the node's cores--run at once.
+"""
+numMovieJobs = max(1, min(multiprocessing.cpu_count() // numPEs,
+                          len(myFieldReqs)))
+moviePool = ThreadPool(processes=numMovieJobs)
+movieJobs = []
+
 """
 Loop over requested fields list fieldReqs[:]
 """
@@ -134,12 +149,24 @@ for field in myFieldReqs:
     24 FPS.
     """
     inFilePrototype = inputDir + '/' + fileNamePref + '_' + fieldName + '_*' + imageFileExt
-    mmCommand = ("ffmpeg -r 12 -pattern_type glob -i '" + inFilePrototype + "'"
-                + " -r 24 " + movieFile)
-    print myName,":: field tag: ",field," field name:  ",fieldName," movie generation command = ",mmCommand
+    mmCommand = ['ffmpeg', '-r', '12', '-pattern_type', 'glob',
+                 '-i', inFilePrototype, '-r', '24', movieFile]
+    print myName,":: field tag: ",field," field name:  ",fieldName," movie generation command = ",' '.join(mmCommand)
     """
-    Invoke the movie-making command using subprocess.Popen()
+    Queue the movie-making command on the pool.  It is run directly,
+    without a shell; ffmpeg does its own input globbing.
     """
-    subprocess.Popen(mmCommand, shell=True)
+    movieJobs.append((movieFile,
+                      moviePool.apply_async(subprocess.call, (mmCommand,))))
 
+"""
+Wait for all of this rank's movies to finish, then sync.
+"""
+moviePool.close()
+for movieFile, job in movieJobs:
+    returnCode = job.get()
+    if returnCode != 0:
+        print myName,':: ffmpeg failed with status',returnCode,'making',movieFile
+moviePool.join()
 
+myComm.Barrier()
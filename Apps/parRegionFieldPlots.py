@@ -5,8 +5,11 @@ Uses mpi4py.
 """
 
 import sys
+import os
 import time
 import math
+import cPickle as pickle
+from multiprocessing.pool import ThreadPool
 
 import numpy as np
 import numpy.ma as ma
@@ -15,6 +18,8 @@ import dirTools as dt
 
 import awapIO as aio
 import awapRegion as ar
+import awapImage as aimg
+import mpiTools as mpit
 
 from mpi4py import MPI
 
@@ -25,6 +30,8 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 from mpl_toolkits.basemap import Basemap
 from matplotlib import colors as cols
+from matplotlib.collections import LineCollection
+import matplotlib.transforms as mtransforms
 from matplotlib import rc
 
 """
@@ -59,10 +66,13 @@ rootID = 0
 """
 The .conf file supplied as the first command-line
 argument.  It contains a number of hard-wired parameter
-definitions that will all be pulled in as a dictionary.
+definitions that will all be pulled in as a dictionary,
+read on the root rank and broadcast to the others.
 """
-jobConfig = {}
-execfile(sys.argv[1], jobConfig)
+jobConfig = None
+if myRank == rootID:
+    jobConfig = aio.readJobConfig(sys.argv[1])
+jobConfig = myComm.bcast(jobConfig, root=rootID)
 
 """
 Check readability of input data directory tree.
@@ -105,6 +115,13 @@ if restrictDateRange:
     minDate = jobConfig['minDate']
     maxDate = jobConfig['maxDate']
 
+"""
+Regenerate images that already exist?  If not, frames whose thumbnail
+and full-resolution images both exist are skipped, so an interrupted
+run can be resumed.  Defaults to True.
+"""
+overwriteImages = jobConfig.get('overwriteImages', True)
+
 """
 Get dictionary of renormalisation coefficients from the job
 configuration.
@@ -157,16 +174,16 @@ else:
 Working from a list of SubRegion IDs, create a  List of 
 SubRegion class instances.
 """
-subRegions = []
+srNames = []
 for srID in subRegionIDs:
     """
     Reverse look-up from what is *meant* to be a nondegenerate
     dictionary (i.e., unique values, one for each key).
     """
     srInd = (conAUS.subRegionFlags.values()).index(srID)
-    srName = (conAUS.subRegionFlags.keys())[srInd]
-    subRegions.append(ar.SubRegion(conAUS, srID, RegionName=srName,
-                                   RegionType=srType))
+    srNames.append((conAUS.subRegionFlags.keys())[srInd])
+subRegions = ar.buildSubRegions(conAUS, subRegionIDs, RegionNames=srNames,
+                                RegionType=srType)
 
 """
 Safe mkdir for region type directory layer.
@@ -228,287 +245,512 @@ pColorTimes = []
 saveFullResFileTimes = []
 saveThumbnailFileTimes = []
 """
-Basemap dictionary.  To be filled in on first pass over all
-the subregions.
+Basemap dictionary, keyed by SubRegion name.  Full-resolution Basemaps
+are expensive to build (GSHHS coastline clipping), but depend only on
+the SubRegion's bounding box, so they are cached on disk as pickles:
+the root builds any that are missing or stale, then every rank loads
+them.
 """
+def subRegionBasemapKey(SubReg):
+    """
+    Returns the Basemap construction parameters for a SubRegion.
+    """
+    return ('cyl', SubReg.minLat-2.*SubReg.dLat, SubReg.maxLat+2.*SubReg.dLat,
+            SubReg.minLon-2.*SubReg.dLon, SubReg.maxLon+2.*SubReg.dLon, 'f')
+
+def loadCachedBasemap(CacheFile, Key):
+    """
+    Returns the Basemap pickled in CacheFile if it was built with the
+    parameters Key; None otherwise.
+    """
+    if not os.path.isfile(CacheFile):
+        return None
+    pickleFile = open(CacheFile, 'rb')
+    try:
+        cachedKey, cachedBaseMap = pickle.load(pickleFile)
+    except Exception:
+        return None
+    finally:
+        pickleFile.close()
+    if cachedKey != Key:
+        return None
+    return cachedBaseMap
+
+def buildBasemap(Key):
+    """
+    Returns a new Basemap built with the parameters Key.
+    """
+    projection, llcLat, urcLat, llcLon, urcLon, resolution = Key
+    return Basemap(projection=projection, llcrnrlat=llcLat, urcrnrlat=urcLat,
+                   llcrnrlon=llcLon, urcrnrlon=urcLon, resolution=resolution)
+
+baseMapCacheDir = jobConfig['outputImageRoot'] + '/basemaps'
+if myRank == rootID:
+    dt.safeMakeDir(baseMapCacheDir)
+    for sReg in subRegions:
+        cacheFile = baseMapCacheDir + '/' + str(int(sReg.regionID)) + '.pkl'
+        key = subRegionBasemapKey(sReg)
+        if loadCachedBasemap(cacheFile, key) is None:
+            pickleFile = open(cacheFile, 'wb')
+            pickle.dump((key, buildBasemap(key)), pickleFile,
+                        pickle.HIGHEST_PROTOCOL)
+            pickleFile.close()
+
+myComm.Barrier()
+
 baseMaps = {}
-"""
-Domain decomposition over field requests.  Card-deal
-them so that the maximum load imbalance is one field.
-"""
-numFields = len(fieldReqs)
-quotient = numFields / numPEs
-remainder = numFields % numPEs
-if remainder == 0:
-    myStart = myRank * quotient
-    myStop = myStart + quotient
-    myFieldReqs = fieldReqs[myStart:myStop]
-else:
-    print myName,':: Number of requested fields must be an integral number of numPEs.'
-    sys.exit()
+for sReg in subRegions:
+    startTime = time.time()
+    cacheFile = baseMapCacheDir + '/' + str(int(sReg.regionID)) + '.pkl'
+    key = subRegionBasemapKey(sReg)
+    baseMap = loadCachedBasemap(cacheFile, key)
+    if baseMap is None:
+        baseMap = buildBasemap(key)
+    baseMaps[sReg.name] = baseMap
+    baseMapTimes.append(time.time() - startTime)
 
 """
-Loop over requested fields list myFieldReqs[:]
+Per-SubRegion geometry, keyed by SubRegion name:  the AWAP CONAUS
+shapefile outlines and the map projection extent of the grid.  Neither
+depends on the field or file being plotted, so build them once here.
 """
-loopStartTime = time.time()
-for field in myFieldReqs:
+srGeom = {}
+for sReg in subRegions:
+    myBaseMap = baseMaps[sReg.name]
     """
-    Set data input directory and image output directories.
+    Read in the AWAP CONAUS shapefile information.  The outlines (in map
+    projection coordinates) are kept and added to each figure as a
+    LineCollection.
     """
-    fieldName = jobConfig['fieldTagsToDirName'][field]
-    inputDir = jobConfig['inputDataRoot'] + '/' + fieldName
+    startTime = time.time()
+    myBaseMap.readshapefile(jobConfig['shapeFile'], 'scalerank',
+                            drawbounds=False)
+    shapeFileTimes.append(time.time() - startTime)
     """
-    Is inputDir a valid directory?
+    The cyl projection maps the regular lat/lon grid to a regular grid,
+    so the field can be drawn as an image.  Its extent is that of the
+    cells pcolormesh() drew from the cell corners (cell-center lat/lon
+    values shifted to ULC values), less the last row and column:
+    (left, right, bottom, top), with the first row at the top.
     """
-    if not dt.isReadableDir(inputDir):
-        print myName,':: FATAL--Directory',inputDir,' is invalid.'
-        sys.exit()
+    startTime = time.time()
+    xCorners, yCorners = myBaseMap(
+        [sReg.lons[0]-0.5*sReg.dLon, sReg.lons[-1]-0.5*sReg.dLon],
+        [sReg.lats[-1]+0.5*sReg.dLat, sReg.lats[0]+0.5*sReg.dLat])
+    meshGridTimes.append(time.time() - startTime)
+    srGeom[sReg.name] = {'extent': (xCorners[0], xCorners[1],
+                                    yCorners[0], yCorners[1]),
+                         'shapes': myBaseMap.scalerank}
+
+"""
+Per-SubRegion figure.  A SubRegion's figure--axes, shapefile outlines,
+image, colour bar, and labels--is built when the rank reaches its first
+frame of that SubRegion and reused for all of them; each frame merely
+swaps in new field data, colour map, and label text.  Each figure holds
+several MB of Agg buffer at 300 dpi, so a rank plots its SubRegions in
+groups of at most maxOpenFrames (see myJobs below), keeping open only
+the current group's figures, in frames (keyed by SubRegion name).
+"""
+maxOpenFrames = 8
+frames = {}
+frameGroup = None
+
+def buildFrame(SubReg):
+    """
+    Build the persistent figure used for every frame of a SubRegion.
+
+    Parameters
+    ----------
+    SubReg : awapRegion.SubRegion
+        SubRegion to be plotted.
 
+    Returns
+    -------
+    dict
+        Figure, axes, image, colour bar, and label artists.
     """
-    Create colourMap for this field.
     """
-    cmapName = field + 'Scale'
-    colourDict = aio.readAWAP_ColourTable(jobConfig['colourTablePath'],
-                                          field)
-    cMap = cols.LinearSegmentedColormap(cmapName, colourDict)
+    Figure set-up:  Set up figure so that no viewport 
+    frame is visible.  Frames are rendered once, at full resolution.
     """
-    Colourbar range settings.
+    fig = plt.figure(frameon=False)
+    ax = plt.axes()
+    fig.patch.set_visible(False)
+    ax.patch.set_visible(False)
+    fig.set_size_inches(5.25,4.5)
+    fig.set_dpi(300)
+
+    myBaseMap = baseMaps[SubReg.name]
+    geom = srGeom[SubReg.name]
+
     """
-    minVal = plotPars[field]['minVal']
-    maxVal = plotPars[field]['maxVal']
-    
-    if field in renormalisations.keys():
-        """
-        Apply multiplicative renormalisation.
-        """
-        minVal *= renormalisations[field]
-        maxVal *= renormalisations[field]
+    Draw the AWAP CONAUS shapefile outlines.
+    """
+    ax.add_collection(LineCollection(geom['shapes'], linewidths=0.5,
+                                     colors='k', antialiaseds=1))
+
+    """
+    The image starts out fully masked; frames supply the data.  It is
+    placed on the axes directly, since Basemap.imshow() would stretch
+    it over the map corners, which pad the SubRegion's cells; the axes
+    limits are kept at the map corners.
+    """
+    imShape = (len(SubReg.lats) - 1, len(SubReg.lons) - 1)
+    im = ax.imshow(ma.masked_all(imShape), extent=geom['extent'],
+                   origin='upper', interpolation='nearest')
+    im.set_clim(vmin=0., vmax=1.)
+    ax.set_xlim(myBaseMap.llcrnrx, myBaseMap.urcrnrx)
+    ax.set_ylim(myBaseMap.llcrnry, myBaseMap.urcrnry)
+
+    """
+    Add in color bar (if desired).
+    """
+    cbar = None
+    if jobConfig['DisplayColorBarOnFR']:
+        cbar = myBaseMap.colorbar(im,"right", size='5%', pad='2%', ax=ax)
+        cbar.ax.tick_params(axis='y', direction='out')
 
     """
-    Retrieve list of all of the filename stems (i.e., minus filetype extension) 
-    in fieldDataDir.
+    Date label and title.
     """
-    fieldDataFiles = aio.getFileList(inputDir)
-    if restrictDateRange:
-        fieldDataFiles = aio.filterByDateRange(fieldDataFiles, minDate, maxDate)
+    xDate = 0.5
+    yDate = 0.01
+    dateText = fig.text(xDate, yDate, '', ha='center', va='bottom', 
+                        family='monospace', fontsize=8)
+    titleText = ax.set_title('', size=8, ha='center')
+    titleText.set_y(1.01)
 
+    return {'fig': fig, 'ax': ax, 'im': im, 'cbar': cbar,
+            'dateText': dateText, 'titleText': titleText,
+            'mask': ma.getmaskarray(SubReg.topoMask), 'field': None,
+            'fullBBox': None, 'mapBBox': None}
+
+"""
+Thumbnails are downsampled from the full-resolution raster to fit
+1.38 x 1.14 inches at 100 dpi.
+"""
+thumbnailSize = (138, 114)
+jpegQuality = 80
+
+"""
+Domain decomposition over individual frames.  The root lists every
+(field, sampling interval, file, SubRegion) job and broadcasts the
+list; each rank card-deals itself every numPEs-th job, so the maximum
+load imbalance is one frame.  SubRegions are listed by their index in
+subRegions[:], and each file's SubRegions are listed together, so a
+rank's slice holds runs of SubRegions of the same file.
+"""
+jobs = None
+if myRank == rootID:
+    jobs = []
     """
-    Iterate over sampling intervals:
+    Input files, keyed by input directory:  for each directory, a
+    dictionary keyed by (sampling interval, is percentile rank file),
+    filled in a single pass over the directory's (date filtered)
+    listing.  Fields sharing an input directory share its listing.
     """
-    for ts in timeSamplingIntervals:
+    sampFilesCache = {}
+    for field in fieldReqs:
         """
-        Filter list of filename stems to retrieve files for this time
-        sampling strategy only.
+        Is this field's input directory valid?
         """
-        allFiles = aio.filterBySamplingInterval(fieldDataFiles, ts)
-        if aio.isPercentileRankField(field):
-            sampFiles = [x for x in allFiles if aio.isPercentileRankFile(x)]
-        else:
-            sampFiles = [x for x in allFiles if not aio.isPercentileRankFile(x)]
-        
+        fieldName = jobConfig['fieldTagsToDirName'][field]
+        inputDir = jobConfig['inputDataRoot'] + '/' + fieldName
+        if not dt.isReadableDir(inputDir):
+            print myName,':: FATAL--Directory',inputDir,' is invalid.'
+            jobs = None
+            break
+
         """
-        Loop over sample files.
+        Retrieve list of all of the filename stems (i.e., minus filetype
+        extension) in inputDir, binned by time sampling interval and
+        percentile rank.
         """
-        for fn in sampFiles:
+        if inputDir not in sampFilesCache:
+            fieldDataFiles = aio.getFileList(inputDir)
+            if restrictDateRange:
+                fieldDataFiles = aio.filterByDateRange(fieldDataFiles,
+                                                       minDate, maxDate)
+            dirFiles = {}
+            for x in fieldDataFiles:
+                key = (aio.getDataSamplingInterval(x),
+                       aio.isPercentileRankFile(x))
+                dirFiles.setdefault(key, []).append(x)
+            sampFilesCache[inputDir] = dirFiles
+        dirFiles = sampFilesCache[inputDir]
+
+        for ts in timeSamplingIntervals:
             """
-            Read in masked field.
+            Files for this time sampling strategy only.
             """
-            fieldDataFile = inputDir + '/' + fn + aio.headerFilenameExt
-            fieldDict = aio.readAWAP_hdr(fieldDataFile)
-            startTime = time.time()
-            fieldData = aio.readAWAP_flt(fieldDict)
-            readFileTimes.append(time.time() - startTime)
-            
+            sampFiles = dirFiles.get((ts, aio.isPercentileRankField(field)),
+                                     [])
+            for fn in sampFiles:
+                for srIndex in range(len(subRegions)):
+                    if not overwriteImages:
+                        srFieldDir = srDirs[subRegions[srIndex]] + '/' + fieldName
+                        if (os.path.exists(srFieldDir + '/Thumbnail/' + fn + '.jpeg') and
+                            os.path.exists(srFieldDir + '/Full/' + fn + '.jpeg')):
+                            continue
+                    jobs.append((field, ts, fn, srIndex))
+
+jobs = myComm.bcast(jobs, root=rootID)
+if jobs is None:
+    sys.exit()
+myJobs = jobs[myRank::numPEs]
+"""
+Split this rank's SubRegions, in order of first use, into groups of
+maxOpenFrames, and plot the groups one after another.  The sort is
+stable, so within a group the jobs stay file by file, and each file is
+read once per group rather than once per SubRegion.
+"""
+srGroups = {}
+for job in myJobs:
+    if job[3] not in srGroups:
+        srGroups[job[3]] = len(srGroups) // maxOpenFrames
+myJobs.sort(key=lambda job: srGroups[job[3]])
+
+"""
+Per-field plotting settings, keyed by field tag; filled in on first
+use.  The most recently read field file is kept, as consecutive jobs
+of a group plot the same file for each of the group's SubRegions.
+"""
+fieldSettings = {}
+lastFile = None
+lastFieldData = None
+
+"""
+Read ahead the next field file this rank will need while the current
+one is plotted:  a background thread reads the file through once and
+discards the bytes, leaving it in the OS page cache for the MPI-IO
+read that follows.  File reads release the GIL, so plotting proceeds
+meanwhile.
+"""
+prefetchPool = ThreadPool(1)
+
+def warmFile(FltFile):
+    """
+    Read FltFile through, discarding its contents.
+    """
+    try:
+        with open(FltFile, 'rb') as fltFile:
+            while fltFile.read(1 << 20):
+                pass
+    except IOError:
+        pass
+
+def readAhead(FltFile):
+    """
+    Start reading FltFile into the page cache in the background.
+    """
+    prefetchPool.apply_async(warmFile, (FltFile,))
+
+"""
+For each of this rank's jobs, the float file it reads next after this
+job's file, if any.
+"""
+nextFltFiles = [None] * len(myJobs)
+nextFltFile = None
+for i in range(len(myJobs) - 1, -1, -1):
+    nextFltFiles[i] = nextFltFile
+    (field, ts, fn, srIndex) = myJobs[i]
+    fltFile = (jobConfig['inputDataRoot'] + '/' +
+               jobConfig['fieldTagsToDirName'][field] + '/' + fn +
+               aio.floatFilenameExt)
+    if i == 0 or myJobs[i-1][2] != fn or myJobs[i-1][0] != field:
+        nextFltFile = fltFile
+
+"""
+Loop over this rank's frames.
+"""
+loopStartTime = time.time()
+for (jobIndex, (field, ts, fn, srIndex)) in enumerate(myJobs):
+    sReg = subRegions[srIndex]
+    fieldName = jobConfig['fieldTagsToDirName'][field]
+    inputDir = jobConfig['inputDataRoot'] + '/' + fieldName
+
+    if field not in fieldSettings:
+        """
+        Create colourMap for this field.
+        """
+        cmapName = field + 'Scale'
+        colourDict = aio.readAWAP_ColourTable(jobConfig['colourTablePath'],
+                                              field)
+        cMap = cols.LinearSegmentedColormap(cmapName, colourDict)
+        """
+        Colourbar range settings.
+        """
+        minVal = plotPars[field]['minVal']
+        maxVal = plotPars[field]['maxVal']
+
+        if field in renormalisations.keys():
             """
-            Renormalise field if neccesary.
+            Apply multiplicative renormalisation.
             """
-            if field in renormalisations.keys():
-                """
-                Apply multiplicative renormalisation.
-                """
-                fieldData *= renormalisations[field]
+            minVal *= renormalisations[field]
+            maxVal *= renormalisations[field]
+        fieldSettings[field] = (cMap, minVal, maxVal)
+    cMap, minVal, maxVal = fieldSettings[field]
+
+    if (field, fn) != lastFile:
+        """
+        Read in masked field.
+        """
+        fieldDataFile = inputDir + '/' + fn + aio.headerFilenameExt
+        fieldDict = aio.readAWAP_hdr(fieldDataFile)
+        startTime = time.time()
+        fieldData = mpit.readAWAP_flt(fieldDict)
+        readFileTimes.append(time.time() - startTime)
+        if nextFltFiles[jobIndex] is not None:
+            readAhead(nextFltFiles[jobIndex])
 
+        """
+        Renormalise field if neccesary.
+        """
+        if field in renormalisations.keys():
             """
-            Loop over subregions to be plotted.
+            Apply multiplicative renormalisation in place, on the raw
+            data rather than through masked-array arithmetic.
             """
-            for sReg in subRegions:
-                """
-                Set output directory names for this subregion.
-                """
-                srFieldDir = srDirs[sReg] + '/' + fieldName
-                thumbnailImDir = srFieldDir + '/Thumbnail'
-                fullImDir = srFieldDir + '/Full'
-                """
-                Extract SubRegion field data from parent region.
-                Mask it using the SubRegion's mask.
-                """
-                subFieldData = fieldData[sReg.parentLatStart:sReg.parentLatStop,
-                                         sReg.parentLonStart:sReg.parentLonStop]
-                maskedSubField = ma.masked_array(data=subFieldData, 
-                                                 mask=sReg.topoMask.mask)
-
-                """
-                Figure set-up:  Set up figure so that no viewport 
-                frame nor axes are visible.
-                """
-                fig = plt.figure(frameon=False, tight_layout=True)
-                ax = plt.axes()
-                fig.patch.set_visible(False)
-                ax.patch.set_visible(False)
-                ax.axis('off')
-                """
-                Does this region have an existing Basemap?  If not,
-                generate it.
-                """
-                startTime = time.time()
-                if sReg.name not in baseMaps.keys():
-                    baseMaps.update({sReg.name:Basemap(projection='cyl',
-                                                        llcrnrlat=sReg.minLat-2.*sReg.dLat, 
-                                                        urcrnrlat=sReg.maxLat+2.*sReg.dLat, 
-                                                        llcrnrlon=sReg.minLon-2.*sReg.dLon,
-                                                        urcrnrlon=sReg.maxLon+2.*sReg.dLon,
-                                                        resolution='f')})
-
-                baseMapTimes.append(time.time() - startTime)
-                """
-                Moving forward, use myBaseMap as a reference to the dictionary
-                entry
-                """
-                myBaseMap = baseMaps[sReg.name]
-            
-                """
-                Read in the AWAP CONAUS shapefile information.
-                """
-                startTime = time.time()
-                myShapes = myBaseMap.readshapefile(jobConfig['shapeFile'], 
-                                                   'scalerank', drawbounds=True)
-                shapeFileTimes.append(time.time() - startTime)
-                """
-                Compute x,y coordinates in map projection; shift cell-center lat/lon 
-                values to ULC values for use with matplotlib's pcolor() function.
-                """
-                startTime = time.time()
-                x, y = myBaseMap(*np.meshgrid(sReg.lons-0.5*sReg.dLon, 
-                                              sReg.lats+0.5*sReg.dLat))            
-                meshGridTimes.append(time.time() - startTime)
-
-                startTime = time.time()
-                im = myBaseMap.pcolormesh(x, y, maskedSubField, cmap=cMap)
-                pColorTimes.append(time.time() - startTime)
-                plt.clim(vmin=minVal, vmax=maxVal)
-                """
-                Save thumbnail as a .jpeg file.
-                """
-                tnFile = thumbnailImDir + '/' + fn + '.jpeg'
-                tnFig = plt.gcf()
-                tnFig.set_size_inches(1.38,1.14)
-                startTime = time.time()
-                plt.savefig(tnFile, bbox_inches='tight', pad_inches=0.02, 
-                            dpi=100)
-                saveThumbnailFileTimes.append(time.time() - startTime)
-                """
-                Set up full-resolution figure and save it.
-                """
-                tnFig.set_size_inches(5.25,4.5)
-                ax.axis('on')
-                """
-                Add in color bar (if desired).
-                """
-                if jobConfig['DisplayColorBarOnFR']:
-                    cbar = myBaseMap.colorbar(im,"right", size='5%', pad='2%')
-                    cbar.ax.tick_params(axis='y', direction='out')
-                    cbar.set_label(plotPars[field]['cbarCaption'])
-                
-                """
-                Add Labels for field/units, time period, region name.
-                """
-                xRange = x.max() - x.min()
-                yRange = y.max() - y.min()
-                """
-                Date label.
-                """
-                plotDateRange = aio.getDateRange(fn)
-                xDate = 0.5
-                yDate = 0.01
-                plt.figtext(xDate, yDate, plotDateRange, ha='center', va='bottom', 
-                            family='monospace', fontsize=8)
-                """
-                Title string.  Put SubRegion name/type in supertitle.
-                """
-                plotTitle = plotPars[field]['plotTitle']
-                """
-                If no colour bar, append units to title.
-                """
-                if not jobConfig['DisplayColorBarOnFR']:
-                    plotTitle += ' ' + plotPars[field]['cbarCaption']
-                """
-                Include region information (if desired).
-                """
-                if jobConfig['DisplayRegionNameOnFR']:
-                    if jobConfig['DisplayRegionTypeOnFR']:
-                        plotSubTitle = sReg.regionType + ':  ' + sReg.name
-                    else:
-                        plotSubTitle = sReg.name
-                    """
-                    Display the title with region information desired
-                    """
-                    titles = plotTitle + ' \n ' + plotSubTitle
-                    t = plt.title(titles, size=8, ha='center')
-                    t.set_y(1.01)
-                else:
-                    """
-                    Merely display the field information in the title.
-                    """
-                    t = plt.title(plotTitle, size=8, ha='center')
-                    t.set_y(1.01)
-
-                """
-                Save full plot as a .jpeg file.
-                """
-                frFile = fullImDir + '/' + fn + '.jpeg'
-                startTime = time.time()
-                plt.savefig(frFile, bbox_inches='tight', pad_inches=0.1, 
-                            dpi=300)
-                saveFullResFileTimes.append(time.time() - startTime)
-                plt.close()
-"""
-Print out the profile:
-"""
-loopRunTime = time.time() - loopStartTime
-print myName,':: myRank = ',myRank,' :: Total Run Time for outermost loop = ',loopRunTime,' s.'
-print myName,':: myRank = ',myRank,' :: Total Run Time = ',time.time() - totalStartTime,' s.'
-sys.stdout.flush()
-avgRFTime = sum(readFileTimes) / float(len(readFileTimes))
-print myName,':: myRank = ',myRank,' :: Total Read File Time = ',sum(readFileTimes),' s.'
-sys.stdout.flush()
-print myName,':: myRank = ',myRank,' :: Number of Read File Operations = ',len(readFileTimes),' with time/op of ',avgRFTime,' s.'
-sys.stdout.flush()
-print myName,':: myRank = ',myRank,' :: Total BaseMap TIme = ',sum(baseMapTimes),' s.'
-sys.stdout.flush()
-avgBMTime = sum(baseMapTimes) / float(len(baseMapTimes))
-print myName,':: myRank = ',myRank,' :: Number of BaseMap Operations = ',len(baseMapTimes),' with time/op of ',avgBMTime,' s.'
-sys.stdout.flush()
-print myName,':: myRank = ',myRank,' :: Total shapeFile read onto basemap Time = ',sum(shapeFileTimes),' s.'
-sys.stdout.flush()
-avgShFTime = sum(shapeFileTimes) / float(len(shapeFileTimes))
-print myName,':: myRank = ',myRank,' :: Number of shapeFile Operations = ',len(shapeFileTimes),' with time/op of ',avgShFTime,' s.'
-sys.stdout.flush()
-print myName,':: myRank = ',myRank,' :: Total np.meshgrid TIme = ',sum(meshGridTimes),' s.'
-sys.stdout.flush()
-avgMGTime = sum(meshGridTimes) / float(len(meshGridTimes))
-print myName,':: myRank = ',myRank,' :: Number of meshgrid Operations = ',len(meshGridTimes),' with time/op of ',avgMGTime,' s.'
-sys.stdout.flush()
-print myName,':: myRank = ',myRank,' :: Total bmap.pcolormesh() Times = ',sum(pColorTimes),' s.'
-avgPCTime = sum(pColorTimes) / float(len(pColorTimes))
-print myName,':: myRank = ',myRank,' :: Number of bmap.pcolormesh() Operations = ',len(pColorTimes),' with time/op of ',avgPCTime,' s.'
-
-print myName,':: myRank = ',myRank,' :: Total save thumbnail image file time = ',sum(saveThumbnailFileTimes),' s.'
-sys.stdout.flush()
-avgSTnFTime = sum(saveThumbnailFileTimes) / float(len(saveThumbnailFileTimes))
-print myName,':: myRank = ',myRank,' :: Number of saveFile Operations = ',len(saveThumbnailFileTimes),' with time/op of ',avgSTnFTime,' s.'
-print myName,':: myRank = ',myRank,' :: Total save full-res image file time = ',sum(saveFullResFileTimes),' s.'
-sys.stdout.flush()
-avgSFRFTime = sum(saveFullResFileTimes) / float(len(saveFullResFileTimes))
-print myName,':: myRank = ',myRank,' :: Number of saveFile Operations = ',len(saveFullResFileTimes),' with time/op of ',avgSFRFTime,' s.'
-sys.stdout.flush()
+            np.multiply(fieldData.data, renormalisations[field],
+                        out=fieldData.data)
+        lastFile = (field, fn)
+        lastFieldData = fieldData
+    fieldData = lastFieldData
+
+    """
+    Set output directory names for this subregion.
+    """
+    srFieldDir = srDirs[sReg] + '/' + fieldName
+    thumbnailImDir = srFieldDir + '/Thumbnail'
+    fullImDir = srFieldDir + '/Full'
+    """
+    Extract SubRegion field data from parent region.
+    Mask it using the SubRegion's mask.
+    """
+    if srGroups[srIndex] != frameGroup:
+        for frame in frames.values():
+            plt.close(frame['fig'])
+        frames = {}
+        frameGroup = srGroups[srIndex]
+    if sReg.name not in frames:
+        frames[sReg.name] = buildFrame(sReg)
+    frame = frames[sReg.name]
+    subFieldData = fieldData[sReg.parentLatStart:sReg.parentLatStop,
+                             sReg.parentLonStart:sReg.parentLonStop]
+    maskedSubField = ma.array(subFieldData, mask=frame['mask'], copy=False)
+
+    """
+    This SubRegion's persistent figure.
+    """
+    fig = frame['fig']
+    im = frame['im']
+
+    """
+    Swap this file's data into the image.  As pcolormesh()
+    did, drop the last row and column of cell values.
+    """
+    startTime = time.time()
+    im.set_cmap(cMap)
+    im.set_data(maskedSubField[:-1,:-1])
+    pColorTimes.append(time.time() - startTime)
+    im.set_clim(vmin=minVal, vmax=maxVal)
+    if frame['cbar'] is not None:
+        frame['cbar'].set_label(plotPars[field]['cbarCaption'])
+
+    """
+    Date label.
+    """
+    plotDateRange = aio.getDateRange(fn)
+    frame['dateText'].set_text(plotDateRange)
+    """
+    Title string.  Put SubRegion name/type in supertitle.
+    """
+    plotTitle = plotPars[field]['plotTitle']
+    """
+    If no colour bar, append units to title.
+    """
+    if not jobConfig['DisplayColorBarOnFR']:
+        plotTitle += ' ' + plotPars[field]['cbarCaption']
+    """
+    Include region information (if desired).
+    """
+    if jobConfig['DisplayRegionNameOnFR']:
+        if jobConfig['DisplayRegionTypeOnFR']:
+            plotSubTitle = sReg.regionType + ':  ' + sReg.name
+        else:
+            plotSubTitle = sReg.name
+        """
+        Display the title with region information desired
+        """
+        frame['titleText'].set_text(plotTitle + ' \n ' + 
+                                    plotSubTitle)
+    else:
+        """
+        Merely display the field information in the title.
+        """
+        frame['titleText'].set_text(plotTitle)
+
+    """
+    The layout and crop boxes depend only on this SubRegion's axes and
+    the field's labels, so lay the figure out, and find the crop boxes,
+    only when the field changes.
+    """
+    newLayout = (frame['field'] != field)
+    if newLayout:
+        fig.tight_layout()
+        frame['field'] = field
+
+    """
+    Render the frame once, at full resolution, into the Agg buffer, and
+    save the figure's tight bounding box (padded by 0.1 inch) as a
+    .jpeg file.
+    """
+    frFile = fullImDir + '/' + fn + '.jpeg'
+    startTime = time.time()
+    fig.canvas.draw()
+    rgba = aimg.getCanvasRGBA(fig)
+    if newLayout:
+        renderer = fig.canvas.get_renderer()
+        tightBBox = fig.get_tightbbox(renderer).padded(0.1)
+        frame['fullBBox'] = mtransforms.Bbox(tightBBox.get_points() * fig.dpi)
+        frame['mapBBox'] = frame['ax'].get_window_extent(renderer).padded(
+            0.02 * fig.dpi)
+    aimg.saveJPEG(aimg.cropToBBox(rgba, frame['fullBBox']), frFile,
+                  Quality=jpegQuality)
+    saveFullResFileTimes.append(time.time() - startTime)
+    """
+    Save thumbnail--the bare map--as a .jpeg file, downsampled from
+    the map axes (padded by 0.02 inch) of the same raster.
+    """
+    tnFile = thumbnailImDir + '/' + fn + '.jpeg'
+    startTime = time.time()
+    tnRGB = aimg.makeThumbnail(aimg.cropToBBox(rgba, frame['mapBBox']),
+                               thumbnailSize)
+    aimg.saveJPEG(tnRGB, tnFile, Quality=jpegQuality)
+    saveThumbnailFileTimes.append(time.time() - startTime)
+
+for frame in frames.values():
+    plt.close(frame['fig'])
+prefetchPool.close()
+prefetchPool.join()
+
+"""
+Print out the profile, summed over all ranks, on the root:
+"""
+loopRunTimes = [time.time() - loopStartTime]
+runTimes = [time.time() - totalStartTime]
+profile = [('Outermost loop', loopRunTimes),
+           ('Run', runTimes),
+           ('Read File', readFileTimes),
+           ('BaseMap', baseMapTimes),
+           ('shapeFile read onto basemap', shapeFileTimes),
+           ('grid extent', meshGridTimes),
+           ('image set_data()', pColorTimes),
+           ('save thumbnail image file', saveThumbnailFileTimes),
+           ('save full-res image file', saveFullResFileTimes)]
+profileSummary = mpit.reduceProfile(myComm, profile, Root=rootID)
+if myRank == rootID:
+    mpit.printProfile(myName, profileSummary, numPEs)
+    sys.stdout.flush()
 
@@ -4,6 +4,7 @@ PDF builder for BIOS2 output.  Uses DataCube class.
 import sys
 import math
 import time
+from multiprocessing.pool import ThreadPool
 
 import numpy as np
 import numpy.ma as ma
@@ -13,6 +14,22 @@ import matplotlib.pyplot as plt
 import awapIO as aio
 import dataCube as dc
 
+def scott_bin_edges(sample_min, sample_max, sample_std, sample_size):
+    """
+    Histogram bin edges by Scott's Rule, computed as np.histogram(...,
+    bins='scott') would, but from precomputed sample statistics rather
+    than from another pass over the sample.
+    """
+    width = sample_std * (24. * math.sqrt(math.pi) / sample_size) ** (1. / 3.)
+    if width > 0.:
+        num_bins = max(1, int(math.ceil((sample_max - sample_min) / width)))
+    else:
+        num_bins = 1
+    if sample_max == sample_min:
+        sample_min -= 0.5
+        sample_max += 0.5
+    return np.linspace(sample_min, sample_max, num_bins + 1)
+
 my_name = 'pdfs-From-DataCubes.py'
 
 usage = 'python %s ' % my_name
@@ -32,19 +49,28 @@ sample_type = 'mth'
 seasons = aio.SeasonAbbrs
 
 """
-Build seasonal DataCubes from input data.
+Build seasonal DataCubes from input data.  Ingest is I/O bound, and
+NumPy releases the GIL while reading, so the seasons are ingested
+concurrently, one thread each.
 """
+def build_season_cube(season):
+    print 'Ingest for season %s...' % season
+    ts = time.time()
+    cube = dc.DataCube(data_root, field_name, sample_type,
+                       CycleFilter=season)
+    return season, cube, time.time() - ts
+
 season_cubes = {}
 print '%s:: Building DataCubes for variable %s...' % (my_name, field_name)
 tstart = time.time()
-for season in seasons:
-    print 'Ingest for season %s...' % season
-    ts = time.time()
-    season_cubes[season] = dc.DataCube(data_root, field_name, sample_type,
-                                       CycleFilter=season)
+ingest_pool = ThreadPool(len(seasons))
+for season, cube, ingest_time in ingest_pool.imap(build_season_cube, seasons):
+    season_cubes[season] = cube
     print 'Ingest of %d files for season %s completed in %s sec.' % (season_cubes[season].ntimes,
                                                                      season, 
-                                                                     time.time() - ts)
+                                                                     ingest_time)
+ingest_pool.close()
+ingest_pool.join()
 
 print 'Ingest for all seasons of field %s completed in %s sec.' % (field_name, 
                                                                    time.time() - tstart)
@@ -57,8 +83,18 @@ Processing of masked data to obtain pdfs.
 First, the overall, whole-sample pdfs'
 """
 full_pdfs = {}
+
+"""
+Figure for the Grand PDFs, reused for every season.
+"""
+pdf_fig = plt.figure(facecolor="white")
+pdf_ax = pdf_fig.add_subplot(111)
+pdf_ax.set_ylabel('Probability Density')
+pdf_ax.set_xlabel(field_name)
+patches = []
+
 for season in seasons:
-    sample = season_cubes[season].data[~season_cubes[season].data.mask]
+    sample = season_cubes[season].validSample()
     print 'Dimensions of unmasked data for season %s = ' % season, sample.shape
 
     """
@@ -66,35 +102,40 @@ for season in seasons:
     """
     if field_name in ['FWDis', 'FWE', 'FWPrec', 'FWPt', 'FWRun', 
                       'FWSoil', 'FWTra', 'FWwc']:
-        sample = sample * 1000.
+        sample *= 1000.
 
-    full_pdfs[season] = np.histogram(sample, bins='scott', density=True)
+    sample_min = sample.min()
+    sample_max = sample.max()
+    edges = scott_bin_edges(sample_min, sample_max, sample.std(), sample.size)
+    full_pdfs[season] = np.histogram(sample, bins=edges, density=True)
     
     num_years = season_cubes[season].ntimes / 3
     start_year = int(str(season_cubes[season].start_date)[0:4])
     end_year = int(str(season_cubes[season].end_date)[0:4])
 
     print 'Full sample for %s covers years %d-%d.' % (season, start_year, end_year)
-    print 'Minimum value in sample = ',sample.min()
-    print 'Maximum value in sample = ',sample.max()
+    print 'Minimum value in sample = ',sample_min
+    print 'Maximum value in sample = ',sample_max
     print 'Plotting %s seasonal density for %s...' %(season, field_name)
     bins = full_pdfs[season][1]
     vals = full_pdfs[season][0]
     print 'Number of bins for %s grand pdf = %d' % (season, vals.size)
 
     """
-    Plot the Grand PDF.
+    Plot the Grand PDF.  The density is already binned, so plot it by
+    weighting one point per bin rather than re-binning the sample.
     """
-    plt.figure(facecolor="white")
-    n, bins, patches = plt.hist(sample, bins, normed=1, histtype='stepfilled', color='c')
+    for patch in patches:
+        patch.remove()
+    n, bins, patches = pdf_ax.hist(bins[:-1], bins, weights=vals, histtype='stepfilled', color='c')
+    pdf_ax.relim()
+    pdf_ax.autoscale_view()
     title = 'Spatiotemporally Sampled ' + field_name + ' PDF'
     subtitle = season.upper() + ' years ' + str(start_year) + '-' + str(end_year) + ' Scott\'s Rule (' + str(vals.size) + ' bins)'
     title = title + '\n' + subtitle
-    plt.title(title)
-    plt.ylabel('Probability Density')
-    plt.xlabel(field_name)
+    pdf_ax.set_title(title)
     output_file = 'grand_pdf_' + field_name + '_' + str(start_year) + '-' + str(end_year) + '_' + season+ '_scott' + '.png'
-    plt.savefig(output_file)
+    pdf_fig.savefig(output_file)
     #plt.show()
     
 
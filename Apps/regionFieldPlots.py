@@ -125,16 +125,16 @@ else:
 Working from a list of SubRegion IDs, create a  List of 
 SubRegion class instances.
 """
-subRegions = []
+srNames = []
 for srID in subRegionIDs:
     """
     Reverse look-up from what is *meant* to be a nondegenerate
     dictionary (i.e., unique values, one for each key).
     """
     srInd = (conAUS.subRegionFlags.values()).index(srID)
-    srName = (conAUS.subRegionFlags.keys())[srInd]
-    subRegions.append(ar.SubRegion(conAUS, srID, RegionName=srName,
-                                   RegionType=srType))
+    srNames.append((conAUS.subRegionFlags.keys())[srInd])
+subRegions = ar.buildSubRegions(conAUS, subRegionIDs, RegionNames=srNames,
+                                RegionType=srType)
 
 """
 Safe mkdir for region type directory layer.
@@ -333,8 +333,7 @@ for field in fieldReqs:
                 values to ULC values for use with matplotlib's pcolor() function.
                 """
                 startTime = time.time()
-                x, y = myBaseMap(*np.meshgrid(sReg.lons-0.5*sReg.dLon, 
-                                              sReg.lats+0.5*sReg.dLat))            
+                x, y = sReg.getCellCornerXY(myBaseMap)
                 meshGridTimes.append(time.time() - startTime)
 
                 startTime = time.time()
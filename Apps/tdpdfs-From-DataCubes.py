@@ -4,11 +4,17 @@ Windowed PDF builder for BIOS2 output.  Uses DataCube class.
 import sys
 import math
 import time
+from multiprocessing.pool import ThreadPool
 
 import numpy as np
 import numpy.ma as ma
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
 
 import matplotlib.pyplot as plt
+from matplotlib import colors as cols
 
 import awapIO as aio
 import dataCube as dc
@@ -16,24 +22,113 @@ import dataCube as dc
 def compute_KLD(p, q, dx):
     """
     Compute classic Kullback-Leibler Divergence from two
-    densities that use the same binning scheme.
-    Elegant version doesn't work--don't know why.
-    quo = np.divide(p, q, out=np.zeros_like(p), where=q!=0)
-    log_quo = np.log2(quo, out=np.zeros_like(quo), where=quo!=0)
-    kld = np.dot(p, log_quo) * dx
+    densities that use the same binning scheme.  Bins in which
+    either density is zero contribute nothing.
     """
     if p.size != q.size:
         print 'compute_KLD():: FATAL--p and q size mismatch:  '
         print 'compute_KLD():: p.size = ',p.size
         print 'compute_KLD():: q.size = ',q.size
         sys.exit()
-    kld = 0.
-    for i in range(0, p.size):
-        if (p[i] <= 0.) or (q[i] <= 0.):
-            continue
-        else:
-            kld += p[i] * np.log2(p[i] / q[i]) * dx
+    valid = (p > 0.) & (q > 0.)
+    kld = np.sum(p[valid] * np.log2(p[valid] / q[valid])) * dx
     return kld
+
+def compute_KLD_matrix(P, Q, dx):
+    """
+    Compute compute_KLD(P[i,:], Q[j,:], dx) for every pair of rows i, j
+    of two sets of densities that use the same binning scheme.  All
+    densities in P must be strictly positive.
+
+    Splitting log2(p/q) into log2(p) - log2(q), masked where q is zero,
+    turns the double loop over rows into two matrix products:
+        kld[i,j] = dx * (sum_b p_ib log2(p_ib) [q_jb > 0]
+                         - sum_b p_ib log2(q_jb) [q_jb > 0])
+    """
+    if P.shape[1] != Q.shape[1]:
+        print 'compute_KLD_matrix():: FATAL--P and Q bin count mismatch:  '
+        print 'compute_KLD_matrix():: P.shape = ',P.shape
+        print 'compute_KLD_matrix():: Q.shape = ',Q.shape
+        sys.exit()
+    q_valid = (Q > 0.)
+    log_q = np.log2(np.where(q_valid, Q, 1.))
+    p_log_p = P * np.log2(P)
+    kld = np.dot(p_log_p, q_valid.T.astype(P.dtype)) - np.dot(P, log_q.T)
+    return kld * dx
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True)
+    def kld_matrix_kernel(P, Q, dx):
+        """
+        Compiled compute_KLD(P[i,:], Q[j,:], dx) for every pair of rows
+        i, j, parallel over i.  Memory is O(rows x bins), with no
+        temporaries.
+        """
+        num_p = P.shape[0]
+        num_q = Q.shape[0]
+        num_b = P.shape[1]
+        kld = np.empty((num_p, num_q))
+        for i in prange(num_p):
+            for j in range(num_q):
+                s = 0.
+                for k in range(num_b):
+                    p = P[i,k]
+                    q = Q[j,k]
+                    if p > 0. and q > 0.:
+                        s += p * np.log2(p / q)
+                kld[i,j] = s * dx
+        return kld
+
+def compute_KLD_field(P, Q, dx):
+    """
+    Compute the time-shifted KLD matrix of compute_KLD_matrix(), using
+    the compiled kernel if Numba is available.
+    """
+    if njit is None:
+        return compute_KLD_matrix(P, Q, dx)
+    if P.shape[1] != Q.shape[1]:
+        print 'compute_KLD_field():: FATAL--P and Q bin count mismatch:  '
+        print 'compute_KLD_field():: P.shape = ',P.shape
+        print 'compute_KLD_field():: Q.shape = ',Q.shape
+        sys.exit()
+    return kld_matrix_kernel(P, Q, dx)
+
+def build_mesh_plot(xlabel, ylabel, cbar_label):
+    """
+    Create a persistent figure for pcolormesh plots that are redrawn
+    with new data, e.g., once per season.
+    """
+    fig = plt.figure(facecolor="white")
+    ax = fig.add_subplot(111)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    return {'fig': fig, 'ax': ax, 'mesh': None, 'cbar': None,
+            'norm': cols.Normalize(), 'cbar_label': cbar_label}
+
+def save_mesh_plot(plot, X, Y, C, title, output_file):
+    """
+    Replace the mesh of a figure from build_mesh_plot() with the values
+    C on the grid X, Y, retitle it, and save it.  The colour bar is
+    built for the first mesh and updated thereafter.
+    
+    Every mesh shares the figure's norm, rescaled to each C in turn, so
+    the colour bar--which keeps the norm it was built with, whatever the
+    matplotlib version--always matches the current mesh.
+    """
+    ax = plot['ax']
+    if plot['mesh'] is not None:
+        plot['mesh'].remove()
+    plot['norm'].autoscale(C)
+    plot['mesh'] = ax.pcolormesh(X, Y, C, norm=plot['norm'])
+    ax.set_xlim(X.min(), X.max())
+    ax.set_ylim(Y.min(), Y.max())
+    ax.set_title(title)
+    if plot['cbar'] is None:
+        plot['cbar'] = plot['fig'].colorbar(plot['mesh'], ax=ax)
+        plot['cbar'].set_label(plot['cbar_label'])
+    else:
+        plot['cbar'].update_normal(plot['mesh'])
+    plot['fig'].savefig(output_file)
         
 my_name = 'pdfs-From-DataCubes.py'
 
@@ -55,30 +150,49 @@ sample_type = 'mth'
 seasons = aio.SeasonAbbrs
 
 """
-Build seasonal DataCubes from input data.
+Build seasonal DataCubes from input data.  Ingest is I/O bound, and
+NumPy releases the GIL while reading, so the seasons are ingested
+concurrently, one thread each.
 """
+def build_season_cube(season):
+    print 'Ingest for season %s...' % season
+    ts = time.time()
+    cube = dc.DataCube(data_root, field_name, sample_type,
+                       CycleFilter=season)
+    return season, cube, time.time() - ts
+
 season_cubes = {}
 print '%s:: Building DataCubes for variable %s...' % (my_name, field_name)
 tstart = time.time()
-for season in seasons:
-    print 'Ingest for season %s...' % season
-    ts = time.time()
-    season_cubes[season] = dc.DataCube(data_root, field_name, sample_type,
-                                       CycleFilter=season)
+ingest_pool = ThreadPool(len(seasons))
+for season, cube, ingest_time in ingest_pool.imap(build_season_cube, seasons):
+    season_cubes[season] = cube
     print 'Ingest of %d files for season %s completed in %s sec.' % (season_cubes[season].ntimes,
                                                                      season, 
-                                                                     time.time() - ts)
+                                                                     ingest_time)
+ingest_pool.close()
+ingest_pool.join()
 
 print 'Ingest for all seasons of field %s completed in %s sec.' % (field_name, 
                                                                    time.time() - tstart)
 
+"""
+Figures for the windowed PDFs and the time-shifted KLDs, reused for
+every season.
+"""
+tdpdf_plot = build_mesh_plot('Final Year of 30-Year Sampling Window',
+                             field_name, 'Probability Density')
+kld_plot = build_mesh_plot('Final Year of 30-Year p-Sampling Window',
+                           'Final Year of 30-Year q-Sampling Window',
+                           '$D_{KL}(p||q)$ (bits)')
+
 """
 Processing of masked data to obtain pdfs.  
 First, the overall, whole-sample pdfs'
 """
 full_pdfs = {}
 for season in seasons:
-    sample = season_cubes[season].data[~season_cubes[season].data.mask]
+    sample = season_cubes[season].validSample()
     print 'Dimensions of unmasked data for season %s = ' % season, sample.shape
 
     """
@@ -86,7 +200,7 @@ for season in seasons:
     """
     if field_name in ['FWDis', 'FWE', 'FWPrec', 'FWPt', 'FWRun', 
                       'FWSoil', 'FWTra', 'FWwc']:
-        sample = sample * 1000.
+        sample *= 1000.
 
     num_times = season_cubes[season].ntimes
     num_years = num_times / 3
@@ -114,9 +228,9 @@ for season in seasons:
     varying index.  Then, just do some strided slicing in a loop to
     extract the temporal windows for the whole domain.
 
-    Each temporal window is fed into np.histogram() with a fixed 
-    set of bounding values and number of bins.  This will make it
-    easy to create raster plots of the time-evolving density.
+    Every temporal window is binned with a fixed set of bounding 
+    values and number of bins.  This will make it easy to create 
+    raster plots of the time-evolving density.
     """
     num_locs = sample.size / num_times
     samp2D = np.reshape(sample, (num_locs, num_times))
@@ -131,55 +245,72 @@ for season in seasons:
     histart = time.time()
 
     """
-    Set up ordinate and abcissa slices for tdpdf.
+    Set up the tdpdf densities, one row per window.  Every window
+    shares the same bin edges, so these are stored once.  Single
+    precision is ample for the densities, and halves the memory
+    traffic of the KLD computation.
     """
-    tdpdf_y = np.ndarray((num_wins, num_bins), dtype='float64')
-    tdpdf_x = np.ndarray((num_wins, num_bins+1), dtype='float64')
+    tdpdf_y = np.empty((num_wins, num_bins), dtype='float32')
 
-    for win in range(0, num_wins):
-        offset = win_slide * win
-        start = offset
-        stop = offset + win_size
-        win_sample = samp2D[:,start:stop]
-
-        y,x = np.histogram(win_sample, bins=num_bins, range=(sample_min, sample_max), density=True)
-        tdpdf_y[win,:] = y
-        tdpdf_x[win,:] = x
+    """
+    The bins are the same for every window, so assign each sample 
+    value its bin once, as np.histogram() would with these bins and 
+    range (the maximum value falls in the last bin).
+
+    A window's histogram is the sum of the histograms of its time
+    steps.  Offsetting each time step's bin indices by num_bins times
+    the time index, a single bincount() gives every time step's 
+    histogram at once.  Each window's histogram is then the difference
+    of the running sums of these at the window's ends; the ends of all
+    windows are strided views of the running sums.
+    """
+    edges = np.linspace(sample_min, sample_max, num_bins + 1)
+    bin_scale = num_bins / float(sample_max - sample_min)
+    #
+    # The bin positions are scaled and clipped in a single float32
+    # buffer, and then truncated to int32 indices (num_times * num_bins
+    # is far below 2**31), so the temporaries are two 4-byte copies of
+    # the sample.
+    scaled = np.subtract(samp2D, sample_min, dtype=np.float32)
+    np.multiply(scaled, bin_scale, out=scaled)
+    np.clip(scaled, 0, num_bins - 1, out=scaled)
+    digitized = scaled.astype(np.int32)
+    del scaled
+    density_norm = 1. / (samp2D.shape[0] * win_size * np.diff(edges))
+
+    digitized += np.arange(num_times, dtype=np.int32) * num_bins
+    step_counts = np.bincount(digitized.ravel(),
+                              minlength=num_times * num_bins)
+    cum_counts = np.zeros((num_times + 1, num_bins), dtype=np.int64)
+    np.cumsum(step_counts.reshape(num_times, num_bins), axis=0,
+              out=cum_counts[1:])
+    last_start = (num_wins - 1) * win_slide
+    win_starts = cum_counts[0:last_start + 1:win_slide]
+    win_stops = cum_counts[win_size:last_start + win_size + 1:win_slide]
+    tdpdf_y[:] = (win_stops - win_starts) * density_norm
 
     histime = time.time() - histart
     
     print 'Time to build tdpdf for field %s and season %s = %s sec' % (field_name, season, histime)
     print 'Shape of density values = ',tdpdf_y.shape
-    print 'Shape of bin edge array = ',tdpdf_x.shape
+    print 'Shape of bin edge array = ',edges.shape
 
-    num_pdf_slices = tdpdf_x.shape[0]
+    num_pdf_slices = num_wins
     first_pdf_year = end_year - num_pdf_slices + 1
     last_pdf_year = end_year
 
     time_axis = np.linspace(first_pdf_year, last_pdf_year, num_pdf_slices)
     print 'season = ',season,' time_axis = ',time_axis
-    bin_edges = tdpdf_x[0,:-1]
+    bin_edges = edges[:-1]
     print 'season = ',season,' bin_edges = ',bin_edges
 
     X,Y = np.meshgrid(time_axis, bin_edges)
 
-    plt.figure(facecolor="white")
-    plt.pcolormesh(X, Y, tdpdf_y.transpose())
-    plt.autoscale(enable=True, axis='x', tight=True)
-    plt.autoscale(enable=True, axis='y', tight=True)
     title = '30-Year Windowed PDFs (' + field_name + ')'
     subtitle = season.upper() + ' ' + str(start_year) + '-' + str(end_year) + ' (' + str(num_bins) + ' bins)'
     title = title + '\n' + subtitle
-    plt.title(title)
-    plt.xlabel('Final Year of 30-Year Sampling Window')
-    plt.ylabel(field_name)
-    cbar = plt.colorbar()
-    cbar.set_label('Probability Density')
-    """
-    plt.show()
-    """
     output_file = 'tdpdf_' + field_name + '_' + str(start_year) + '-' + str(end_year) + '_' + season + '_200_bins' + '.png'
-    plt.savefig(output_file)
+    save_mesh_plot(tdpdf_plot, X, Y, tdpdf_y.transpose(), title, output_file)
 
     """
     Code currently commented out due to persistent NaN problem.
@@ -190,36 +321,26 @@ for season in seasons:
     create the KLD array.
     """
     bin_width = bin_edges[1] - bin_edges[0]
-    kld_values = np.zeros((num_wins, num_wins), dtype='float64')
     tstart_kld = time.time()
     print 'Season = ',season,' Minimum tdpdf value = ',tdpdf_y.min()
     print 'Season = ',season,' Maximum tdpdf value = ',tdpdf_y.max()
-    for i in range(0, num_wins):
-        p = tdpdf_y[i,:]
-        p = (p + 1.e-8) / (1. + p.size * 1.e-8)
-        for j in range(0, num_wins):
-            q = tdpdf_y[j,:]
-            kld_values[i, j] = compute_KLD(p, q, bin_width)
+    """
+    The p densities are smoothed so that they are nonzero everywhere;
+    the q densities are used as is.
+    """
+    p_smoothed = (tdpdf_y + 1.e-8) / (1. + num_bins * 1.e-8)
+    kld_values = compute_KLD_field(p_smoothed, tdpdf_y, bin_width)
 
     print 'Total time to compute time-shifted KLD field = ',time.time()-tstart_kld,' sec.'
     print 'season = ',season,' min(kld) = ',kld_values.min(),' max(kld) = ',kld_values.max()
 
     X,Y = np.meshgrid(time_axis, time_axis)
 
-    plt.figure(facecolor="white")
-    plt.pcolormesh(X, Y, kld_values.transpose())
-    plt.autoscale(enable=True, axis='x', tight=True)
-    plt.autoscale(enable=True, axis='y', tight=True)
     title = 'Time-Shifted Kullback-Leibler Divergence (' + field_name + ')'
     subtitle = season.upper() + ' ' + str(start_year) + '-' + str(end_year) + ' (' + str(num_bins) + ' bins)'
     title = title + '\n' + subtitle
-    plt.title(title)
-    plt.xlabel('Final Year of 30-Year p-Sampling Window')
-    plt.ylabel('Final Year of 30-Year q-Sampling Window')
-    cbar = plt.colorbar()
-    cbar.set_label('$D_{KL}(p||q)$ (bits)')
     output_file = 'ts_kld_' + field_name + '_' + str(start_year) + '-' + str(end_year) + '_' + season + '_200_bins' + '.png'
-    plt.savefig(output_file)
+    save_mesh_plot(kld_plot, X, Y, kld_values.transpose(), title, output_file)
 
     
 
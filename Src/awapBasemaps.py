@@ -1,7 +1,23 @@
+import math
+import os.path
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
 import numpy as np
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
 import awapRegion as ar
 
-from mpl_toolkits.basemap import Basemap
+"""
+Basemap (and, through it, GEOS and the GSHHS coastline metadata) is
+slow to import, so it and pyproj are imported only when a Basemap or
+projection is first built.
+"""
+
 """
 Major and minor axes of the WGS84 ellipsoid.
 """
@@ -9,19 +25,103 @@ rEquat = 6378137.00
 rPolar = 6356752.3142
 
 """
-LLC Reference Latitudes
+LLC Reference Latitudes (the BoM's standard parallels, 10S and 40S).
 """
-AusLLCLats = [-10., --40.]
+AusLLCLats = (-10., -40.)
 """
 BBox shifts used for LCC projections.  Determined through
 trial and error.  Layout is of shift parameters is
-[LLC_lat, LLC_lon, URC_lat, URC_lon]
+(LLC_lat, LLC_lon, URC_lat, URC_lon)
+"""
+AusBBoxShifts = (0., -7., 2., 0.)
+AusBBoxShiftsArray = np.array(AusBBoxShifts, dtype=np.float64)
+TasBBoxShifts = ()
+VicBBoxShifts = ()
+
+"""
+Basemaps already built, keyed by their LCC projection parameters.
+Full-resolution Basemaps are expensive to build (GSHHS coastline
+reading and clipping), so each distinct set of parameters is built
+only once per process.
 """
-AusBBoxShifts = [0., -7., 2., 0.]
-TasBBoxShifts = []
-VicBBoxShifts = []
+basemapCache = {}
 
-def getAWAP_LLC_Basemap(Region):
+"""
+PROJ projections of Basemaps, keyed by Basemap id; see getProjection().
+"""
+projCache = {}
+
+def buildLLC_Basemap(LLCLon, LLCLat, URCLon, URCLat, CenterLat, CenterLon,
+                     TrueLat1, TrueLat2, Resolution='f', AreaThresh=1000.):
+    """
+    Get an LCC Basemap with the given corners, center, and reference
+    latitudes, building it only if it has not been built before.
+
+    Parameters
+    ----------
+    LLCLon, LLCLat, URCLon, URCLat : float
+        Lower-left and upper-right corners of the map.
+    CenterLat, CenterLon : float
+        Projection origin.
+    TrueLat1, TrueLat2 : float
+        LCC reference latitudes.
+    Resolution : string or None
+        Coastline resolution:  'c', 'l', 'i', 'h', 'f', or None.
+    AreaThresh : float
+        Coastline features smaller than this (km^2) are not drawn.
+
+    Returns
+    ------
+    BaseMap
+        Matplotlib-Basemap Basemap object, shared by all callers
+        requesting the same parameters.
+    """
+    """
+    Round the key, so that parameters computed from the same Region
+    by different arithmetic still match.
+    """
+    key = tuple([round(x, 6) for x in (LLCLon, LLCLat, URCLon, URCLat,
+                                       CenterLat, CenterLon,
+                                       TrueLat1, TrueLat2, AreaThresh)])
+    key += (Resolution,)
+    if key not in basemapCache:
+        from mpl_toolkits.basemap import Basemap
+        basemapCache[key] = Basemap(llcrnrlon=LLCLon, llcrnrlat=LLCLat,
+                                    urcrnrlon=URCLon, urcrnrlat=URCLat,
+                                    rsphere=(rEquat, rPolar), anchor='C',
+                                    resolution=Resolution,
+                                    area_thresh=AreaThresh,
+                                    projection='lcc',
+                                    lat_1=TrueLat1, lat_2=TrueLat2,
+                                    lat_0=CenterLat, lon_0=CenterLon)
+    return basemapCache[key]
+
+def getLLC_Corners(Bounds, Shifts=AusBBoxShiftsArray):
+    """
+    Shift region bounding boxes to LCC Basemap corners, and find their
+    centers, for any number of regions at once.
+
+    Parameters
+    ----------
+    Bounds : array_like
+        (N, 4) or (4,) region bounds, laid out as
+        (minLat, minLon, maxLat, maxLon).
+    Shifts : array_like
+        Bounding box shifts, laid out as
+        (LLC_lat, LLC_lon, URC_lat, URC_lon).
+
+    Returns
+    -------
+    tuple of ndarrays
+        Corners, laid out as (LLC_lat, LLC_lon, URC_lat, URC_lon), and
+        centers, laid out as (centerLat, centerLon).
+    """
+    bounds = np.asarray(Bounds, dtype=np.float64)
+    corners = bounds + Shifts
+    centers = 0.5 * (bounds[...,:2] + bounds[...,2:])
+    return corners, centers
+
+def getAWAP_LLC_Basemap(Region, Resolution='f', AreaThresh=1000.):
     """
     Get Australian Continent Basemap.
     
@@ -33,39 +133,315 @@ def getAWAP_LLC_Basemap(Region):
     ----------
     Region : awapRegion.Region
         Region for which LCC basemap is desired.
+
+    Resolution : string or None
+        Coastline resolution:  'c' (crude), 'l' (low), 'i'
+        (intermediate), 'h' (high), or 'f' (full, the default).
+        Callers that only need the projection, and draw no
+        coastlines, should pass None, which skips reading the
+        coastline data altogether.
+
+    AreaThresh : float
+        Coastline features smaller than this (km^2) are not drawn.
     
     Returns
     ------
     BaseMap
-        Matplotlib-Basemap Basemap object.
+        Matplotlib-Basemap Basemap object.  Basemaps are cached, so
+        repeated calls for the same Region return the same object.
     """
     
     """
     BoM projection parameters.
     """
     projType = 'lcc'
-    trueLat1 = AusLLCLats[0]
-    trueLat2 = AusLLCLats[1]
+    trueLat1, trueLat2 = AusLLCLats
     
     """
     Shift corner ponts using predefined offsets.
     """
-    llcLat = Region.minLat + AusBBoxShifts[0]
-    llcLon = Region.minLon + AusBBoxShifts[1]
-    urcLat = Region.maxLat + AusBBoxShifts[2]
-    urcLon = Region.maxLon + AusBBoxShifts[3]
-    
-    centerLat = 0.5 * (Region.minLat + Region.maxLat)
-    centerLon = 0.5 * (Region.minLon + Region.maxLon)
+    corners, centers = getLLC_Corners((Region.minLat, Region.minLon,
+                                       Region.maxLat, Region.maxLon))
+    llcLat, llcLon, urcLat, urcLon = corners.tolist()
+    centerLat, centerLon = centers.tolist()
     
     """
-    Create the basemap.
+    Get the basemap.
     """
-    bm = Basemap(llcrnrlon=llcLon, llcrnrlat=llcLat,
-                 urcrnrlon=urcLon, urcrnrlat=urcLat,
-                 rsphere=(rEquat, rPolar), anchor='C', resolution='f',
-                 area_thresh=1000., projection='lcc',
-                 lat_1=trueLat1, lat_2=trueLat2, lat_0=centerLat,
-                 lon_0=centerLon)
+    bm = buildLLC_Basemap(llcLon, llcLat, urcLon, urcLat,
+                          centerLat, centerLon, trueLat1, trueLat2,
+                          Resolution=Resolution, AreaThresh=AreaThresh)
     
     return bm
+
+def getAWAP_LLC_Basemaps(Regions, Resolution='f', AreaThresh=1000.):
+    """
+    Get Basemaps for several Regions at once.
+
+    Equivalent to [getAWAP_LLC_Basemap(r) for r in Regions], but the
+    corners and centers of all Regions are computed in one batch, and
+    Regions sharing a bounding box share one Basemap.
+
+    Parameters
+    ----------
+    Regions : iterable of awapRegion.Region
+        Regions for which LCC basemaps are desired.
+    Resolution : string or None
+        Coastline resolution; see getAWAP_LLC_Basemap().
+    AreaThresh : float
+        Coastline features smaller than this (km^2) are not drawn.
+
+    Returns
+    ------
+    list
+        Matplotlib-Basemap Basemap objects, one per Region.
+    """
+    regions = list(Regions)
+    if len(regions) == 0:
+        return []
+    bounds = np.array([(r.minLat, r.minLon, r.maxLat, r.maxLon)
+                       for r in regions], dtype=np.float64)
+    corners, centers = getLLC_Corners(bounds)
+    trueLat1, trueLat2 = AusLLCLats
+    baseMaps = []
+    for (llcLat, llcLon, urcLat, urcLon), (centerLat, centerLon) in \
+            zip(corners.tolist(), centers.tolist()):
+        baseMaps.append(buildLLC_Basemap(llcLon, llcLat, urcLon, urcLat,
+                                         centerLat, centerLon,
+                                         trueLat1, trueLat2,
+                                         Resolution=Resolution,
+                                         AreaThresh=AreaThresh))
+    return baseMaps
+
+def buildCyl_Basemap(LLCLon, LLCLat, URCLon, URCLat, Resolution='f',
+                     PickleFile=None):
+    """
+    Get a cylindrical equidistant Basemap with the given corners, building
+    it only if it has not been built before.
+
+    Parameters
+    ----------
+    LLCLon, LLCLat, URCLon, URCLat : float
+        Lower-left and upper-right corners of the map.
+    Resolution : string or None
+        Coastline resolution:  'c', 'l', 'i', 'h', 'f', or None.
+    PickleFile : string
+        File in which to keep a pickled copy of the Basemap, loaded
+        instead of building the Basemap by later runs; default None
+        keeps no copy.  Remove the file if the corners change.
+
+    Returns
+    ------
+    BaseMap
+        Matplotlib-Basemap Basemap object, shared by all callers
+        requesting the same parameters.
+    """
+    key = ('cyl',) + tuple([round(x, 6) for x in (LLCLon, LLCLat,
+                                                  URCLon, URCLat)])
+    key += (Resolution,)
+    if key not in basemapCache:
+        if PickleFile is not None and os.path.isfile(PickleFile):
+            with open(PickleFile, 'rb') as infile:
+                basemapCache[key] = pickle.load(infile)
+        else:
+            from mpl_toolkits.basemap import Basemap
+            basemapCache[key] = Basemap(projection='cyl',
+                                        llcrnrlon=LLCLon, llcrnrlat=LLCLat,
+                                        urcrnrlon=URCLon, urcrnrlat=URCLat,
+                                        resolution=Resolution)
+            if PickleFile is not None:
+                with open(PickleFile, 'wb') as outfile:
+                    pickle.dump(basemapCache[key], outfile,
+                                pickle.HIGHEST_PROTOCOL)
+    return basemapCache[key]
+
+def getAWAP_Cyl_Basemap(Region, Resolution='f', Margin=2., PickleFile=None):
+    """
+    Get a cylindrical equidistant Basemap framing a Region.
+
+    Parameters
+    ----------
+    Region : awapRegion.Region
+        Region for which the basemap is desired.
+    Resolution : string or None
+        Coastline resolution; see getAWAP_LLC_Basemap().
+    Margin : float
+        Border around the Region's bounding box, in grid cells.
+    PickleFile : string
+        Pickled copy of the Basemap; see buildCyl_Basemap().
+
+    Returns
+    ------
+    BaseMap
+        Matplotlib-Basemap Basemap object.  Basemaps are cached, so
+        repeated calls for the same Region return the same object.
+    """
+    return buildCyl_Basemap(Region.minLon - Margin * Region.dLon,
+                            Region.minLat - Margin * Region.dLat,
+                            Region.maxLon + Margin * Region.dLon,
+                            Region.maxLat + Margin * Region.dLat,
+                            Resolution=Resolution, PickleFile=PickleFile)
+
+def getProjection(BaseMap):
+    """
+    Get the PROJ projection underlying a Basemap.
+
+    Parameters
+    ----------
+    BaseMap : Basemap
+        Basemap whose projection is desired.
+
+    Returns
+    -------
+    tuple
+        (pyproj.Proj, x0, y0):  the projection, and the projected lower
+        left corner of the map, which Basemap places at the origin.
+    """
+    key = id(BaseMap)
+    if key not in projCache or projCache[key][0] is not BaseMap:
+        try:
+            import pyproj
+        except ImportError:
+            from mpl_toolkits.basemap import pyproj
+        proj = pyproj.Proj(BaseMap.projparams)
+        x0, y0 = proj(BaseMap.llcrnrlon, BaseMap.llcrnrlat)
+        projCache[key] = (BaseMap, proj, x0, y0)
+    return projCache[key][1:]
+
+def projectLonLat(BaseMap, Lons, Lats):
+    """
+    Project longitude/latitude arrays to Basemap map coordinates.
+
+    Equivalent to BaseMap(Lons, Lats), but calls PROJ directly on
+    whole contiguous arrays, avoiding Basemap's per-call overhead.
+
+    Parameters
+    ----------
+    BaseMap : Basemap
+        Basemap whose map coordinates are desired.
+    Lons, Lats : array_like
+        Longitudes and latitudes in degrees; broadcast against each other.
+
+    Returns
+    -------
+    tuple of ndarrays
+        x, y map projection coordinates.
+    """
+    proj, x0, y0 = getProjection(BaseMap)
+    lons, lats = np.broadcast_arrays(np.asarray(Lons, dtype=np.float64),
+                                     np.asarray(Lats, dtype=np.float64))
+    x, y = proj(np.ascontiguousarray(lons), np.ascontiguousarray(lats))
+    return np.asarray(x) - x0, np.asarray(y) - y0
+
+def lccConeConstants(TrueLat1, TrueLat2, Lat0, A, B):
+    """
+    Constants of an ellipsoidal LCC projection (Snyder, Map
+    Projections--A Working Manual, eqs. 15-8 to 15-11, 14-15).
+
+    Parameters
+    ----------
+    TrueLat1, TrueLat2 : float
+        Reference latitudes in degrees.
+    Lat0 : float
+        Latitude of origin in degrees.
+    A, B : float
+        Equatorial and polar radii of the ellipsoid.
+
+    Returns
+    -------
+    tuple
+        (e, n, aF, rho0):  eccentricity, cone constant, the radius
+        scale a * F, and the radius of the latitude of origin.
+    """
+    e = math.sqrt(1. - (B / A) ** 2)
+    def m(phi):
+        return math.cos(phi) / math.sqrt(1. - (e * math.sin(phi)) ** 2)
+    def t(phi):
+        eSin = e * math.sin(phi)
+        return (math.tan(0.25 * math.pi - 0.5 * phi) /
+                ((1. - eSin) / (1. + eSin)) ** (0.5 * e))
+    phi1 = math.radians(TrueLat1)
+    phi2 = math.radians(TrueLat2)
+    if abs(phi1 - phi2) > 1.e-10:
+        n = ((math.log(m(phi1)) - math.log(m(phi2))) /
+             (math.log(t(phi1)) - math.log(t(phi2))))
+    else:
+        n = math.sin(phi1)
+    aF = A * m(phi1) / (n * t(phi1) ** n)
+    rho0 = aF * t(math.radians(Lat0)) ** n
+    return e, n, aF, rho0
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True)
+    def lccForwardKernel(Lons, Lats, Lon0, E, N, AF, Rho0, X0, Y0, X, Y):
+        """
+        Compiled ellipsoidal LCC forward projection of 1D lon/lat
+        arrays (degrees) into X, Y, offset by (X0, Y0); parallel over
+        points.
+        """
+        lam0 = np.radians(Lon0)
+        for i in prange(Lons.shape[0]):
+            phi = np.radians(Lats[i])
+            dLam = np.radians(Lons[i]) - lam0
+            if dLam > np.pi:
+                dLam -= 2. * np.pi
+            elif dLam < -np.pi:
+                dLam += 2. * np.pi
+            eSin = E * np.sin(phi)
+            t = (np.tan(0.25 * np.pi - 0.5 * phi) /
+                 ((1. - eSin) / (1. + eSin)) ** (0.5 * E))
+            rho = AF * t ** N
+            theta = N * dLam
+            X[i] = rho * np.sin(theta) - X0
+            Y[i] = Rho0 - rho * np.cos(theta) - Y0
+
+def projectLonLatLCC(BaseMap, Lons, Lats):
+    """
+    Project longitude/latitude arrays to the map coordinates of an LCC
+    Basemap, such as those from getAWAP_LLC_Basemap().
+
+    Uses a compiled, parallel LCC kernel if Numba is available;
+    otherwise, and for non-LCC Basemaps, uses projectLonLat().
+
+    Parameters
+    ----------
+    BaseMap : Basemap
+        Basemap whose map coordinates are desired.
+    Lons, Lats : array_like
+        Longitudes and latitudes in degrees; broadcast against each other.
+
+    Returns
+    -------
+    tuple of ndarrays
+        x, y map projection coordinates.
+    """
+    params = BaseMap.projparams
+    if njit is None or params.get('proj') != 'lcc':
+        return projectLonLat(BaseMap, Lons, Lats)
+
+    lons, lats = np.broadcast_arrays(np.asarray(Lons, dtype=np.float64),
+                                     np.asarray(Lats, dtype=np.float64))
+    shape = lons.shape
+    lons = np.ascontiguousarray(lons).ravel()
+    lats = np.ascontiguousarray(lats).ravel()
+
+    a = params.get('a', params.get('R'))
+    b = params.get('b', a)
+    lat1 = params['lat_1']
+    lat2 = params.get('lat_2', lat1)
+    e, n, aF, rho0 = lccConeConstants(lat1, lat2, params['lat_0'], a, b)
+
+    """
+    Basemap puts the lower left corner of the map at the origin.
+    """
+    corner = np.array([BaseMap.llcrnrlon]), np.array([BaseMap.llcrnrlat])
+    x0 = np.empty(1)
+    y0 = np.empty(1)
+    lccForwardKernel(corner[0], corner[1], params['lon_0'], e, n, aF, rho0,
+                     0., 0., x0, y0)
+
+    x = np.empty(lons.shape)
+    y = np.empty(lons.shape)
+    lccForwardKernel(lons, lats, params['lon_0'], e, n, aF, rho0,
+                     x0[0], y0[0], x, y)
+    return x.reshape(shape), y.reshape(shape)
@@ -0,0 +1,57 @@
+"""
+awapColours.py:  Colour maps for AWAP/BIOS2 plots
+
+This module supports the following operations:
+
+1) Construction of matplotlib colour maps from AWAP/BIOS2 colour table
+files, each table being parsed only once per process.
+"""
+
+"""
+System and standard library modules.
+"""
+import os.path
+
+"""
+Matplotlib.
+"""
+from matplotlib import colors as cols
+
+"""
+AWAP/BIOS2 file I/O.
+"""
+import awapIO as aio
+
+"""
+Colour maps already built, keyed by colour table directory, field and
+colour map name.  Colour maps are not modified by plotting, so one
+instance is shared by every plot of a field.
+"""
+colourMapCache = {}
+
+def getColourMap(CTPath, Field, Name=None):
+    """
+    Returns the colour map defined by a field's colour table.
+
+    Parameters
+    ----------
+    CTPath : string
+        Directory path location of colour table files.
+    Field : string
+        Name of variable for which a colour map is to be constructed.
+    Name : string
+        Name of the colour map; value None names it after Field
+        (e.g., 'tmaxScale').
+
+    Returns
+    -------
+    matplotlib.colors.LinearSegmentedColormap
+        The colour map, shared with other callers.
+    """
+    if Name is None:
+        Name = Field + 'Scale'
+    key = (os.path.abspath(CTPath), Field.lower(), Name)
+    if key not in colourMapCache:
+        colourDict = aio.readAWAP_ColourTable(CTPath, Field.lower())
+        colourMapCache[key] = cols.LinearSegmentedColormap(Name, colourDict)
+    return colourMapCache[key]
@@ -8,7 +8,10 @@ Excel-format (.csv) files.
 
 2) Wrangling of large numbers of AWAP/BIOS2 files.  This function
 relies on the conventions for naming AWAP/BIOS2 data files.
+
+The module runs under both Python 2.7 and Python 3.
 """
+from __future__ import print_function
 
 """
 System and standard library modules.
@@ -16,8 +19,11 @@ System and standard library modules.
 import sys
 import os
 import re
-import glob
 import csv
+import shutil
+import tempfile
+import multiprocessing
+from multiprocessing.pool import ThreadPool
 
 """
 NumPy.
@@ -30,19 +36,38 @@ Julian date module
 """
 import jdcal
 
+"""
+Blosc-compressed array files, through bloscpack, if available; used
+for compressed sidecar copies of .flt files.
+"""
+try:
+    import bloscpack
+except ImportError:
+    bloscpack = None
+
 """
 Acceptable filename extensions
 """
 floatFilenameExt = '.flt'
+int16FilenameExt = '.flt16'
 headerFilenameExt = '.hdr'
 lutFilenameExt = '.csv'
 csvFilenameExt = '.csv'
 jpegFilenameExt = '.jpeg'
+bloscFilenameExt = '.bp'
+
+"""
+Regular expressions for the AWAP/BIOS2 file naming convention, compiled
+once:  the YYYYMMDD date, and the separators between filename chunks.
+"""
+YMDPattern = re.compile(r'\d{8}')
+NameChunkSeparators = re.compile(r'\W+|_')
 
 """
 Set of acceptable data sampling intervals.
 """
 SamplingIntervals = ['mth', 'ann']
+SamplingIntervalSet = frozenset(SamplingIntervals)
 
 def is_a_SamplingInterval(IntervalName):
     """
@@ -61,10 +86,10 @@ def is_a_SamplingInterval(IntervalName):
         True (False) if the candidate sampling interval is valid
         (invalid).
     """
-    if IntervalName in SamplingInterval:
+    if IntervalName in SamplingIntervalSet:
         return True
     else:
-        print 'WARNING--Unrecognised sampling interval name ', IntervalName
+        print('WARNING--Unrecognised sampling interval name ', IntervalName)
         return False
 
 """
@@ -110,6 +135,14 @@ def is_a_Month(MonthStr):
     else:
         return False
 
+"""
+Built-in integer types; Python 3 has no separate long type.
+"""
+try:
+    integerTypes = (int, long)
+except NameError:
+    integerTypes = (int,)
+
 def is_a_MonthNum(Num):
     """
     Checks to see if 0 < Num < 13 and Num is an integer.
@@ -125,7 +158,7 @@ def is_a_MonthNum(Num):
     bool
         True (False) if the argument is (not) a valid month number.
     """
-    if ((0 < Num) and (Num < 13)) and isinstance(Num, (int, long)):
+    if ((0 < Num) and (Num < 13)) and isinstance(Num, integerTypes):
         return True
     else:
         return False
@@ -185,7 +218,7 @@ def seasonToMonths(SeasonStr):
     if is_a_Season(SeasonStr):
         return SeasonDict[SeasonStr.lower()]
     else:
-        print 'awapIO.seasonToMonths:  FATAL--Argument ', SeasonStr, ' not a season!'
+        print('awapIO.seasonToMonths:  FATAL--Argument ', SeasonStr, ' not a season!')
         sys.exit()
 
 """
@@ -193,6 +226,7 @@ Files containing percentile rank data will be tagged as such in their
 names.  PercentileRankTag contains acceptable tags.
 """
 PercentileRankTag = ['pcr']
+PercentileRankTagSet = frozenset(PercentileRankTag)
 
 def isPercentileRankFile(FileName):
     """
@@ -212,19 +246,42 @@ def isPercentileRankFile(FileName):
     bool
         True (False) if the file is (not) a percentile rank file.
     """
-    nameChunks = re.split('\W+|_', FileName)
-    for ptag in PercentileRankTag:
-        for chunk in nameChunks:
-            if ptag == chunk:
-                return True
-    return False
+    nameChunks = NameChunkSeparators.split(FileName)
+    return not PercentileRankTagSet.isdisjoint(nameChunks)
+
+"""
+Do not alter the following dictionary unless the AWAP .hdr format
+changes!  Its keys are the string tokens used immediately preceding
+data values in an AWAP header file; its values are the types of those
+data values.
+"""
+HeaderKeyTypes = {'ncols': int, 'nrows': int,
+                  'xllcorner': float, 'yllcorner': float,
+                  'cellsize': float, 'nodata_value': float,
+                  'byteorder': str, 'scale': float, 'offset': float}
+
+"""
+Optional header keys, written only when present in a header
+dictionary:  the scale and offset of quantised (.flt16) data.
+"""
+OptionalHeaderKeys = ['scale', 'offset']
+
+"""
+Contents of header files already read by readAWAP_hdr(), keyed by the
+file's absolute path and modification time, so that a file changed on
+disk is read again.  Regions, subregions and statistics built on one
+domain each read its header.
+"""
+hdrCache = {}
 
 def readAWAP_hdr(FileName):
     """
     Reads an AWAP header file.
     
     Processes the header file and stores spatial domain, byte-ordering,
-    and missing value information in dictionary format.
+    and missing value information in dictionary format.  Each call
+    returns a new dictionary, which callers may modify, but the file
+    itself is only read again if it has changed.
     
     Parameters
     ----------
@@ -238,53 +295,37 @@ def readAWAP_hdr(FileName):
     """
 
     """
-    Do not alter the following line unless the AWAP .hdr format
-    changes!  These keys are the string tokens used immediately
-    preceding data values in an AWAP header file.  The only extra
-    key is the namestem of the .hdr file from which the dictionary
-    was compiled.
+    Start with the name of the header file, minus the .hdr
+    extension.  This is the only key not found in the file.
     """
-    keys = ['ncols', 'nrows', 'xllcorner', 'yllcorner',
-            'cellsize', 'nodata_value', 'byteorder']
+    hdrDict = {'fileNameStem': chop(FileName, '.hdr')}
+    
+    key = (os.path.abspath(FileName), os.path.getmtime(FileName))
+    if key in hdrCache:
+        hdrDict.update(hdrCache[key])
+        return hdrDict
     
     header = open(FileName, 'r')
-    hdrDict = {}
-    """
-    Add first entry--the name of the header file, minus the
-    .hdr extension.
-    """
-    hdrDict.update({'fileNameStem': chop(FileName, '.hdr')})
+    fileValues = {}
     
     """
-    Scan file for each key, read value immediately following it,
-    and add a dictionary entry.
+    Each line holds a key followed by its value.  Look the key up,
+    read in the correct type of numerical or string data, and add a
+    dictionary entry.
     """
     for line in header:
         # jwl--changed to split on *any* whitespace
         # words = (line.strip()).rsplit(' ')
-        words = (line.strip()).split()
-        for key in keys:
-            if key in words:
-                """
-                Read in the correct type of numerical or
-                string data.
-                """
-                valInd = words.index(key) + 1
-                if key in ['ncols', 'nrows']:
-                    value = int(words[valInd])
-                elif key in ['cellsize', 'xllcorner', 'yllcorner', 'nodata_value']:
-                    value = float(words[valInd])
-                elif key in ['byteorder']:
-                    value = words[valInd]
-                else:
-                    print 'ERROR--Pattern "', key, '" not recognized.'
-                    sys.exit()
-                """
-                Add this value to the dictionary.
-                """
-                hdrDict.update({key: value})
-                break
+        words = line.split()
+        if len(words) < 2:
+            continue
+        valueType = HeaderKeyTypes.get(words[0])
+        if valueType is not None:
+            fileValues[words[0]] = valueType(words[1])
+    header.close()
     
+    hdrCache[key] = fileValues
+    hdrDict.update(fileValues)
     return hdrDict
 
 def writeAWAP_hdr(HeaderDict, FileName=None):
@@ -303,22 +344,85 @@ def writeAWAP_hdr(HeaderDict, FileName=None):
     """
     
     if FileName != None:
-        outFile = open(FileName, 'w')
+        outFileName = FileName
     else:
-        outFileName = HeaderDict['fileNameStem'] + '.hdr'
-        outFile = open(outFileName)
+        outFileName = HeaderDict['fileNameStem'] + headerFilenameExt
+
+    """
+    Format the whole header, then write it out in one call.
+    """
+    header = (' ncols %s\n'
+              ' nrows %s\n'
+              ' xllcorner %s\n'
+              ' yllcorner %s\n'
+              ' cellsize %s\n'
+              ' nodata_value %d\n'
+              ' byteorder %s\n') % (HeaderDict['ncols'],
+                                    HeaderDict['nrows'],
+                                    HeaderDict['xllcorner'],
+                                    HeaderDict['yllcorner'],
+                                    HeaderDict['cellsize'],
+                                    int(HeaderDict['nodata_value']),
+                                    HeaderDict['byteorder'])
+    for key in OptionalHeaderKeys:
+        if key in HeaderDict:
+            header += ' %s %s\n' % (key, repr(HeaderDict[key]))
+    with open(outFileName, 'w') as outFile:
+        outFile.write(header)
 
-    outFile.write(' ncols ' + str(HeaderDict['ncols']) + '\n')
-    outFile.write(' nrows ' + str(HeaderDict['nrows']) + '\n')
-    outFile.write(' xllcorner ' + str(HeaderDict['xllcorner']) + '\n')
-    outFile.write(' yllcorner ' + str(HeaderDict['yllcorner']) + '\n')
-    outFile.write(' cellsize ' + str(HeaderDict['cellsize']) + '\n')
-    outFile.write(' nodata_value ' +
-                  str(int(HeaderDict['nodata_value'])) + '\n')
-    outFile.write(' byteorder ' + str(HeaderDict['byteorder']) + '\n')
-    outFile.close
+"""
+Byte orders of .flt file data, keyed by .hdr file byteorder value.
+"""
+ByteOrderCodes = {'LSBFIRST': '<', 'MSBFIRST': '>'}
 
-def readAWAP_flt(HeaderDict, FileName=None):
+def getFltDtype(HeaderDict, Kind='f4'):
+    """
+    Returns the NumPy dtype of the data in a .flt file.
+
+    .flt files hold 4-byte floats (.flt16 files, 2-byte integers), in
+    the byte order given by the header; headers without a recognised
+    byte order are taken to be in native byte order.
+
+    Parameters
+    ----------
+    HeaderDict : dict
+        Domain and data layout information
+
+    Kind : string
+        NumPy type code of the data, without byte order.
+
+    Returns
+    -------
+    numpy dtype
+    """
+    byteOrder = ByteOrderCodes.get(HeaderDict.get('byteorder'), '=')
+    return np.dtype(byteOrder + Kind)
+
+def maskMissing(FieldData, MissingFlag):
+    """
+    Returns a masked array view of field data, masking missing values.
+
+    The missing data flag is an exact sentinel value, so the mask is
+    a single elementwise equality test against the flag, cast to the
+    data's type.  The data are not copied.
+
+    Parameters
+    ----------
+    FieldData : numpy array
+        Field data.
+
+    MissingFlag : float
+        Missing data flag (the header's nodata_value).
+
+    Returns
+    -------
+    numpy masked array
+    """
+    mask = np.equal(FieldData, FieldData.dtype.type(MissingFlag))
+    return ma.MaskedArray(FieldData, mask=mask, copy=False,
+                          fill_value=MissingFlag)
+
+def readAWAP_flt(HeaderDict, FileName=None, Window=None):
     """
     Returns a 2D NumPy masked array from a .flt file.
 
@@ -331,6 +435,11 @@ def readAWAP_flt(HeaderDict, FileName=None):
         Name of file from which the field data is read;
         value None leads to use of automatically-generated
         filename based on header dictionary information.
+
+    Window : tuple
+        (rowStart, rowStop, colStart, colStop) bounds of the part of
+        the field to read; value None reads the whole field.  Only
+        the pages holding the window are read from the file.
     
     Returns
     -------
@@ -343,21 +452,249 @@ def readAWAP_flt(HeaderDict, FileName=None):
         fileName = FileName
     
     """
-    Read in field data from .flt file, reshape into 2D array.
+    Map field data from .flt file as a 2D array.  The mapping is
+    copy-on-write:  pages are read on demand, straight from the page
+    cache, and callers may still modify the array without touching
+    the file.
     """
-    fieldData = np.fromfile(fileName, dtype='float32', count=-1)
     numLats = HeaderDict['nrows']
     numLons = HeaderDict['ncols']
-    fieldData.shape = (numLats, numLons)
+    fieldData = np.memmap(fileName, dtype=getFltDtype(HeaderDict), mode='c',
+                          shape=(numLats, numLons))
+    if Window is not None:
+        rowStart, rowStop, colStart, colStop = Window
+        fieldData = fieldData[rowStart:rowStop, colStart:colStop]
+    fieldData = fieldData.view(np.ndarray)
     
     """
     Retrieve missing data flag, apply to array to create masked array.
     """
     missingFlag = HeaderDict['nodata_value']
-    maskedField = ma.masked_values(fieldData, missingFlag)
+    maskedField = maskMissing(fieldData, missingFlag)
     
     return maskedField
 
+"""
+Missing data flag of quantised (.flt16) data.  It lies outside the
+range used for valid values, which are clipped to [-32767, 32767].
+"""
+int16MissingFlag = -32768
+
+def writeAWAP_flt_i16(Field, HeaderDict, Scale, Offset, FileName=None):
+    """
+    Write a field as quantised 16-bit integers in a .flt16 file.
+
+    Values are stored as rint((value - Offset) / Scale), halving the
+    size of the file relative to a .flt file; missing values are
+    stored as int16MissingFlag.  The scale and offset are added to
+    the header dictionary, so that writeAWAP_hdr() records them for
+    readAWAP_flt_i16().
+
+    Parameters
+    ----------
+    Field : numpy masked array (2D)
+        Field data.
+
+    HeaderDict : dict
+        Domain and data layout information; updated in place with the
+        keys 'scale' and 'offset'.
+
+    Scale : float
+        Quantisation step, in the units of the field.
+
+    Offset : float
+        Field value stored as zero.
+
+    FileName : string
+        Name of file to which the data are written; value None leads
+        to use of automatically-generated filename based on header
+        dictionary information.
+    """
+    if FileName == None:
+        fileName = HeaderDict['fileNameStem'] + int16FilenameExt
+    else:
+        fileName = FileName
+
+    quantised = np.subtract(ma.getdata(Field), Offset, dtype=np.float64)
+    quantised /= Scale
+    np.rint(quantised, out=quantised)
+    np.clip(quantised, -32767, 32767, out=quantised)
+    fieldData = quantised.astype(getFltDtype(HeaderDict, 'i2'))
+    fieldData[ma.getmaskarray(Field)] = int16MissingFlag
+    fieldData.tofile(fileName)
+
+    HeaderDict['scale'] = float(Scale)
+    HeaderDict['offset'] = float(Offset)
+
+def readAWAP_flt_i16(HeaderDict, FileName=None, AsFloat=True):
+    """
+    Returns a 2D NumPy masked array from a quantised .flt16 file.
+
+    Parameters
+    ----------
+    HeaderDict : dict
+        Domain and data layout information, including the 'scale'
+        and 'offset' of the quantised data.
+
+    FileName : string
+        Name of file from which the field data is read;
+        value None leads to use of automatically-generated
+        filename based on header dictionary information.
+
+    AsFloat : bool
+        If True, decode the data to 32-bit floats; if False, return
+        the quantised integers, e.g. for reductions that can be done
+        on them directly.
+
+    Returns
+    -------
+    numpy masked array (2D)
+    """
+    if FileName == None:
+        fileName = HeaderDict['fileNameStem'] + int16FilenameExt
+    else:
+        fileName = FileName
+
+    fieldData = np.memmap(fileName, dtype=getFltDtype(HeaderDict, 'i2'),
+                          mode='r',
+                          shape=(HeaderDict['nrows'], HeaderDict['ncols']))
+    fieldData = fieldData.view(np.ndarray)
+    mask = np.equal(fieldData, int16MissingFlag)
+    if not AsFloat:
+        return ma.MaskedArray(fieldData, mask=mask, copy=False,
+                              fill_value=int16MissingFlag)
+
+    decoded = fieldData.astype(np.float32)
+    decoded *= np.float32(HeaderDict['scale'])
+    decoded += np.float32(HeaderDict['offset'])
+    decoded[mask] = HeaderDict['nodata_value']
+    return ma.MaskedArray(decoded, mask=mask, copy=False,
+                          fill_value=HeaderDict['nodata_value'])
+
+def readAWAP_flt_blosc(HeaderDict):
+    """
+    Returns a 2D NumPy masked array from a Blosc-compressed copy of a
+    .flt file, creating the copy if need be.
+
+    The compressed copy sits beside the .flt file, with the same
+    filename stem; it is (re)written whenever it is missing or older
+    than the .flt file.  Fields are mostly smooth and have large
+    regions of missing data, so they compress well, and repeated
+    reads of a field that is not in the page cache move less data
+    off disk.  If bloscpack is not installed, the .flt file is read
+    directly.
+
+    The copy is packed under a temporary name in the same directory and
+    renamed into place, so concurrent readers (e.g., other MPI ranks)
+    never see a partly written copy.  If the copy cannot be written
+    (e.g., on a read-only data tree), the .flt data is returned anyway.
+
+    Parameters
+    ----------
+    HeaderDict : dict
+        Domain and data layout information
+
+    Returns
+    -------
+    numpy masked array (2D)
+    """
+    if bloscpack is None:
+        return readAWAP_flt(HeaderDict)
+
+    fltFileName = HeaderDict['fileNameStem'] + floatFilenameExt
+    bloscFileName = HeaderDict['fileNameStem'] + bloscFilenameExt
+    if (not os.path.exists(bloscFileName) or
+        os.path.getmtime(bloscFileName) < os.path.getmtime(fltFileName)):
+        field = readAWAP_flt(HeaderDict)
+        bloscArgs = bloscpack.BloscArgs(cname='lz4', clevel=5, shuffle=True)
+        tempFileName = None
+        try:
+            tempFd, tempFileName = tempfile.mkstemp(
+                dir=os.path.dirname(os.path.abspath(bloscFileName)),
+                prefix=os.path.basename(bloscFileName) + '.', suffix='.tmp')
+            os.close(tempFd)
+            bloscpack.pack_ndarray_to_file(np.ascontiguousarray(field.data),
+                                           tempFileName, blosc_args=bloscArgs)
+            shutil.copymode(fltFileName, tempFileName)
+            os.rename(tempFileName, bloscFileName)
+        except (IOError, OSError):
+            if tempFileName is not None and os.path.exists(tempFileName):
+                try:
+                    os.remove(tempFileName)
+                except OSError:
+                    pass
+        return field
+
+    fieldData = bloscpack.unpack_ndarray_from_file(bloscFileName)
+    return maskMissing(fieldData, HeaderDict['nodata_value'])
+
+def readAWAP_flt_batch(HeaderDicts, NumThreads=None):
+    """
+    Returns a list of 2D NumPy masked arrays from several .flt files,
+    read concurrently.
+
+    Reading and masking a field is dominated by file I/O and by NumPy
+    operations that release the GIL, so a pool of threads overlaps
+    the reads.
+
+    Parameters
+    ----------
+    HeaderDicts : list
+        Header dictionaries of the files to be read; see readAWAP_flt().
+
+    NumThreads : int
+        Number of reader threads; value None uses one per CPU.
+
+    Returns
+    -------
+    list
+        numpy masked arrays (2D), in the order of HeaderDicts.
+    """
+    if NumThreads is None:
+        NumThreads = multiprocessing.cpu_count()
+    NumThreads = max(1, min(NumThreads, len(HeaderDicts)))
+    if NumThreads == 1:
+        return [readAWAP_flt(hdr) for hdr in HeaderDicts]
+    pool = ThreadPool(NumThreads)
+    try:
+        fields = pool.map(readAWAP_flt, HeaderDicts)
+    finally:
+        pool.close()
+        pool.join()
+    return fields
+
+def readAWAP_flt_stack(HeaderDicts):
+    """
+    Returns a 3D NumPy masked array stacking several .flt files.
+
+    All files must share the layout of the first.  Each file is copied
+    straight into its slice of one preallocated (file, row, column)
+    array, and the whole stack is masked at once, so there is a
+    single data array and a single mask rather than one of each per
+    file.
+
+    Parameters
+    ----------
+    HeaderDicts : list
+        Header dictionaries of the files to be read; see readAWAP_flt().
+
+    Returns
+    -------
+    numpy masked array (3D)
+        Field data, indexed (file, row, column).
+    """
+    numFields = len(HeaderDicts)
+    numLats = HeaderDicts[0]['nrows']
+    numLons = HeaderDicts[0]['ncols']
+    stack = np.empty((numFields, numLats, numLons), dtype='float32')
+    for (i, hdr) in enumerate(HeaderDicts):
+        fileName = hdr['fileNameStem'] + floatFilenameExt
+        stack[i] = np.memmap(fileName, dtype=getFltDtype(hdr), mode='r',
+                             shape=(numLats, numLons))
+
+    missingFlag = HeaderDicts[0]['nodata_value']
+    return maskMissing(stack, missingFlag)
+
 def readAWAP_LUT(HeaderDict):
     """
     Reads a two-column .csv file and returns a dictionary.
@@ -373,9 +710,14 @@ def readAWAP_LUT(HeaderDict):
         Lookup table in dictionary format.
     """
     lookupTableFile = HeaderDict['fileNameStem'] + lutFilenameExt
+    
+    """
+    Parse the file in a single pass, skipping blank lines and comment
+    lines (those beginning with '!') as the rows come off the reader.
+    """
     with open(lookupTableFile, mode='r') as infile:
-        reader = csv.reader(filter(lambda row: row[0] != '!', infile))
-        lut = {rows[1]: int(rows[0]) for rows in reader}
+        lut = {row[1]: int(row[0]) for row in csv.reader(infile)
+               if row and not row[0].startswith('!')}
     return lut
 
 def readAWAP_ColourTable(CTPath, Field):
@@ -407,7 +749,7 @@ def readAWAP_ColourTable(CTPath, Field):
     """
     colourTableFile = CTPath + '/' + Field.lower() + '.clr'
     if not os.path.isfile(colourTableFile):
-        print 'setColourTable() error--colour table ', colourTableFile, ' not found.'
+        print('setColourTable() error--colour table ', colourTableFile, ' not found.')
         sys.exit()
     """
     Read in whole file, skip first line, and
@@ -421,34 +763,22 @@ def readAWAP_ColourTable(CTPath, Field):
     make a matplotlib LinearSegmentedColormap
     object.
     """
-    vals = data[:, 0]
-    reds = data[:, 1].astype(float)
-    greens = data[:, 2].astype(float)
-    blues = data[:, 3].astype(float)
     """
-    Renormalize RGB values to interval [0.,1.].
-    Required by matplotlib.
+    Renormalize vals[:] to interval [0.,1.], and RGB values to
+    interval [0.,1.], in one pass.  Required by matplotlib.  Note
+    that the former applies to the fraction of the data's dynamic
+    range.
     """
-    reds = reds / 255.
-    greens = greens / 255.
-    blues = blues / 255.
+    scaled = data[:, :4] / np.array([100., 255., 255., 255.])
+    vals = scaled[:, 0]
     """
-    Renormalize vals[:] to interval [0.,1.].
-    Again, required by matplotlib.  Note that
-    this applies to the fraction of the data's
-    dynamic range.
+    Create a matplotlib-compatible color map dictionary:  for each
+    colour, a tuple of (value, colour, colour) rows.
     """
-    vals = vals / 100.
-    """
-    Create a matplotlib-compatible color map dictionary.
-    """
-    numVals = vals.size
-    cdict = {'red': tuple([(vals[i], reds[i], reds[i])
-                          for i in range(0, numVals)])}
-    colorDict = dict(red=tuple([(vals[i], reds[i], reds[i]) for i in range(0, numVals)]),
-                     blue=tuple([(vals[i], blues[i], blues[i])
-                                for i in range(0, numVals)]),
-                     green=tuple([(vals[i], greens[i], greens[i]) for i in range(0, numVals)]))
+    colorDict = {}
+    for (colour, column) in (('red', 1), ('green', 2), ('blue', 3)):
+        rows = np.column_stack((vals, scaled[:, column], scaled[:, column]))
+        colorDict[colour] = tuple(map(tuple, rows.tolist()))
     return colorDict
 
 def readAWAP_PlotPars(PlotParsFile):
@@ -470,38 +800,70 @@ def readAWAP_PlotPars(PlotParsFile):
         Nested dictionary--outer dictionary keyed by variable name tag--of
         plotting parameters.
     """
-    fieldTags = []
-    minVals = []
-    maxVals = []
-    plotTitles = []
-    cbarCaptions = []
-    parsLines = tuple(open(PlotParsFile, 'r'))
-    for line in parsLines:
-        words = line.rsplit(",")
-        fieldTags.append(words[0].strip("\""))
-        minVals.append(float(words[1].strip()))
-        maxVals.append(float(words[2].strip()))
-        plotTitles.append((words[5].strip()).strip("\""))
-        cbarCaptions.append((words[6].strip()).strip("\""))
-    """
-    Organise these data in a nested dictionary.  The outer
-    dictionary is keyed by field tag.
+    """
+    Organise these data in a nested dictionary as the file is read.
+    The outer dictionary is keyed by field tag.  The csv module
+    handles quoting, so quoted titles and captions may contain commas.
     """
     figProps = {}
-    for tag in fieldTags:
-        tagInd = fieldTags.index(tag)
-        figProps.update({tag: {'minVal': minVals[tagInd],
-                              'maxVal': maxVals[tagInd],
-                              'plotTitle': plotTitles[tagInd],
-                              'cbarCaption': cbarCaptions[tagInd]}})
+    with open(PlotParsFile, 'r') as parsFile:
+        for words in csv.reader(parsFile, skipinitialspace=True):
+            """
+            Skip blank lines; should a tag be repeated, its first entry
+            is used.
+            """
+            tag = words[0].strip() if words else None
+            if tag is None or tag in figProps:
+                continue
+            figProps[tag] = {'minVal': float(words[1]),
+                             'maxVal': float(words[2]),
+                             'plotTitle': words[5].strip(),
+                             'cbarCaption': words[6].strip()}
     return figProps
 
+def readJobConfig(ConfigFile):
+    """
+    Returns the parameter definitions in a job configuration (.conf) file.
+
+    The .conf file is Python source.  It is loaded as a module, so its
+    compiled bytecode is cached beside it, as ConfigFile + 'c' (e.g.,
+    acodsSettings.confc), and reused by later runs rather than being
+    recompiled each time.  MPI applications call this on their root rank
+    only and broadcast the dict, so the cache is written by one process.
+
+    Parameters
+    ----------
+    ConfigFile : string
+        Name (full path or name in cwd) of the .conf file.
+
+    Returns
+    -------
+    dict
+        Names defined by the .conf file, keyed by name (module
+        attributes such as __builtins__ are left out, so the dict can
+        be pickled, e.g. for an MPI broadcast).
+    """
+    try:
+        import imp
+    except ImportError:
+        import runpy
+        configVars = runpy.run_path(ConfigFile)
+    else:
+        moduleName = '_jobConfig_' + re.sub(r'\W', '_',
+                                            os.path.abspath(ConfigFile))
+        configVars = vars(imp.load_source(moduleName, ConfigFile))
+        del sys.modules[moduleName]
+    return dict((name, value) for name, value in configVars.items()
+                if not name.startswith('__'))
+
 def chop(InputString, Ending):
     """
     Chops off the trailing substring Ending from InputString.
     
     Used for cropping filename extensions off of data files;
-    e.g., chop('foo.bar', '.bar') yields 'foo'.
+    e.g., chop('foo.bar', '.bar') yields 'foo'.  If InputString does
+    not end with Ending, it is returned unchanged (as Python 3.9's
+    str.removesuffix() does).
     
     Parameters
     ----------
@@ -515,12 +877,23 @@ def chop(InputString, Ending):
     string
         Truncated string.
     """
-    if InputString.endswith(Ending):
+    if Ending and InputString.endswith(Ending):
         return InputString[:-len(Ending)]
+    return InputString
+
+"""
+YYYYMMDD dates already extracted by getYMD(), keyed by the string they
+were extracted from.  File lists are parsed repeatedly (sorting,
+finding date spans, filtering), so each name is parsed only once.
+"""
+ymdCache = {}
 
 def getYMD(Item):
     """
     Returns the 8 character YYYYMMDD sub-string of argument.
+
+    Results are cached, so repeated calls with the same string do not
+    repeat the search.
     
     Parameters
     ----------
@@ -532,20 +905,61 @@ def getYMD(Item):
     string
         Eight-character YYYYMMDD date.
     """
-    ymd_dates = re.findall(r'\d{8}', Item)
+    if Item in ymdCache:
+        return ymdCache[Item]
+
+    ymd_dates = YMDPattern.findall(Item)
     
     if len(ymd_dates) > 1:
-        print 'getYMD()::Error--more than one YYYYMMDD date present!'
-        print ymd_dates
+        print('getYMD()::Error--more than one YYYYMMDD date present!')
+        print(ymd_dates)
         sys.exit()
     
     if len(ymd_dates) == 0:
-        print 'getYMD()::Error--no YYYYMMDD date detected in Item!'
-        print 'Item = ', Item
+        print('getYMD()::Error--no YYYYMMDD date detected in Item!')
+        print('Item = ', Item)
         sys.exit()
     
+    ymdCache[Item] = ymd_dates[0]
     return ymd_dates[0]
 
+"""
+Integer (YYYYMMDD, year, month, day) fields of dates already parsed
+by getDateFields(), keyed by the string they were extracted from.
+"""
+dateFieldsCache = {}
+
+def getDateFields(Item):
+    """
+    Returns the integer fields of the YYYYMMDD date in the argument.
+
+    The date is converted to an integer once, and split into year,
+    month and day arithmetically; results are cached, so the year,
+    month and day of a name cost one dictionary lookup each after
+    the first.
+
+    Parameters
+    ----------
+    Item : string
+        String containing a YYYYMMDD date.
+
+    Returns
+    -------
+    tuple
+        (YYYYMMDD, year, month, day), all integers.
+    """
+    try:
+        return dateFieldsCache[Item]
+    except KeyError:
+        pass
+
+    ymd = int(getYMD(Item))
+    yearMonth, day = divmod(ymd, 100)
+    year, month = divmod(yearMonth, 100)
+    fields = (ymd, year, month, day)
+    dateFieldsCache[Item] = fields
+    return fields
+
 def getFileList(Directory=None):
     """
     Builds a list of header/float files without the .hdr / .flt file
@@ -562,21 +976,7 @@ def getFileList(Directory=None):
     List
         List of hdr/float files minus the filename extension.
     """
-    fileList = []
-    """
-    If no value for the argument Directory was supplied, work in the
-    current directory, otherwise, change to this directory.
-    """
-    if Directory != None:
-        startDir = os.getcwd()
-        os.chdir(Directory)
-    
-    for file in glob.glob("*.hdr"):
-        fileList.append(chop(file, '.hdr'))
-    
-    os.chdir(startDir)
-    
-    return fileList
+    return getFilesByExt(headerFilenameExt, Directory)
 
 def getFilesByExt(FileTypeExt, Directory=None):
     """
@@ -598,22 +998,18 @@ def getFilesByExt(FileTypeExt, Directory=None):
         extension.
     """
     
-    fileList = []
-    if Directory != None:
-        startDir = os.getcwd()
-        os.chdir(Directory)
-    
-    filePrototype = '*' + FileTypeExt
-    for file in glob.glob(filePrototype):
-        fileList.append(chop(file, FileTypeExt))
-    
-    if Directory != None:
-        """
-        Jump back to startDir.
-        """
-        os.chdir(startDir)
+    """
+    If no value for the argument Directory was supplied, list the
+    current directory.  The directory is listed in place, without
+    changing the (process-wide) working directory, and without glob's
+    pattern matching.  As with glob, hidden files are skipped.
+    """
+    if Directory == None:
+        Directory = os.curdir
     
-    return fileList
+    extLength = len(FileTypeExt)
+    return [file[:-extLength] for file in os.listdir(Directory)
+            if file.endswith(FileTypeExt) and not file.startswith('.')]
 
 def excludePercentileRankFiles(FileList):
     """
@@ -827,9 +1223,7 @@ def getJulianDate(FileName):
     float
         Julian date.
     """
-    iYear = getYear(FileName)
-    iMonth = getMonth(FileName)
-    iDay = getDay(FileName)
+    (ymd, iYear, iMonth, iDay) = getDateFields(FileName)
     
     jDate = sum(jdcal.gcal2jd(iYear, iMonth, iDay))
     
@@ -849,7 +1243,7 @@ def getDate(FileName):
     int
         YYYYMMDD date in integer format.
     """
-    return int(getYMD(FileName))
+    return getDateFields(FileName)[0]
 
 def getYear(FileName):
     """
@@ -865,8 +1259,7 @@ def getYear(FileName):
     int
         YYYY year.
     """
-    dateString = getYMD(FileName)
-    return int(dateString[-8:-4])
+    return getDateFields(FileName)[1]
 
 def getMonth(FileName):
     """
@@ -882,8 +1275,7 @@ def getMonth(FileName):
     int
         MM month in integer format.
     """
-    dateString = getYMD(FileName)
-    return int(dateString[-4:-2])
+    return getDateFields(FileName)[2]
 
 def getMonthAbbr(FileName):
     """
@@ -915,8 +1307,7 @@ def getDay(FileName):
     int
         Day of month based on YYYYMMDD date.
     """
-    dateString = getYMD(FileName)
-    return int(dateString[-2:])
+    return getDateFields(FileName)[3]
 
 def getDateRange(FileName):
     """
@@ -952,7 +1343,7 @@ def getDateRange(FileName):
         fileStartDate = fileYear + '/01/01'
         fileEndDate = fileYear + '/12/31'
     else:
-        print 'Unable to determine sampling interval for file ', FileName
+        print('Unable to determine sampling interval for file ', FileName)
         sys.exit()
     
     fileDateRange = fileStartDate + '-' + fileEndDate
@@ -976,27 +1367,21 @@ def getFieldName(FileName):
         Name of field stored in file.
     """
     
-    nameChunks = re.split('\W+|_', FileName)
     """
-    Work through nameChunks, excising chunks corresponding to
-    known sampling interval , date, and percentile rank tags.
-    The chunk(s) that remain defines the field name.  If more
-    than one chunk remains, these chunks are joined with an
-    underscore to reconstruct the fieldname.
+    Keep only the name chunks that are not empty and not known
+    sampling interval, date, or percentile rank tags.  The chunk(s)
+    that remain defines the field name.  If more than one chunk
+    remains, these chunks are joined with an underscore to
+    reconstruct the fieldname.
     """
-    for chunk in nameChunks:
-        if chunk in SamplingIntervals:
-            nameChunks.remove(chunk)
-            continue
-        if chunk in PercentileRankTag:
-            nameChunks.remove(chunk)
-            continue
-        if len(chunk) == 8 and chunk.isdigit():
-            nameChunks.remove(chunk)
-            continue
+    nameChunks = [chunk for chunk in NameChunkSeparators.split(FileName)
+                  if chunk and
+                  chunk not in SamplingIntervalSet and
+                  chunk not in PercentileRankTagSet and
+                  not (len(chunk) == 8 and chunk.isdigit())]
     
     if len(nameChunks) == 0:
-        print 'awapIO.getFieldname():: Error--No fieldname detected for file ', FileName
+        print('awapIO.getFieldname():: Error--No fieldname detected for file ', FileName)
         sys.exit()
     
     if len(nameChunks) == 1:
@@ -1020,7 +1405,7 @@ def getDataSamplingInterval(FileName):
         Sampling interval tag.
     """
     
-    nameChunks = re.split('\W+|_', FileName)
+    nameChunks = NameChunkSeparators.split(FileName)
     
     for sampInt in SamplingIntervals:
         if sampInt in nameChunks:
@@ -1028,11 +1413,31 @@ def getDataSamplingInterval(FileName):
     """
     If no sampling interval is detected, flag error and exit
     """
-    print 'awapIO.getDataSamplingInterval():: No interval tag for file ', FileName
-    print 'Legitimate sampling interval tags = ', SamplingIntervals
+    print('awapIO.getDataSamplingInterval():: No interval tag for file ', FileName)
+    print('Legitimate sampling interval tags = ', SamplingIntervals)
     sys.exit()
 
-def filterByMonthName(FileList, Month):
+def buildDateIndex(FileList):
+    """
+    Index a filename list by month, for repeated month/season filtering.
+
+    Parameters
+    ----------
+    FileList : list
+        List of filenames.
+
+    Returns
+    -------
+    dict
+        Lists of filenames, keyed by MM month number; each list keeps
+        the order of FileList.
+    """
+    dateIndex = {}
+    for file in FileList:
+        dateIndex.setdefault(getMonth(file), []).append(file)
+    return dateIndex
+
+def filterByMonthName(FileList, Month, DateIndex=None):
     """
     Filter a filename list, returning those containing nominated
     month abbreviation.
@@ -1043,6 +1448,9 @@ def filterByMonthName(FileList, Month):
         List of filenames to be filtered.
     Month : string
         Abbreviation of desired month name.
+    DateIndex : dict
+        Index of FileList from buildDateIndex(); if supplied, it is
+        used instead of parsing FileList again.
     
     Returns
     -------
@@ -1050,7 +1458,7 @@ def filterByMonthName(FileList, Month):
         List of filenames only corresponding to the desired month.
     """
     if not is_a_Month(Month.lower()):
-        print 'ERROR:  month name ', Month, ' not recognised.'
+        print('ERROR:  month name ', Month, ' not recognised.')
         sys.exit()
     
     """
@@ -1062,10 +1470,10 @@ def filterByMonthName(FileList, Month):
     """
     Take FileList, build a new list filtered by month.
     """
-    filteredList = filterByMonthNum(FileList, monthNum)
+    filteredList = filterByMonthNum(FileList, monthNum, DateIndex=DateIndex)
     return filteredList
 
-def filterByMonthNum(FileList, MonthNum):
+def filterByMonthNum(FileList, MonthNum, DateIndex=None):
     """
     Filter a filename list, returning those containing the nominated
     month number.
@@ -1076,6 +1484,9 @@ def filterByMonthNum(FileList, MonthNum):
         List of filenames.
     MonthNum : int
         Two-digit month specifier; 0 < MonthNum <= 12.
+    DateIndex : dict
+        Index of FileList from buildDateIndex(); if supplied, it is
+        used instead of parsing FileList again.
     
     Returns
     -------
@@ -1084,9 +1495,12 @@ def filterByMonthNum(FileList, MonthNum):
         month number.
     """
     if not is_a_MonthNum(MonthNum):
-        print 'ERROR:  month number ', MonthNum, ' not recognised.'
+        print('ERROR:  month number ', MonthNum, ' not recognised.')
         sys.exit()
     
+    if DateIndex is not None:
+        return list(DateIndex.get(MonthNum, []))
+    
     FilteredList = []
     for file in FileList:
         if getMonth(file) == MonthNum:
@@ -1094,7 +1508,7 @@ def filterByMonthNum(FileList, MonthNum):
     
     return FilteredList
 
-def filterBySeason(FileList, SeasonName):
+def filterBySeason(FileList, SeasonName, DateIndex=None):
     """
     Filter filename list by season.
     
@@ -1104,6 +1518,10 @@ def filterBySeason(FileList, SeasonName):
         List of filenames.
     SeasonName : string
         Abbreviation for season; i.e., 'djf', 'mam', 'jja', 'son'.
+    DateIndex : dict
+        Index of FileList from buildDateIndex(); if supplied, the
+        season's files are gathered from the index's three month
+        lists instead of by scanning FileList.
     
     Returns
     -------
@@ -1112,11 +1530,13 @@ def filterBySeason(FileList, SeasonName):
     """
     
     month_list = seasonToMonths(SeasonName)
-    month_files = []
-    for month in month_list:
-        month_files += filterByMonthName(FileList, month)
-    
-    month_files = sortByDate(month_files)
+    season_months = frozenset([MonthAbbrToNum[month] for month in month_list])
+    if DateIndex is not None:
+        month_files = sortByDate([file for month in season_months
+                                  for file in DateIndex.get(month, [])])
+    else:
+        month_files = sortByDate([file for file in FileList
+                                  if getMonth(file) in season_months])
 
     """
     At this point we have a time-ordered, subsetted list of files
@@ -1157,10 +1577,7 @@ def filterByFieldName(FileList, FieldName):
     list
         List of filenames that contain the desired field.
     """
-    FilteredList = []
-    for file in FileList:
-        if getFieldName[file] == FieldName:
-            FilteredList.append(file)
+    return [file for file in FileList if getFieldName(file) == FieldName]
 
 def filterBySamplingInterval(FileList, IntervalName):
     """
@@ -1179,12 +1596,8 @@ def filterBySamplingInterval(FileList, IntervalName):
         List of filenames whose sampling interval tags match the
         desired sampling interval.
     """
-    filteredList = []
-    for file in FileList:
-        if getDataSamplingInterval(file) == IntervalName:
-            filteredList.append(file)
-    
-    return filteredList
+    return [file for file in FileList
+            if getDataSamplingInterval(file) == IntervalName]
 
 def filterByDateRange(FileList, StartDate, EndDate):
     """
@@ -1204,17 +1617,34 @@ def filterByDateRange(FileList, StartDate, EndDate):
     list
         List of files falling within the desired date range.
     """
-    filteredList = []
-    for file in FileList:
-        fileDate = getDate(file)
-        if (fileDate >= StartDate) and (fileDate <= EndDate):
-            filteredList.append(file)
-    filteredList = sorted(filteredList, key=getYMD)
-    return filteredList
+    
+    """
+    Gather the dates into an integer array, and sort it (stably, so that
+    files sharing a date keep their order); the files in range are then
+    a contiguous run of the sorted dates, found by binary search.
+    """
+    dates = np.fromiter((getDate(file) for file in FileList), dtype=np.int64,
+                        count=len(FileList))
+    order = np.argsort(dates, kind='mergesort')
+    sortedDates = dates.take(order)
+    first = np.searchsorted(sortedDates, StartDate, side='left')
+    last = np.searchsorted(sortedDates, EndDate, side='right')
+    return [FileList[i] for i in order[first:last]]
+
+"""
+Grid coordinate vectors already computed by getLats() and getLons(),
+keyed by the header values that define them.  Regions and subregions
+built from the same grid share one (read-only) array rather than each
+recomputing it.
+"""
+coordCache = {}
 
 def getLats(HeaderDict, Reverse=True):
     """
     Computes a NumPy array of latitudes given a header dictionary.
+
+    The array returned is cached and shared between callers, so it
+    is read-only.
     
     Parameters
     ----------
@@ -1232,6 +1662,9 @@ def getLats(HeaderDict, Reverse=True):
     numLats = HeaderDict['nrows']
     minLat = HeaderDict['yllcorner']
     dLat = HeaderDict['cellsize']
+    key = ('lat', numLats, minLat, dLat, bool(Reverse))
+    if key in coordCache:
+        return coordCache[key]
     """
     Note minLat refers to the *bottom edge* of the grid cell located
     at the LLHC of the domain.  The array lats[:], however, refers
@@ -1248,17 +1681,26 @@ def getLats(HeaderDict, Reverse=True):
     """
     firstLat = minLat + 0.5 * dLat
     lastLat = firstLat + (numLats - 1) * dLat
-    lats = np.linspace(firstLat, lastLat, num=numLats)
-    
+    """
+    Step from the first latitude in the order requested, rather than
+    reversing an increasing array afterwards.
+    """
+    steps = np.arange(numLats, dtype=np.float64)
     if Reverse:
-        lats = lats[::-1]
+        steps = (numLats - 1) - steps
+    lats = firstLat + steps * dLat
+    lats.setflags(write=False)
     
+    coordCache[key] = lats
     return lats
 
 
 def getLons(HeaderDict):
     """
     Computes a NumPy array of longitudes given a header dictionary.
+
+    The array returned is cached and shared between callers, so it
+    is read-only.
     
     Parameters
     ----------
@@ -1273,6 +1715,9 @@ def getLons(HeaderDict):
     numLons = HeaderDict['ncols']
     minLon = HeaderDict['xllcorner']
     dLon = HeaderDict['cellsize']
+    key = ('lon', numLons, minLon, dLon)
+    if key in coordCache:
+        return coordCache[key]
     
     """
     Note minLon refers to the *left edge* of the grid cell located 
@@ -1290,10 +1735,18 @@ def getLons(HeaderDict):
     """
     firstLon = minLon + 0.5 * dLon
     lastLon = firstLon + (numLons -1) * dLon
-    lons = np.linspace(firstLon, lastLon, num=numLons)
+    lons = firstLon + np.arange(numLons, dtype=np.float64) * dLon
+    lons.setflags(write=False)
     
+    coordCache[key] = lons
     return lons
     
+"""
+Area weights already computed by getAreaWeights(), keyed by the header
+values and radius that define them.
+"""
+weightsCache = {}
+
 def getAreaWeights(HeaderDict, Radius=1.0):
     """
     Computes a NumPy array of area weights given a header dictionary.
@@ -1303,6 +1756,9 @@ def getAreaWeights(HeaderDict, Radius=1.0):
     must be read to determine which cells have missing values in order 
     to create a masked array.  
 
+    The array returned is cached and shared between callers, so it
+    is read-only.
+
     Parameters
     ----------
     HeaderDict : dict
@@ -1317,23 +1773,28 @@ def getAreaWeights(HeaderDict, Radius=1.0):
         Two-dimensional array of unnormalised/unmasked floating-point 
         weights.
     """
+    key = (HeaderDict['nrows'], HeaderDict['ncols'], HeaderDict['yllcorner'],
+           HeaderDict['cellsize'], float(Radius))
+    if key in weightsCache:
+        return weightsCache[key]
     
     import math
     
     lats = getLats(HeaderDict)
-    lons = getLons(HeaderDict)
     dLat = math.radians(HeaderDict['cellsize'])
     dLon = dLat
-    numLats = lats.size
-    numLons = lons.size
+    numLons = HeaderDict['ncols']
     
-    weights = np.ndarray((numLats,numLons))
-    for i in range(0,numLats):
-        for j in range(0,numLons):
-            weights[i,j] = math.cos(math.radians(lats[i])) * dLat * dLon
-            
+    """
+    The weights depend on latitude alone:  compute one column of
+    weights, then repeat it across the longitudes.
+    """
+    latWeights = np.cos(np.radians(lats)) * dLat * dLon
+    weights = np.repeat(latWeights[:, np.newaxis], numLons, axis=1)
     weights *= Radius * Radius
+    weights.setflags(write=False)
     
+    weightsCache[key] = weights
     return weights
 
 def getMaskedAreaWeights(HeaderDict, Radius=1.0):
@@ -1376,6 +1837,13 @@ def getMaskedAreaWeights(HeaderDict, Radius=1.0):
 
     return maskedWeights
 
+"""
+Masks already read by getMaskFromFltFile(); see hdrCache.  These are
+static (topography) masks, so only they, and not field data, are
+cached.
+"""
+maskCache = {}
+
 def getMaskFromFltFile(HeaderDict, FloatFileName=None):
     """
     Create 2D spatial mask from missing values.
@@ -1392,7 +1860,9 @@ def getMaskFromFltFile(HeaderDict, FloatFileName=None):
     Returns
     -------
     numpy.ndarray
-        Two-dimensional mask.
+        Two-dimensional mask.  Masks are cached by the file's absolute
+        path and modification time, and shared between callers, so the
+        mask is read-only.
     """
 
     if FloatFileName == None:
@@ -1400,8 +1870,14 @@ def getMaskFromFltFile(HeaderDict, FloatFileName=None):
     else:
         fltFileName = FloatFileName
 
-    mask =  readAWAP_flt(HeaderDict)._get_mask()
+    key = (os.path.abspath(fltFileName), os.path.getmtime(fltFileName))
+    if key in maskCache:
+        return maskCache[key]
+
+    mask = ma.getmaskarray(readAWAP_flt(HeaderDict, fltFileName))
+    mask.setflags(write=False)
 
+    maskCache[key] = mask
     return mask
 
     
@@ -0,0 +1,155 @@
+"""
+awapImage.py:  Raster image output for AWAP/BIOS2 plots
+
+This module supports the following operations:
+
+1) Retrieval and cropping of a rendered matplotlib Agg canvas.
+
+2) Thumbnail downsampling and JPEG encoding of the rendered raster,
+bypassing matplotlib's savefig() machinery.
+"""
+
+"""
+System and standard library modules.
+"""
+import math
+
+"""
+NumPy.
+"""
+import numpy as np
+
+"""
+Python Imaging Library.
+"""
+from PIL import Image
+
+"""
+libjpeg-turbo, through PyTurboJPEG, if available.  Its SIMD DCT and
+entropy coding encode JPEGs several times faster than stock libjpeg;
+without it, JPEGs are encoded by PIL.
+"""
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB, TJPF_RGBA, TJSAMP_420
+    turboJPEG = TurboJPEG()
+except Exception:
+    turboJPEG = None
+
+def getCanvasRGBA(Figure):
+    """
+    Returns the RGBA pixels of a figure's most recently drawn Agg canvas.
+
+    Parameters
+    ----------
+    Figure : matplotlib.figure.Figure
+        Figure whose canvas has been drawn.
+
+    Returns
+    -------
+    numpy array (3D)
+        (height, width, 4) uint8 view of the canvas buffer.
+    """
+    width, height = Figure.canvas.get_width_height()
+    rgba = np.frombuffer(Figure.canvas.buffer_rgba(), dtype=np.uint8)
+    return rgba.reshape(height, width, 4)
+
+def bboxToSlices(BBox, Height):
+    """
+    Convert a display-space bounding box to row/column slices of a
+    canvas buffer.
+
+    Display space has its origin at the lower left; buffer rows run
+    from the top down.
+
+    Parameters
+    ----------
+    BBox : matplotlib.transforms.Bbox
+        Bounding box in display (pixel) coordinates.
+    Height : int
+        Height of the canvas in pixels.
+
+    Returns
+    -------
+    tuple of slices
+        Row and column slices covering BBox.
+    """
+    x0 = max(int(math.floor(BBox.x0)), 0)
+    x1 = int(math.ceil(BBox.x1))
+    y0 = max(int(math.floor(BBox.y0)), 0)
+    y1 = int(math.ceil(BBox.y1))
+    return slice(max(Height - y1, 0), Height - y0), slice(x0, x1)
+
+def cropToBBox(RGBA, BBox):
+    """
+    Returns the part of a canvas buffer inside a display-space bounding box.
+
+    Parameters
+    ----------
+    RGBA : numpy array (3D)
+        Canvas buffer, as returned by getCanvasRGBA().
+    BBox : matplotlib.transforms.Bbox
+        Bounding box in display (pixel) coordinates.
+
+    Returns
+    -------
+    numpy array (3D)
+        View of the cropped buffer.
+    """
+    rows, columns = bboxToSlices(BBox, RGBA.shape[0])
+    return RGBA[rows, columns]
+
+def makeThumbnail(RGBA, Size):
+    """
+    Downsample an image to fit within a given size.
+
+    Parameters
+    ----------
+    RGBA : numpy array (3D)
+        RGB or RGBA pixels.
+    Size : tuple
+        Maximum (width, height) of the thumbnail in pixels; the aspect
+        ratio is preserved.
+
+    Returns
+    -------
+    numpy array (3D)
+        RGB pixels of the thumbnail.
+    """
+    thumbnail = Image.fromarray(np.ascontiguousarray(RGBA[:,:,:3]), 'RGB')
+    thumbnail.thumbnail(Size, Image.BILINEAR)
+    return np.asarray(thumbnail)
+
+def saveJPEG(RGBA, FileName, Quality=85):
+    """
+    Encode an image directly as a JPEG file.
+
+    The alpha channel, if any, is dropped; Agg clears to white.
+    Chroma is subsampled 4:2:0.  Uses libjpeg-turbo when available,
+    PIL otherwise.
+
+    Parameters
+    ----------
+    RGBA : numpy array (3D)
+        RGB or RGBA pixels.
+    FileName : string
+        Name of the JPEG file to write.
+    Quality : int
+        JPEG quality, 1-95.
+    """
+    if turboJPEG is not None:
+        if RGBA.shape[2] == 4:
+            pixelFormat = TJPF_RGBA
+        else:
+            pixelFormat = TJPF_RGB
+        jpegBytes = turboJPEG.encode(np.ascontiguousarray(RGBA),
+                                     quality=Quality,
+                                     pixel_format=pixelFormat,
+                                     jpeg_subsample=TJSAMP_420)
+        jpegFile = open(FileName, 'wb')
+        jpegFile.write(jpegBytes)
+        jpegFile.close()
+        return
+
+    image = Image.fromarray(np.ascontiguousarray(RGBA[:,:,:3]), 'RGB')
+    image.save(FileName, 'JPEG', quality=Quality, subsampling=2,
+               optimize=False)
@@ -14,6 +14,40 @@ flag comparisons.
 """
 epsilon = 1.e-6
 
+"""
+Value given to masked cells of 16-bit integer region ID fields.
+"""
+regionIDMissingFlag = np.iinfo(np.int16).min
+
+def getRegionIDs(TopoData, TopoInvalid):
+    """
+    Returns a 16-bit integer copy of a region ID field, if it has one.
+    
+    Region IDs are stored in .flt files as floats, but are small integers;
+    comparisons against the 16-bit copy move half the data of those
+    against the floats.
+    
+    Parameters
+    ----------
+    TopoData : numpy.ndarray
+        Region ID field, as floats.
+    TopoInvalid : numpy.ndarray
+        Boolean mask, True where TopoData is masked.
+    
+    Returns
+    -------
+    numpy.ndarray
+        Region IDs as int16, with masked cells set to regionIDMissingFlag;
+        None if the unmasked values are not all integers that fit in 16
+        bits (other than regionIDMissingFlag).
+    """
+    regionIDs = np.where(TopoInvalid, regionIDMissingFlag, TopoData)
+    if (np.any(regionIDs != np.rint(regionIDs)) or
+        np.any(regionIDs[np.logical_not(TopoInvalid)] <= regionIDMissingFlag) or
+        np.any(regionIDs > np.iinfo(np.int16).max)):
+        return None
+    return regionIDs.astype(np.int16)
+
 class Region(object):
     """
     Region object for use in AWAP/ACODS geographically distributed data.
@@ -58,8 +92,7 @@ class Region(object):
         # Begin by setting quantities found in the header dictionary.
         self.numLats = HeaderDict['nrows']
         self.numLons = HeaderDict['ncols']
-        self.dLat = HeaderDict['cellsize']
-        self.dLon = HeaderDict['cellsize']
+        self.cellsize = HeaderDict['cellsize']
         self.minLat = HeaderDict['yllcorner']
         self.minLon = HeaderDict['xllcorner']
         self.missingFlag = HeaderDict['nodata_value']
@@ -78,15 +111,30 @@ class Region(object):
         self.lons = aio.getLons(HeaderDict)
         
         # Some geographic coordinate meshes reverse the indexing
-        # of the latitudes.  Test for this and flag it if true.
-        if self.lats[-1] < self.lats[0]:
-            self.reversedLats = True
+        # of the latitudes.  Test for this and flag it.
+        self.reversedLats = bool(self.lats[-1] < self.lats[0])
         
         # Set mask.  This mask should provide two things:  a definition
         # of what is not in the region (flagged by self.missingFlag) and
         # IDs of subregions (if present)
+        #
+        # The mask is kept as a masked array, self.topoMask, and, for
+        # comparisons and indexing, as its plain data and boolean mask
+        # arrays, self.topoData and self.topoInvalid (True where masked).
+        # All three share the same memory.
         self.topoMask = aio.readAWAP_flt(HeaderDict)
-        self.numUnmaskedPoints = ma.count(self.topoMask)
+        self.topoData = ma.getdata(self.topoMask)
+        self.topoInvalid = ma.getmaskarray(self.topoMask)
+        self.numUnmaskedPoints = (self.topoInvalid.size -
+                                  np.count_nonzero(self.topoInvalid))
+        
+        # If the mask's values are integer region IDs, also keep a 16-bit
+        # integer copy, self.topoIDs, for subregion searches.
+        self.topoIDs = getRegionIDs(self.topoData, self.topoInvalid)
+        
+        # Map coordinates of the grid cell corners, as (BaseMap, x, y) for
+        # the Basemap they were last projected onto; see getCellCornerXY().
+        self.cellCornerXY = None
         
         # Are there subregions?  If the header file to which HeaderDict
         # points has an accompanying .csv file, read it into a dictionary
@@ -99,7 +147,49 @@ class Region(object):
         
         #Finally, for hashing purposes, set the instance's object ID.
         self.objectID = id(self)
+    
+    # Grid cells are square, so the latitude and longitude spacings are
+    # both the header's cellsize, stored once.
+    @property
+    def dLat(self):
+        """
+        Latitudinal grid spacing (degrees).
+        """
+        return self.cellsize
+    
+    @property
+    def dLon(self):
+        """
+        Longitudinal grid spacing (degrees).
+        """
+        return self.cellsize
+        
+    def getCellCornerXY(self, BaseMap):
+        """
+        Returns the map coordinates of the grid cells' corners, for pcolor().
+        
+        The data are cell-centered, but matplotlib's pcolor() works off of
+        corners in the order presented (here, the ULC of each cell), so the
+        lats/lons are displaced accordingly before projection.  The result
+        for the most recently used BaseMap is kept, so replotting the region
+        on the same map neither rebuilds the lat/lon mesh nor reprojects it.
+        
+        Parameters
+        ----------
+        BaseMap : Basemap
+            Map onto which the corners are projected.
         
+        Returns
+        -------
+        tuple
+            x, y map coordinates (2D arrays).
+        """
+        if self.cellCornerXY is None or self.cellCornerXY[0] is not BaseMap:
+            x, y = BaseMap(*np.meshgrid(self.lons - 0.5 * self.dLon,
+                                        self.lats + 0.5 * self.dLat))
+            self.cellCornerXY = (BaseMap, x, y)
+        return self.cellCornerXY[1], self.cellCornerXY[2]
+    
     def getSubRegionNames(self):
         """
         Returns list of SubRegion names.
@@ -148,7 +238,7 @@ class SubRegion(Region):
     Spatial subset of parent region.
     """
     def __init__(self, ParentRegion, RegFlag, BoundingBox=None,
-                 RegionName=None, RegionType=None):
+                 RegionName=None, RegionType=None, IndexBounds=None):
         """
         SubRegion constructor from ParentRegion.
         
@@ -169,6 +259,11 @@ class SubRegion(Region):
         RegionType : string
             Type of regionalisation used to construct the subregion; 
             default value of None results in 'NONE' for this metadatum.
+        IndexBounds : tuple
+            (minRow, maxRow, minCol, maxCol) indices, on the parent's
+            grid, of the cells flagged RegFlag, as computed by
+            getSubRegionIndexBounds(); used in place of a scan of the
+            parent's topo mask when BoundingBox is None.
         
         Returns
         -------
@@ -191,8 +286,7 @@ class SubRegion(Region):
         self.parentName = ParentRegion.name
         self.parentRegType = ParentRegion.regionType
         self.parentObjectID = id(ParentRegion)
-        self.dLon = ParentRegion.dLon
-        self.dLat = ParentRegion.dLat
+        self.cellsize = ParentRegion.cellsize
         self.missingFlag = ParentRegion.missingFlag
         self.reversedLats = ParentRegion.reversedLats
         
@@ -213,52 +307,62 @@ class SubRegion(Region):
             self.maxLon = BoundingBox[2] + self.dLon + epsilon
             self.maxLat = BoundingBox[3] + self.dLat + epsilon
         else:
-            minLonIndex = np.where(
-                ParentRegion.topoMask == float(RegFlag))[1].min()
+            # Unless supplied, compare the parent's mask with RegFlag once,
+            # and reduce the matches to the rows and columns containing any
+            # of them; the subregion's extents are the first and last of each.
+            if IndexBounds is None:
+                if ParentRegion.topoIDs is not None:
+                    match = (ParentRegion.topoIDs == np.int16(RegFlag))
+                else:
+                    match = (ParentRegion.topoData == float(RegFlag))
+                rowIndices = np.flatnonzero(match.any(axis=1))
+                colIndices = np.flatnonzero(match.any(axis=0))
+                IndexBounds = (rowIndices[0], rowIndices[-1],
+                               colIndices[0], colIndices[-1])
+            minRow, maxRow, minCol, maxCol = IndexBounds
+            minLonIndex = minCol
             self.minLon = ParentRegion.lons[minLonIndex] - 0.5 * self.dLon
-            maxLonIndex = np.where(
-                ParentRegion.topoMask == float(RegFlag))[1].max()
+            maxLonIndex = maxCol
             self.maxLon = ParentRegion.lons[maxLonIndex] + 0.5 * self.dLon
             if self.reversedLats:
-                minLatIndex = np.where(
-                    ParentRegion.topoMask == RegFlag)[0].max()
-                maxLatIndex = np.where(
-                    ParentRegion.topoMask == RegFlag)[0].min()
+                minLatIndex = maxRow
+                maxLatIndex = minRow
             else:
-                minLatIndex = np.where(
-                    ParentRegion.topoMask == RegFlag)[0].min()
-                maxLatIndex = np.where(
-                    ParentRegion.topoMask == RegFlag)[0].max()
+                minLatIndex = minRow
+                maxLatIndex = maxRow
             self.minLat = ParentRegion.lats[minLatIndex] - 0.5 * self.dLat
             self.maxLat = ParentRegion.lats[maxLatIndex] + 0.5 * self.dLat
         
         # Compare the region boundaries with the parent's latitude and
         # longitude grid arrays to determine indices in these arrays
-        # lie in the subregion.  This is set up for reversed latitudes,
-        # which are used in AWAP, and hard-wired in at the moment.
+        # lie in the subregion.  The grid arrays are sorted, so binary
+        # searches find the indices.  Reversed latitudes, which are used
+        # in AWAP, are searched through an increasing reversed view:  its
+        # index i is index (numLats - 1 - i) of the parent's array.
         if self.reversedLats:
-            self.parentMinLatIndex = np.where(
-                ParentRegion.lats >= self.minLat)[0][-1]
-            self.parentMaxLatIndex = np.where(
-                ParentRegion.lats <= self.maxLat)[0][0]
+            increasingLats = ParentRegion.lats[::-1]
+            self.parentMinLatIndex = ParentRegion.numLats - 1 - np.searchsorted(
+                increasingLats, self.minLat, side='left')
+            self.parentMaxLatIndex = ParentRegion.numLats - np.searchsorted(
+                increasingLats, self.maxLat, side='right')
             self.parentLatStart = self.parentMaxLatIndex
             self.parentLatStop = self.parentMinLatIndex + 1
         else:
-            self.parentMinLatIndex = np.where(
-                ParentRegion.lats >= self.minLat)[0][0]
-            self.parentMaxLatIndex = np.where(
-                ParentRegion.lats <= self.maxLat)[0][-1]
+            self.parentMinLatIndex = np.searchsorted(
+                ParentRegion.lats, self.minLat, side='left')
+            self.parentMaxLatIndex = np.searchsorted(
+                ParentRegion.lats, self.maxLat, side='right') - 1
             self.parentLatStart = self.parentMinLatIndex
             self.parentLatStop = self.parentMaxLatIndex + 1
         
         self.numLats = self.parentLatStop - self.parentLatStart
         self.lats = ParentRegion.lats[self.parentLatStart:self.parentLatStop]
         
-        self.parentMinLonIndex = np.where(
-            ParentRegion.lons >= self.minLon)[0][0]
+        self.parentMinLonIndex = np.searchsorted(
+            ParentRegion.lons, self.minLon, side='left')
         self.parentLonStart = self.parentMinLonIndex
-        self.parentMaxLonIndex = np.where(
-            ParentRegion.lons <= self.maxLon)[0][-1]
+        self.parentMaxLonIndex = np.searchsorted(
+            ParentRegion.lons, self.maxLon, side='right') - 1
         self.parentLonStop = self.parentMaxLonIndex + 1
         self.numLons = self.parentLonStop - self.parentLonStart
         self.lons = ParentRegion.lons[self.parentLonStart:self.parentLonStop]
@@ -266,16 +370,23 @@ class SubRegion(Region):
         # The subregion is probably not precisely a rectangle that fits the BoundingBox.
         # Construct the subregion mask from the parent region's mask and the supplied
         # RegFlag (self.regionID).
-        regionIDs = ParentRegion.topoMask._get_data()[
-            self.parentLatStart:self.parentLatStop,
-            self.parentLonStart:self.parentLonStop]
-        regionTopoMask = ParentRegion.topoMask._get_mask()[
+        self.topoData = ParentRegion.topoData[
             self.parentLatStart:self.parentLatStop,
             self.parentLonStart:self.parentLonStop]
+        if ParentRegion.topoIDs is not None:
+            self.topoIDs = ParentRegion.topoIDs[
+                self.parentLatStart:self.parentLatStop,
+                self.parentLonStart:self.parentLonStop]
+            self.topoInvalid = (self.topoIDs != np.int16(self.regionID))
+        else:
+            self.topoIDs = None
+            self.topoInvalid = (self.topoData != float(self.regionID))
         self.topoMask = ma.masked_array(
-            regionIDs, regionIDs != float(
-                self.regionID), fill_value=self.missingFlag)
-        self.numUnmaskedPoints = ma.count(self.topoMask)
+            self.topoData, self.topoInvalid, copy=False,
+            fill_value=self.missingFlag)
+        self.numUnmaskedPoints = (self.topoInvalid.size -
+                                  np.count_nonzero(self.topoInvalid))
+        self.cellCornerXY = None
         
         # For now, only one level of sub-regionalisation is supported, so set the
         # flag hasSubRegionDefs to False.
@@ -301,3 +412,80 @@ class SubRegion(Region):
         print 10 * '*', 'Parent Object ID=', self.parentObjectID
         print 10 * '*', ' Region ID Flag on Parent Topo Mask:  ', self.regionID
         print 70 * '='
+
+def getSubRegionIndexBounds(ParentRegion, RegFlags):
+    """
+    Find the grid index bounds of several subregions in one scan of the
+    parent region's topo mask.
+    
+    The unmasked cells of the parent are grouped by region ID flag with a
+    single sort; the bounds of each subregion are then the extreme rows
+    and columns of its group.
+    
+    Parameters
+    ----------
+    ParentRegion : Region
+        Parent Region instance.
+    RegFlags : list
+        Identifying flags of the subregions.
+    
+    Returns
+    -------
+    dict
+        (minRow, maxRow, minCol, maxCol) indices on the parent's grid,
+        keyed by flag; flags with no cells on the parent are omitted.
+    """
+    validCells = np.flatnonzero(np.logical_not(ParentRegion.topoInvalid))
+    if ParentRegion.topoIDs is not None:
+        cellIDs = ParentRegion.topoIDs.ravel().take(validCells)
+    else:
+        cellIDs = ParentRegion.topoData.ravel().take(validCells)
+    order = np.argsort(cellIDs, kind='mergesort')
+    cellIDs = cellIDs.take(order)
+    validCells = validCells.take(order)
+    
+    flags = np.array(RegFlags, dtype=cellIDs.dtype)
+    starts = np.searchsorted(cellIDs, flags, side='left')
+    stops = np.searchsorted(cellIDs, flags, side='right')
+    
+    indexBounds = {}
+    for (flag, start, stop) in zip(RegFlags, starts, stops):
+        if stop == start:
+            continue
+        rows = validCells[start:stop] // ParentRegion.numLons
+        cols = validCells[start:stop] % ParentRegion.numLons
+        indexBounds[flag] = (rows.min(), rows.max(), cols.min(), cols.max())
+    return indexBounds
+
+def buildSubRegions(ParentRegion, RegFlags, RegionNames=None,
+                    RegionType=None):
+    """
+    Construct several SubRegions of a parent region at once.
+    
+    The subregions' bounding boxes are found together, in one scan of the
+    parent's topo mask (see getSubRegionIndexBounds()), rather than in one
+    scan per subregion.
+    
+    Parameters
+    ----------
+    ParentRegion : Region
+        Parent Region instance.
+    RegFlags : list
+        Identifying flags of the subregions.
+    RegionNames : list
+        Names of the subregions, in the order of RegFlags; default value
+        of None results in each name being set to 'NONE'.
+    RegionType : string
+        Type of regionalisation used to construct the subregions.
+    
+    Returns
+    -------
+    list
+        SubRegion instances, in the order of RegFlags.
+    """
+    if RegionNames is None:
+        RegionNames = [None] * len(RegFlags)
+    indexBounds = getSubRegionIndexBounds(ParentRegion, RegFlags)
+    return [SubRegion(ParentRegion, flag, RegionName=name,
+                      RegionType=RegionType, IndexBounds=indexBounds[flag])
+            for (flag, name) in zip(RegFlags, RegionNames)]
@@ -6,13 +6,16 @@ and thus thes operations involve both file input and computation.
 
 import sys
 import os
+import multiprocessing
+from multiprocessing.pool import ThreadPool
 
 import numpy as np
 import numpy.ma as ma
 
 import awapIO as aio
 
-def computeContinentalAverageTimeseries(FileList, Directory=None):
+def computeContinentalAverageTimeseries(FileList, Directory=None,
+                                        NumThreads=None):
     """
     Compute a timeseries of continental averages from a time-ordered FileList.
     
@@ -25,14 +28,18 @@ def computeContinentalAverageTimeseries(FileList, Directory=None):
         List of chronologically-ordered input data files.
     Directory : string
         Location of data files; if None specified uses current working directory.
+    NumThreads : int
+        Number of threads among which the files are shared; value None uses
+        one per CPU.
     """
     
     """
-    Change working directory (if supplied), otherwise input files from current
-    working directory.
+    Input files from Directory (if supplied), otherwise from the current
+    working directory.  Paths are joined to Directory rather than changing
+    the (process-wide) working directory.
     """
-    if Directory is not None:
-        os.chdir(Directory)
+    if Directory is None:
+        Directory = os.curdir
 
     numTimes = len(FileList)
     if numTimes == 0:
@@ -40,19 +47,20 @@ def computeContinentalAverageTimeseries(FileList, Directory=None):
         sys.exit()
     
     """
-    Creat numpy arrays to hold timeseries.  For now, return time coordinate as
-    an integer in YYYYMMDD format because it is trivial to take off of the file
-    name.  Both arrays are native floating-point.
+    Create numpy arrays to hold timeseries.  The time coordinate is the Julian
+    date of each file, which falls on a half day, so both arrays are
+    double-precision floating-point.  Every element is set below, so the
+    arrays are left uninitialised.
     """
-    times = np.ndarray((numTimes))
-    averages = np.ndarray((numTimes))
+    times = np.empty(numTimes, dtype=np.float64)
+    averages = np.empty(numTimes, dtype=np.float64)
     
     """
     Input header from first file.  Big--but legitimate--assumption:  this header
     is valid for all subsequent files; that is, the supplied FileList are self-
     consistent in domain size and layout.
     """
-    hdrFile = FileList[0] + aio.headerFilenameExt
+    hdrFile = os.path.join(Directory, FileList[0] + aio.headerFilenameExt)
     headerDict = aio.readAWAP_hdr(hdrFile)
     
     """
@@ -62,15 +70,55 @@ def computeContinentalAverageTimeseries(FileList, Directory=None):
     """
     areaWeights = aio.getAreaWeights(headerDict)
     
+    """
+    The topography mask is taken to be the same for every file.  Pick
+    out the unmasked cells of the first file, and their weights, once;
+    each average is then a dot product over those cells.  The weights
+    are held as contiguous single-precision values, matching the .flt
+    data, so that the dot product is a single-precision BLAS call with
+    no conversion of each field to double precision.
+    """
+    def fltFileName(File):
+        return os.path.join(Directory, File + aio.floatFilenameExt)
+    
+    firstField = aio.readAWAP_flt(headerDict, fltFileName(FileList[0]))
+    validCells = np.flatnonzero(np.logical_not(ma.getmaskarray(firstField)))
+    validWeights = areaWeights.ravel().take(validCells).astype(np.float32)
+    sumWeights = validWeights.sum(dtype=np.float64)
+    
+    """
+    Only the values of the valid cells are needed from subsequent files,
+    so read them as raw data, without building a masked array.
+    """
+    fltDtype = aio.getFltDtype(headerDict)
+    def readValidValues(File):
+        return np.fromfile(fltFileName(File), dtype=fltDtype).take(
+            validCells).astype(np.float32, copy=False)
+    
+    def averageFile(File):
+        return np.dot(readValidValues(File), validWeights) / sumWeights
+    
     """
     Process the files, computing a timeseries masked area-weighted averages.
+    Each file contributes one average, independently of the others, so the
+    files are shared among a pool of threads:  reading a file and the NumPy
+    operations on it release the GIL.  The pool returns the averages in the
+    order of FileList.
     """
-    timeInd = 0
-    for file in FileList:
-        fltFile = file + aio.floatFilenameExt
+    for (timeInd, file) in enumerate(FileList):
         times[timeInd] = aio.getJulianDate(file)
-        fieldSlice = aio.readAWAP_flt(headerDict, fltFile)
-        averages[timeInd] = ma.average(fieldSlice, weights=areaWeights)
-        timeInd += 1
+    
+    averages[0] = np.dot(ma.getdata(firstField).ravel().take(
+        validCells).astype(np.float32, copy=False), validWeights) / sumWeights
+    
+    if NumThreads is None:
+        NumThreads = multiprocessing.cpu_count()
+    NumThreads = max(1, min(NumThreads, numTimes - 1))
+    pool = ThreadPool(NumThreads)
+    try:
+        averages[1:] = pool.map(averageFile, FileList[1:])
+    finally:
+        pool.close()
+        pool.join()
     
     return times, averages
@@ -2,13 +2,235 @@
 
 '''
 import sys
+import os
+import copy
 import math
+import json
+import hashlib
+import multiprocessing
+from multiprocessing.pool import ThreadPool
 
 import numpy as np
 import numpy.ma as ma
+try:
+    from numba import njit
+except ImportError:
+    njit = None
 
 import awapIO as aio
 
+if njit is not None:
+    @njit(nogil=True)
+    def ingestSlice(Raw, Dest, Mask, MissingBits, Swap):
+        """
+        Compiled single pass over a raw float file slice:  byte swap (if Swap)
+        each 32-bit word of Raw into Dest, and flag the words equal to the
+        missing data flag's bits in Mask.  Dest and Mask are flat views of
+        the block being filled; the GIL is released, so reader threads run
+        it concurrently.
+        """
+        for i in range(Raw.shape[0]):
+            v = Raw[i]
+            if Swap:
+                v = (((v & 0xFF) << 24) | ((v & 0xFF00) << 8) |
+                     ((v >> 8) & 0xFF00) | ((v >> 24) & 0xFF))
+            Dest[i] = v
+            Mask[i] = v == MissingBits
+
+def transposeSlices(Slices, Dest, Tile=32):
+    """
+    Copy a (t, x, y) stack of time slices into an (x, y, t) array.
+    
+    Where both arrays allow it, the two spatial dimensions are folded into
+    one, so the copy is a 2D (t, xy) -> (xy, t) transpose, done in runs of
+    Tile * Tile grid points.  Otherwise the copy is done in Tile x Tile
+    spatial tiles.  Either way, the source rows and destination time runs
+    touched by each step stay in cache, rather than striding through the
+    whole of both arrays at once.
+    
+    Parameters
+    ----------
+    
+    Slices : numpy array (3D)
+        Time slices, indexed (t, x, y).
+    
+    Dest : numpy array (3D)
+        Destination, indexed (x, y, t); may be a view of a larger array.
+    
+    Tile : int
+        Edge length of the spatial tiles (default 32).
+    """
+    nt, nx, ny = Slices.shape
+    
+    # Setting the shape of a view raises AttributeError, rather than
+    # copying, if the dimensions cannot be folded in place.
+    try:
+        flat_slices = Slices.view()
+        flat_slices.shape = (nt, nx * ny)
+        flat_dest = Dest.view()
+        flat_dest.shape = (nx * ny, nt)
+    except AttributeError:
+        flat_dest = None
+    
+    if flat_dest is not None:
+        run = Tile * Tile
+        for p0 in range(0, nx * ny, run):
+            flat_dest[p0:p0 + run, :] = flat_slices[:, p0:p0 + run].T
+        return
+    
+    for x0 in range(0, nx, Tile):
+        for y0 in range(0, ny, Tile):
+            Dest[x0:x0 + Tile, y0:y0 + Tile, :] = \
+                Slices[:, x0:x0 + Tile, y0:y0 + Tile].transpose(1, 2, 0)
+
+class LazyCube(object):
+    """
+    LazyCube:  a read-on-demand (x, y, t) view of a time-ordered set of
+    float files.
+    
+    Only the rows of each time slice spanned by an index are read, and
+    each file is opened just for the read, so no file descriptors are held
+    between reads (holding one per file, as a memory map would, exhausts
+    the process limit, typically 1024, on long daily records).  Indexing
+    with a tuple of (x, y, t) indices or slices returns a masked array, as
+    indexing a DataCube's data would.
+    """
+    
+    def __init__(self, FltFiles, SliceShape, Dtype, MissingFlag):
+        """
+        Create a new LazyCube instance.
+        
+        Parameters
+        ----------
+        
+        FltFiles : List
+            Float files holding the time slices, in time order.
+        
+        SliceShape : tuple
+            (x, y) shape of each time slice.
+        
+        Dtype : numpy dtype
+            Data type, including byte order, of the float files.
+        
+        MissingFlag : float
+            Missing data flag value.
+        """
+        self.flt_files = list(FltFiles)
+        self.dtype = np.dtype(Dtype)
+        self.shape = tuple(SliceShape) + (len(FltFiles),)
+        self.ndim = 3
+        self.missing_data_flag = MissingFlag
+    
+    def __getitem__(self, Index):
+        """
+        Read and mask the indexed part of the cube.
+        """
+        if not isinstance(Index, tuple):
+            Index = (Index,)
+        Index = Index + (slice(None),) * (3 - len(Index))
+        x_index, y_index, t_index = Index
+        
+        # Read the span of rows holding the indexed x, and index within it.
+        rows = np.arange(self.shape[0])[x_index]
+        x0 = int(rows.min()) if rows.size > 0 else 0
+        x1 = int(rows.max()) + 1 if rows.size > 0 else 0
+        rows = rows - x0
+        
+        def readSlice(T):
+            block = self.read_rows(self.flt_files[T], x0, x1)
+            if isinstance(x_index, slice):
+                return block[rows][:, y_index]
+            return block[rows, y_index]
+        
+        steps = np.arange(self.shape[2])[t_index]
+        if np.ndim(steps) == 0:
+            data = readSlice(steps)
+        else:
+            data = np.stack([readSlice(t) for t in steps], axis=-1)
+        return aio.maskMissing(data, self.missing_data_flag)
+    
+    def read_rows(self, FltFile, X0, X1):
+        """
+        Returns rows X0 to X1 (exclusive) of a float file's time slice.
+        """
+        ny = self.shape[1]
+        with open(FltFile, 'rb') as f:
+            f.seek(X0 * ny * self.dtype.itemsize)
+            block = np.fromfile(f, dtype=self.dtype, count=(X1 - X0) * ny)
+        return block.reshape(X1 - X0, ny)
+
+class QuantizedCube(object):
+    """
+    QuantizedCube:  an (x, y, t) cube held as 16-bit integers.
+    
+    Values in a known range are stored as rint((value - offset) / scale),
+    in half the memory of float32 data; missing values are stored as
+    aio.int16MissingFlag.  Indexing with a tuple of (x, y, t) indices or
+    slices returns a dequantized float32 masked array, as indexing a
+    DataCube's data would.
+    """
+    
+    def __init__(self, Data, Mask, MinVal, MaxVal, MissingFlag):
+        """
+        Create a new QuantizedCube instance.
+        
+        Parameters
+        ----------
+        
+        Data : numpy array (3D)
+            Cube data, indexed (x, y, t).
+        
+        Mask : numpy array (3D)
+            Missing data mask of Data.
+        
+        MinVal : float
+            Smallest value to represent; smaller values are clipped.
+        
+        MaxVal : float
+            Largest value to represent; larger values are clipped.
+        
+        MissingFlag : float
+            Missing data flag value, the fill value of indexed data.
+        """
+        # The range maps onto -32767..32767; -32768 flags missing data.
+        self.scale = (float(MaxVal) - float(MinVal)) / 65534.0
+        self.offset = 0.5 * (float(MinVal) + float(MaxVal))
+        self.shape = Data.shape
+        self.ndim = 3
+        self.missing_data_flag = MissingFlag
+        
+        # Quantize a few rows at a time, so the float temporary stays small.
+        self.quantized = np.empty(Data.shape, dtype=np.int16)
+        rows = np.empty((min(32, Data.shape[0]),) + Data.shape[1:],
+                        dtype=np.float32)
+        for x0 in range(0, Data.shape[0], rows.shape[0]):
+            x1 = min(x0 + rows.shape[0], Data.shape[0])
+            q = rows[:x1 - x0]
+            np.subtract(Data[x0:x1], self.offset, out=q)
+            q /= self.scale
+            np.rint(q, out=q)
+            np.clip(q, -32767, 32767, out=q)
+            self.quantized[x0:x1] = q
+            self.quantized[x0:x1][Mask[x0:x1]] = aio.int16MissingFlag
+    
+    def dequantize(self, Quantized):
+        """
+        Returns quantized values as a new float32 array, ignoring the mask.
+        """
+        data = Quantized.astype(np.float32)
+        data *= np.float32(self.scale)
+        data += np.float32(self.offset)
+        return data
+    
+    def __getitem__(self, Index):
+        """
+        Dequantize and mask the indexed part of the cube.
+        """
+        quantized = self.quantized[Index]
+        return ma.MaskedArray(self.dequantize(quantized),
+                              mask=np.equal(quantized, aio.int16MissingFlag),
+                              fill_value=self.missing_data_flag)
+
 class DataCube(object):
     """
     DataCube:  a 3D collection--2D Space-like/1D Time-like--of field data.
@@ -18,8 +240,13 @@ class DataCube(object):
     that allow the user to reorder data to any desired storage order.
     """
     
+    # Number of time slices read, transposed and masked at a time.
+    blockSize = 16
+    
     def __init__(self, DataPath, FieldName, SampleType='mth',
-                 StartDate=None, EndDate=None, CycleFilter=None):
+                 StartDate=None, EndDate=None, CycleFilter=None, Lazy=False,
+                 NumThreads=None, CachePath=None, NcPath=None,
+                 Quantize=None, UseNaN=False):
         """
         Create a new DataCube instance.
         
@@ -44,6 +271,38 @@ class DataCube(object):
         CycleFilter : string or List
             Seasonal (e.g., 'DJF') or Monthly (e.g., 'Jan') filter.
         
+        Lazy : bool
+            If True, leave the source files unread until they are indexed;
+            data is then a LazyCube, which reads only the parts of the
+            files that are indexed (default False).
+        
+        NumThreads : int
+            Number of threads reading source files concurrently (default
+            None, one per CPU, up to the number of files read per block).
+        
+        CachePath : string
+            Directory in which to keep a .npy copy of the cube, memory-mapped
+            by later DataCubes built from the same files instead of reading
+            them again (default None, no caching).  Remove the copy if the
+            source files change.
+        
+        NcPath : string
+            NetCDF store of the field, built by netCDFStore.buildNetCDFStore(),
+            from which the cube is read instead of the source files (default
+            None, read the source files).  Lazy is ignored for stores.
+        
+        Quantize : tuple
+            (MinVal, MaxVal) physical range of the field (e.g., a colour
+            table's minVal and maxVal).  If given, the cube is held as 16-bit
+            integers; data is then a QuantizedCube, dequantized as indexed
+            (default None, float32 data).  Ignored for lazy cubes.
+        
+        UseNaN : bool
+            If True, data is a plain float32 array with NaN at missing
+            points, for NaN-aware reductions such as np.nanmean(), rather
+            than a masked array (default False).  Ignored for lazy and
+            quantized cubes.
+        
         Returns
         -------
         DataCube
@@ -54,57 +313,71 @@ class DataCube(object):
         self.source_dir = DataPath + '/' + FieldName
         
 
-        # Grab all files in source directory.
-        all_files = aio.getFileList(self.source_dir)
+        # Grab all files in source directory, or the names of the files a
+        # NetCDF store was built from; either way they are filtered alike.
+        store = None
+        if NcPath is None:
+            all_files = aio.getFileList(self.source_dir)
+        else:
+            import netCDF4
+            store = netCDF4.Dataset(NcPath, 'r')
+            store.set_auto_maskandscale(False)
+            all_files = store.getncattr('source_files').split('\n')
 
         
-        # Eliminate from all_files files not of the prescribed SampleType.
-        sample_files = aio.filterBySamplingInterval(all_files, SampleType)
+        # Filter all_files with boolean masks over arrays of their sampling
+        # intervals and dates, keeping files of the prescribed SampleType,
+        # within the StartDate/EndDate bounds (if any), and in the months of
+        # the CycleFilter (if any).  Each file's name is parsed once (dates
+        # are cached), and the kept files are gathered in date order with a
+        # single stable argsort.
+        self.cycle_filter = None
+        cycle_months = None
+        if CycleFilter is not None:
+            if aio.is_a_Month(CycleFilter):
+                self.cycle_filter = CycleFilter
+                cycle_months = [aio.MonthAbbrToNum[CycleFilter.lower()]]
+            elif aio.is_a_Season(CycleFilter):
+                self.cycle_filter = CycleFilter
+                cycle_months = [aio.MonthAbbrToNum[month] for month in
+                                aio.seasonToMonths(CycleFilter)]
         
-        # Set collection start and end dates based on argument values (or lack thereof).
-        first_date = aio.getEarliestDate(sample_files)
-        last_date = aio.getLatestDate(sample_files)
-        if StartDate is None:
-            my_start = first_date
-        else:
-            my_start = StartDate
-        if EndDate is None:
-            my_end = last_date
-        else:
-            my_end = EndDate
-
-
-        # Filter accordingly by these time bounds.
-        sample_files = aio.filterByDateRange(sample_files, my_start,
-                                             my_end)
+        # Only files of the SampleType are dated, in case others are not.
+        kept = np.flatnonzero(np.fromiter(
+            (aio.getDataSamplingInterval(fn) == SampleType for fn in all_files),
+            dtype=bool, count=len(all_files)))
+        ymds = np.fromiter((aio.getDate(all_files[i]) for i in kept),
+                           dtype=np.int32, count=kept.size)
+        keep = np.ones(kept.size, dtype=bool)
+        if StartDate is not None:
+            keep &= (ymds >= int(StartDate))
+        if EndDate is not None:
+            keep &= (ymds <= int(EndDate))
+        if cycle_months is not None:
+            keep &= np.in1d((ymds // 100) % 100, cycle_months)
         
         # Sort files chronologically by YYYYMMDD date.
-        sample_files = aio.sortByDate(sample_files)
+        kept = kept[keep][np.argsort(ymds[keep], kind='mergesort')]
+        sample_files = [all_files[i] for i in kept]
         
-
-        # Filter by portion of seasonal cycle if applicable.
-        if CycleFilter is None:
-            self.cycle_filter = None
-        else:
-            if aio.is_a_Month(CycleFilter) or aio.is_a_Season(CycleFilter):
-                self.cycle_filter = CycleFilter
-                if aio.is_a_Month(CycleFilter):
-                    sample_files = aio.filterByMonthName(
-                        sample_files, CycleFilter)
-                else:
-                    sample_files = aio.filterBySeason(
-                        sample_files, CycleFilter)
+        # A season filter further trims the (short) list of the season's
+        # months to whole seasons.
+        if self.cycle_filter is not None and aio.is_a_Season(CycleFilter):
+            sample_files = aio.filterBySeason(sample_files, CycleFilter)
         
         self.sample_files = sample_files
         
         # The seasonal filtering preserves chronological ordering in the List
         # sample_files.  Now, pick off the start and end dates from this list
         # and store them in the instance.
-        self.start_date = int(aio.getYMD(sample_files[0]))
-        self.end_date = int(aio.getYMD(sample_files[-1]))
-        
-        # Build a list of time stamps for the ordered file data.
-        self.times = [int(aio.getYMD(fn)) for fn in sample_files]
+        #
+        # Build an array of YYYYMMDD time stamps for the ordered file data;
+        # the dates were parsed (and cached) while filtering, so this is a
+        # lookup per file.
+        self.times = np.fromiter((aio.getDate(fn) for fn in sample_files),
+                                 dtype=np.int32, count=len(sample_files))
+        self.start_date = int(self.times[0])
+        self.end_date = int(self.times[-1])
         
         # At this point we have a chronologically-ordered, time-window-restricted,
         # and seasonal-cycle-restricted (if applicable), set of filenames for
@@ -113,8 +386,14 @@ class DataCube(object):
         # Open first header file to get description of contents of first float
         # file.  Operate on the assumption that all other float files will be
         # laid out identically with this first one.
-        header = self.source_dir + '/' + sample_files[0] + '.hdr'
-        file_layout = aio.readAWAP_hdr(header)
+        # A store records the common layout in its global attributes.
+        if store is None:
+            header = self.source_dir + '/' + sample_files[0] + '.hdr'
+            file_layout = aio.readAWAP_hdr(header)
+        else:
+            file_layout = dict((key, store.getncattr(key)) for key in
+                               ['nrows', 'ncols', 'xllcorner', 'yllcorner',
+                                'cellsize', 'nodata_value'])
         
         self.nlats = file_layout['nrows']
         self.nlons = file_layout['ncols']
@@ -125,28 +404,330 @@ class DataCube(object):
         self.missing_data_flag = file_layout['nodata_value']
         self.source_files = sample_files
         
-        # Now, correct the earlier stored start/end dates to reflect
-        # actual files loaded.
-        # 
-        # Create data_cube array.  Since we are reading time slices, set
-        # the time index as the slowest-varying index.  This optimizes
-        # read/load speeds.  Getting the data_cube into a different
-        # storage order will require a numpy transpose() call.
-        self.data = np.ndarray((self.ntimes, self.nlats, self.nlons),
-                               dtype='float32')
-        
-        # Read in individual files--which have been chronologically ordered--and
-        # load into the data_cube.ma
-        curr_step = 0
-                
-        for fn in sample_files:
-            curr_hdr_file = self.source_dir + '/' + fn + '.hdr'
-            curr_header = aio.readAWAP_hdr(curr_hdr_file)
-            self.data[curr_step, :, :] = aio.readAWAP_flt(curr_header)
-            curr_step += 1
-        
-        self.data = np.transpose(self.data, (1, 2, 0))
-        self.data = ma.masked_values(self.data, self.missing_data_flag)
+        # A lazy cube keeps the file names; nothing is read until it is indexed.
+        if Lazy and store is None:
+            self.data = LazyCube([self.source_dir + '/' + fn + '.flt'
+                                  for fn in sample_files],
+                                 (self.nlats, self.nlons),
+                                 aio.getFltDtype(file_layout),
+                                 self.missing_data_flag)
+            self.valid_idx = None
+            return
+        
+        # Reuse the cached copy of the cube if there is one; otherwise read
+        # the source files, and cache the cube if asked to.  Cached cubes are
+        # mapped copy-on-write, so the cache file itself is never modified.
+        #
+        # The missing data flag is an exact sentinel value, so the mask is
+        # built by equality with it:  as the source files are read, or in a
+        # single comparison over a cached cube.
+        cache_file = None
+        if CachePath is not None:
+            cache_file = self.getCacheFile(CachePath)
+        self.data = None
+        if cache_file is not None:
+            self.data = self.loadCache(cache_file)
+        if self.data is None:
+            if store is None:
+                self.data, mask = self.readSourceFiles(
+                    aio.getFltDtype(file_layout), NumThreads)
+            else:
+                try:
+                    self.data, mask = self.readStore(store, all_files)
+                finally:
+                    store.close()
+            if cache_file is not None:
+                self.data = self.saveCache(cache_file)
+        else:
+            if store is not None:
+                store.close()
+            mask = np.equal(self.data, np.float32(self.missing_data_flag))
+        
+        # Flat indices of the unmasked data, in (x, y, t) order.
+        self.valid_idx = np.flatnonzero(np.logical_not(mask))
+        
+        # Quantize the cube, releasing the float data; or flag missing data
+        # with NaN; or mask it in place.
+        if Quantize is not None:
+            self.data = QuantizedCube(self.data, mask, Quantize[0],
+                                      Quantize[1], self.missing_data_flag)
+        elif UseNaN:
+            np.copyto(self.data, np.nan, where=mask)
+        else:
+            self.data = ma.MaskedArray(self.data, mask=mask, copy=False,
+                                       fill_value=self.missing_data_flag)
+    
+    def readSourceFiles(self, FltDtype, NumThreads=None):
+        """
+        Read the source files into a new (x, y, t) array.
+        
+        Parameters
+        ----------
+        
+        FltDtype : numpy dtype
+            Data type, including byte order, of the float files.
+        
+        NumThreads : int
+            Number of threads reading files concurrently; see __init__().
+        
+        Returns
+        -------
+        tuple
+            The unmasked cube data, and its missing data mask, both (x, y, t)
+            arrays.
+        """
+        sample_files = self.source_files
+        
+        # Read in individual files--which have been chronologically ordered--in
+        # blocks.  All files are laid out as the first, so their headers are
+        # not read; each float file is read raw, in the first header's byte
+        # order.
+        slice_size = self.nlats * self.nlons
+        
+        # NumPy releases the GIL while reading, so the files of a block are
+        # read concurrently; each thread fills its own slice of the buffers.
+        #
+        # With Numba, each slice is read as raw 32-bit words, which are byte
+        # swapped into the block and compared with the missing data flag in
+        # one compiled pass; otherwise NumPy converts the byte order as the
+        # slice is copied into the block, and then builds its mask.
+        missing_flag = np.float32(self.missing_data_flag)
+        missing_bits = missing_flag.view(np.uint32)
+        swap = not np.dtype(FltDtype).isnative
+        
+        def read_block(T0, T1, Block, MaskBlock):
+            def read_slice(Step):
+                flt_file = self.source_dir + '/' + sample_files[Step] + '.flt'
+                k = Step - T0
+                if njit is not None:
+                    raw = np.fromfile(flt_file, dtype=np.uint32,
+                                      count=slice_size)
+                    ingestSlice(raw, Block[k].view(np.uint32).ravel(),
+                                MaskBlock[k].ravel(), missing_bits, swap)
+                else:
+                    Block[k] = np.fromfile(
+                        flt_file, dtype=FltDtype, count=slice_size).reshape(
+                            self.nlats, self.nlons)
+                    np.equal(Block[k], missing_flag, out=MaskBlock[k])
+            pool.map(read_slice, range(T0, T1))
+        
+        if NumThreads is None:
+            NumThreads = multiprocessing.cpu_count()
+        NumThreads = max(1, min(NumThreads, self.blockSize, self.ntimes))
+        pool = ThreadPool(NumThreads)
+        try:
+            return self.readBlocks(read_block)
+        finally:
+            pool.close()
+            pool.join()
+    
+    def readStore(self, Store, StoreFiles):
+        """
+        Read the cube's time slices from a NetCDF store into a new (x, y, t)
+        array.
+        
+        Parameters
+        ----------
+        
+        Store : netCDF4.Dataset
+            Open store, built by netCDFStore.buildNetCDFStore().
+        
+        StoreFiles : List
+            Names of the files the store was built from, in store order.
+        
+        Returns
+        -------
+        tuple
+            The unmasked cube data, and its missing data mask, both (x, y, t)
+            arrays.
+        """
+        # Time index in the store of each of the cube's slices; both are in
+        # chronological order, so the indices increase.
+        store_index = dict((fn, t) for (t, fn) in enumerate(StoreFiles))
+        steps = [store_index[fn] for fn in self.source_files]
+        field = Store.variables[self.field_name]
+        
+        # Each read decompresses whole store chunks; reading a block of
+        # consecutive steps at a time touches each chunk about once.
+        missing_flag = np.float32(self.missing_data_flag)
+        
+        def read_block(T0, T1, Block, MaskBlock):
+            Block[...] = field[steps[T0:T1], :, :]
+            np.equal(Block, missing_flag, out=MaskBlock)
+        
+        return self.readBlocks(read_block)
+    
+    def readBlocks(self, ReadBlock):
+        """
+        Assemble the cube from blocks of time slices.
+        
+        Parameters
+        ----------
+        
+        ReadBlock : function
+            Called as ReadBlock(T0, T1, Block, MaskBlock) to fill the (t, x, y)
+            buffer Block with time slices T0 to T1 - 1 of the cube, and
+            MaskBlock with their missing data mask.
+        
+        Returns
+        -------
+        tuple
+            The unmasked cube data, and its missing data mask, both (x, y, t)
+            arrays.
+        """
+        # Create data_cube array directly in its C-contiguous (x, y, t)
+        # storage order, so flat views of the cube need no copy.
+        data = np.empty((self.nlats, self.nlons, self.ntimes),
+                        dtype='float32', order='C')
+        mask = np.empty((self.nlats, self.nlons, self.ntimes),
+                        dtype=bool, order='C')
+        
+        # Writing a single time slice into the cube strides through all of
+        # it, so the slices are read a block at a time into a small (t, x, y)
+        # buffer, which is copied into place tile by tile; each tile then
+        # writes runs of blockSize consecutive times.
+        block_size = self.blockSize
+        block = np.empty((min(block_size, self.ntimes), self.nlats,
+                          self.nlons), dtype='float32')
+        mask_block = np.empty(block.shape, dtype=bool)
+        
+        for t0 in range(0, self.ntimes, block_size):
+            t1 = min(t0 + block_size, self.ntimes)
+            ReadBlock(t0, t1, block[:t1 - t0], mask_block[:t1 - t0])
+            transposeSlices(block[:t1 - t0], data[:, :, t0:t1])
+            transposeSlices(mask_block[:t1 - t0], mask[:, :, t0:t1])
+        
+        return data, mask
+    
+    def cacheMetadata(self):
+        """
+        Returns the description of the cube stored beside its cached copy.
+        """
+        return {'source_dir': self.source_dir,
+                'source_files': self.source_files,
+                'nlats': self.nlats,
+                'nlons': self.nlons,
+                'ntimes': self.ntimes,
+                'missing_data_flag': self.missing_data_flag}
+    
+    def getCacheFile(self, CachePath):
+        """
+        Returns the name of the cached copy of the cube in CachePath.
+        
+        The name is built from the field name and a hash of the source
+        directory and files, so cubes of different fields, date ranges or
+        cycle filters are cached separately.
+        """
+        key = hashlib.sha1('\n'.join([self.source_dir] +
+                                     self.source_files).encode('utf-8'))
+        return os.path.join(CachePath, '%s_%s.npy' % (self.field_name,
+                                                      key.hexdigest()[:12]))
+    
+    def loadCache(self, CacheFile):
+        """
+        Map the cached copy of the cube, if there is a valid one.
+        
+        Returns
+        -------
+        numpy memmap (3D)
+            The unmasked cube data, mapped copy-on-write; None if there is
+            no cached copy matching this cube.
+        """
+        metadata_file = os.path.splitext(CacheFile)[0] + '.json'
+        if not (os.path.exists(CacheFile) and os.path.exists(metadata_file)):
+            return None
+        with open(metadata_file, 'r') as infile:
+            if json.load(infile) != self.cacheMetadata():
+                return None
+        return np.load(CacheFile, mmap_mode='c')
+    
+    def saveCache(self, CacheFile):
+        """
+        Save the cube's data, unmasked, as its cached copy.
+        
+        Returns
+        -------
+        numpy memmap (3D)
+            The cached copy, mapped copy-on-write, to be used in place of
+            the in-memory data.
+        """
+        np.save(CacheFile, self.data)
+        metadata_file = os.path.splitext(CacheFile)[0] + '.json'
+        with open(metadata_file, 'w') as outfile:
+            json.dump(self.cacheMetadata(), outfile)
+        return np.load(CacheFile, mmap_mode='c')
+    
+    def viewByCycle(self, CycleFilter):
+        """
+        Returns a DataCube of the part of this one in a season or month.
+        
+        The time steps are selected from this cube's data, as a DataCube of
+        the same source files and CycleFilter would read them, so one full
+        cube serves any number of seasonal and monthly cubes without reading
+        the files again.
+        
+        Parameters
+        ----------
+        
+        CycleFilter : string
+            Seasonal (e.g., 'DJF') or Monthly (e.g., 'Jan') filter.
+        
+        Returns
+        -------
+        DataCube
+            A DataCube instance holding a copy of the selected time steps
+            (a masked array, or NaN-flagged array for NaN cubes).
+        """
+        if aio.is_a_Month(CycleFilter):
+            cycle_files = aio.filterByMonthName(self.source_files, CycleFilter)
+        elif aio.is_a_Season(CycleFilter):
+            cycle_files = aio.filterBySeason(self.source_files, CycleFilter)
+        else:
+            print 'DataCube.viewByCycle():: ERROR--', CycleFilter, \
+                ' is neither a month nor a season.'
+            sys.exit()
+        
+        # Time step in this cube of each selected file.
+        step = dict((fn, t) for (t, fn) in enumerate(self.source_files))
+        steps = np.array([step[fn] for fn in cycle_files], dtype=np.intp)
+        
+        view = copy.copy(self)
+        view.cycle_filter = CycleFilter
+        view.sample_files = cycle_files
+        view.source_files = cycle_files
+        view.times = self.times[steps]
+        view.start_date = int(view.times[0])
+        view.end_date = int(view.times[-1])
+        view.ntimes = len(cycle_files)
+        view.data = self.data[:, :, steps]
+        if isinstance(view.data, ma.MaskedArray):
+            view.valid_idx = np.flatnonzero(
+                np.logical_not(ma.getmaskarray(view.data)))
+        else:
+            view.valid_idx = np.flatnonzero(
+                np.logical_not(np.isnan(view.data)))
+        return view
+    
+    def validSample(self):
+        """
+        Returns the unmasked data as a new 1D array, in (x, y, t) order.
+        
+        Equivalent to self.data[~self.data.mask], but gathers through the
+        precomputed valid_idx instead of negating and applying the mask.
+        A lazy cube is read in full to gather the sample; a quantized cube's
+        sample is dequantized.
+        
+        Returns
+        -------
+        numpy array (1D)
+            The unmasked values.
+        """
+        if self.valid_idx is None:
+            return ma.compressed(self.data[:, :, :])
+        if isinstance(self.data, QuantizedCube):
+            return self.data.dequantize(
+                np.take(self.data.quantized.ravel(), self.valid_idx))
+        return np.take(ma.getdata(self.data).ravel(), self.valid_idx)
     
     def printAttributes(self, PrintTimes=False, PrintFileList=False):
         """
@@ -175,6 +756,10 @@ class DataCube(object):
         print 'Lower-left domain starting point (Lat,Lon) = (', (self.xllcorner,
                                                                  self.yllcorner), ')'
         print 'Missing data flag value:  ', self.missing_data_flag
+        if self.valid_idx is not None:
+            print 'Number of missing values:  ', (self.nlats * self.nlons *
+                                                 self.ntimes -
+                                                 self.valid_idx.size)
         if(PrintTimes):
             print 20 * '-', ' YYYYMMDD time stamps ', 20 * '-'
             print self.times
@@ -2,6 +2,44 @@
 Directory manipulation tools.
 """
 import os
+import stat
+
+def checkDirectory(Directory, Mode, ModeName):
+    """
+    Check that Directory exists, is a directory, and permits access Mode.
+
+    The directory is stat'ed once, rather than probed by a sequence of
+    os.path.exists(), os.path.isdir() and os.access() calls, each of
+    which is a separate system call--a real cost on networked file
+    systems.
+
+    Parameters
+    ----------
+    Directory : string
+        Pathname of directory.
+    Mode : int
+        Access mode, as for os.access() (e.g., os.R_OK).
+    ModeName : string
+        Description of Mode for messages (e.g., 'readable').
+
+    Returns
+    -------
+    bool
+        True if the directory exists and permits access Mode; False
+        otherwise.
+    """
+    try:
+        st = os.stat(Directory)
+    except OSError:
+        print ':: FATAL--directory ', Directory, ' does not exist.'
+        return False
+    if not stat.S_ISDIR(st.st_mode):
+        print ':: FATAL--file ', Directory, ' exists but is not a directory.'
+        return False
+    if not os.access(Directory, Mode):
+        print ':: FATAL--directory ', Directory, ' exists but is not ' + ModeName + '.'
+        return False
+    return True
 
 def isReadableDir(Directory):
     """
@@ -17,19 +55,7 @@ def isReadableDir(Directory):
     bool
         True (False) if directory exists at the supplied pathname.
     """
-    if os.path.exists(Directory):
-        if os.path.isdir(Directory):
-            if os.access(Directory, os.R_OK):
-                return True
-            else:
-                print ':: FATAL--directory ', Directory, ' exists but is not readable.'
-                return False
-        else:
-            print ':: FATAL--file ', Directory, ' exists but is not a directory.'
-            return False
-    else:
-        print ':: FATAL--directory ', Directory, ' does not exist.'
-        return False
+    return checkDirectory(Directory, os.R_OK, 'readable')
 
 def isWriteableDirectory(Directory):
     """
@@ -45,19 +71,7 @@ def isWriteableDirectory(Directory):
     bool
         True if directory exists and is user-writable; False otherwise.
     """
-    if os.path.exists(Directory):
-        if os.path.isdir(Directory):
-            if os.access(Directory, os.W_OK):
-                return True
-            else:
-                print ':: FATAL--directory ', Directory, ' exists but is not writeable.'
-                return False
-        else:
-            print ':: FATAL--file ', Directory, ' exists but is not a directory.'
-            return False
-    else:
-        print ':: FATAL--directory ', Directory, ' does not exist.'
-        return False
+    return checkDirectory(Directory, os.W_OK, 'writeable')
 
 def safeMakeDir(Directory):
     """
@@ -73,12 +87,12 @@ def safeMakeDir(Directory):
     bool
         True (False) for success (failure).
     """
-    if os.path.exists(Directory):
-        if os.path.isdir(Directory):
-            return True
-        else:
-            print ':: FATAL--file ', Directory, ' exists but is not a directory.'
-            return False
-    else:
+    try:
+        st = os.stat(Directory)
+    except OSError:
         os.makedirs(Directory)
         return True
+    if stat.S_ISDIR(st.st_mode):
+        return True
+    print ':: FATAL--file ', Directory, ' exists but is not a directory.'
+    return False
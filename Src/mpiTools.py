@@ -0,0 +1,135 @@
+"""
+mpiTools.py:  MPI helpers shared by the parallel applications.
+
+This module supports the following operations:
+
+1) Reduction of per-rank profile timers to a single summary on the
+root, so that one report is printed rather than one per rank.
+
+2) Reading AWAP/BIOS2 float (.flt) files through MPI-IO, so that the
+MPI library's parallel file system hints apply.
+"""
+
+"""
+NumPy.
+"""
+import numpy as np
+
+"""
+MPI.
+"""
+from mpi4py import MPI
+
+"""
+AWAP/BIOS2 file I/O.
+"""
+import awapIO as aio
+
+"""
+Default MPI-IO hints for reading .flt files:  enable collective
+buffering for reads, and use 1 MiB file system stripes.
+"""
+defaultReadHints = {'romio_cb_read': 'enable',
+                    'striping_unit': '1048576'}
+
+def reduceProfile(Comm, Profile, Root=0):
+    """
+    Combine per-rank profile timers on the root.
+
+    Parameters
+    ----------
+    Comm : mpi4py.MPI.Comm
+        Communicator over which to reduce.
+    Profile : list of tuples
+        (label, times) pairs, where times is a list of the timings of
+        each operation of that kind on this rank.  Every rank must
+        supply the same labels in the same order.
+    Root : int
+        Rank on which to collect the summary.
+
+    Returns
+    -------
+    list of tuples
+        On the root, (label, total time, number of operations, maximum
+        per-rank time) for each entry of Profile; None on other ranks.
+    """
+    local = np.array([[sum(times), len(times)] for (label, times) in Profile],
+                     dtype=np.float64)
+    totals = np.zeros_like(local)
+    maxima = np.zeros_like(local)
+    Comm.Reduce(local, totals, op=MPI.SUM, root=Root)
+    Comm.Reduce(local, maxima, op=MPI.MAX, root=Root)
+    if Comm.Get_rank() != Root:
+        return None
+    return [(label, totals[i,0], int(totals[i,1]), maxima[i,0])
+            for i, (label, times) in enumerate(Profile)]
+
+def printProfile(AppName, Summary, NumPEs):
+    """
+    Print a profile summary from reduceProfile().
+
+    Parameters
+    ----------
+    AppName : string
+        Name of the application, used to prefix each line.
+    Summary : list of tuples
+        Summary returned by reduceProfile() on the root.
+    NumPEs : int
+        Number of ranks contributing to the summary.
+    """
+    print AppName,':: Profile summary over',NumPEs,'ranks:'
+    for (label, total, numOps, maxRank) in Summary:
+        timePerOp = total / float(max(1, numOps))
+        print AppName,'::',label,':: Total Time = ',total,' s., Max Time on a rank = ',maxRank,' s.'
+        print AppName,'::',label,':: Number of Operations = ',numOps,' with time/op of ',timePerOp,' s.'
+
+def readAWAP_flt(HeaderDict, FileName=None, Comm=MPI.COMM_SELF, Hints=None):
+    """
+    Returns a 2D NumPy masked array from a .flt file, read via MPI-IO.
+
+    The read is collective over Comm; every rank of Comm receives the
+    whole field.  With the default, MPI.COMM_SELF, each rank reads
+    independently, but still through MPI-IO and its hints.
+
+    Parameters
+    ----------
+    HeaderDict : dict
+        Domain and data layout information
+
+    FileName : string
+        Name of file from which the field data is read;
+        value None leads to use of automatically-generated
+        filename based on header dictionary information.
+
+    Comm : mpi4py.MPI.Comm
+        Communicator over which the read is collective.
+
+    Hints : dict
+        MPI-IO hints; None uses defaultReadHints.
+
+    Returns
+    -------
+    numpy masked array (2D)
+    """
+    if FileName == None:
+        fileName = HeaderDict['fileNameStem'] + aio.floatFilenameExt
+    else:
+        fileName = FileName
+    if Hints is None:
+        Hints = defaultReadHints
+
+    info = MPI.Info.Create()
+    for key in Hints:
+        info.Set(key, Hints[key])
+    fltFile = MPI.File.Open(Comm, fileName, MPI.MODE_RDONLY, info)
+    fieldData = np.empty((HeaderDict['nrows'], HeaderDict['ncols']),
+                         dtype=aio.getFltDtype(HeaderDict))
+    fltFile.Read_all(fieldData)
+    fltFile.Close()
+    info.Free()
+
+    """
+    Retrieve missing data flag, apply to array to create masked array.
+    """
+    missingFlag = HeaderDict['nodata_value']
+    return aio.maskMissing(fieldData, missingFlag)
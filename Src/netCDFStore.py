@@ -0,0 +1,132 @@
+"""
+netCDFStore.py:  Consolidated NetCDF-4 stores of AWAP/BIOS2 fields
+
+An AWAP/BIOS2 field is held as one .hdr/.flt file pair per time step,
+thousands of files in all.  This module supports the following
+operations:
+
+1) Conversion of a field's files into a single NetCDF-4 file, chunked
+along time and compressed, which DataCube reads (NcPath argument) in
+place of the files.
+
+Usage:  python netCDFStore.py DataPath FieldName StoreFile [SampleType]
+"""
+
+from __future__ import print_function
+
+"""
+System and standard library modules.
+"""
+import sys
+
+"""
+NumPy.
+"""
+import numpy as np
+
+"""
+NetCDF-4.
+"""
+import netCDF4
+
+"""
+AWAP/BIOS2 file I/O.
+"""
+import awapIO as aio
+
+"""
+Header keys recorded as global attributes of a store.
+"""
+storeLayoutKeys = ['nrows', 'ncols', 'xllcorner', 'yllcorner', 'cellsize',
+                   'nodata_value']
+
+def buildNetCDFStore(DataPath, FieldName, StoreFile, SampleType='mth',
+                     ChunkTimes=12, CompLevel=4):
+    """
+    Write all of a field's files of one sampling interval to a NetCDF store.
+
+    The field is stored as a (time, lat, lon) float32 variable named after
+    the field, in chunks of ChunkTimes whole time slices, deflated with the
+    shuffle filter.  The names of the source files, in time order, are kept
+    in the 'source_files' global attribute, so that DataCube can select
+    from the store by the same date and cycle filters as from the files.
+
+    Parameters
+    ----------
+    DataPath : string
+        The root directory for a multivariate data collection.
+    FieldName : string
+        Name of field, univariate subdirectory within data collection.
+    StoreFile : string
+        Name of the NetCDF file to write.
+    SampleType : string
+        Sampling interval of the files to store (default 'mth').
+    ChunkTimes : int
+        Number of time slices per chunk (default 12, a year of months).
+    CompLevel : int
+        Deflate compression level, 1-9 (default 4).
+    """
+    sourceDir = DataPath + '/' + FieldName
+    sourceFiles = aio.sortByDate(aio.filterBySamplingInterval(
+        aio.getFileList(sourceDir), SampleType))
+    if len(sourceFiles) == 0:
+        print('netCDFStore :: no', SampleType, 'files in', sourceDir)
+        sys.exit()
+
+    """
+    All files are assumed laid out as the first.
+    """
+    layout = aio.readAWAP_hdr(sourceDir + '/' + sourceFiles[0] +
+                              aio.headerFilenameExt)
+    nlats = layout['nrows']
+    nlons = layout['ncols']
+    ntimes = len(sourceFiles)
+    chunkTimes = max(1, min(ChunkTimes, ntimes))
+
+    store = netCDF4.Dataset(StoreFile, 'w', format='NETCDF4')
+    try:
+        store.createDimension('time', ntimes)
+        store.createDimension('lat', nlats)
+        store.createDimension('lon', nlons)
+        times = store.createVariable('time', 'i4', ('time',))
+        times[:] = np.array([aio.getDate(fn) for fn in sourceFiles],
+                            dtype=np.int32)
+        lats = store.createVariable('lat', 'f8', ('lat',))
+        lats[:] = aio.getLats(layout)
+        lons = store.createVariable('lon', 'f8', ('lon',))
+        lons[:] = aio.getLons(layout)
+        field = store.createVariable(FieldName, 'f4', ('time', 'lat', 'lon'),
+                                     zlib=True, complevel=CompLevel,
+                                     shuffle=True, fill_value=False,
+                                     chunksizes=(chunkTimes, nlats, nlons))
+        field.set_auto_maskandscale(False)
+        for key in storeLayoutKeys:
+            store.setncattr(key, layout[key])
+        store.setncattr('source_files', '\n'.join(sourceFiles))
+
+        """
+        Write a chunk at a time, so that each chunk is compressed once.
+        """
+        fltDtype = aio.getFltDtype(layout)
+        chunk = np.empty((chunkTimes, nlats, nlons), dtype=np.float32)
+        for t0 in range(0, ntimes, chunkTimes):
+            t1 = min(t0 + chunkTimes, ntimes)
+            for t in range(t0, t1):
+                fltFile = sourceDir + '/' + sourceFiles[t] + \
+                    aio.floatFilenameExt
+                chunk[t - t0] = np.fromfile(fltFile, dtype=fltDtype,
+                                            count=nlats * nlons).reshape(
+                                                nlats, nlons)
+            field[t0:t1, :, :] = chunk[:t1 - t0]
+    finally:
+        store.close()
+
+if __name__ == '__main__':
+    if len(sys.argv) < 4:
+        print(__doc__.strip().split('\n')[-1])
+        sys.exit()
+    if len(sys.argv) > 4:
+        buildNetCDFStore(sys.argv[1], sys.argv[2], sys.argv[3],
+                         SampleType=sys.argv[4])
+    else:
+        buildNetCDFStore(sys.argv[1], sys.argv[2], sys.argv[3])
@@ -98,27 +98,13 @@ num_samps = 10000
 samp_times = np.random.randint(0, ntimes, num_samps, dtype='int') 
 samp_lats = np.random.randint(0, nlats, num_samps, dtype='int') 
 samp_lons = np.random.randint(0, nlons, num_samps, dtype='int') 
-identical = np.ndarray((num_samps), dtype='bool')
-diffs = np.ndarray((num_samps), dtype='float32')
-
-identical[:] = (data_cube[samp_times[:], samp_lats[:], samp_lons[:]] == 
-                          perm_data_cube[samp_lats[:], samp_lons[:], samp_times[:]])
-diffs[:] = data_cube[samp_times[:], samp_lats[:], samp_lons[:]] - perm_data_cube[samp_lats[:], samp_lons[:], samp_times[:]]
-
-print 'Results for ',num_samps,'-sample random check for matches in arrays:  ',identical
-print 'Results for ',num_samps,'-sample array element differences:  ',diffs
-
-
-    
-
-    
-
-
-
-
-
-  
-
-
 
+"""
+Gather each sample once from each layout, and summarise the comparison.
+"""
+samps = data_cube[samp_times, samp_lats, samp_lons]
+perm_samps = perm_data_cube[samp_lats, samp_lons, samp_times]
+diffs = samps - perm_samps
 
+print 'Results for ',num_samps,'-sample random check for mismatches in arrays:  ',int(np.count_nonzero(samps != perm_samps))
+print 'Results for ',num_samps,'-sample maximum absolute element difference:  ',np.abs(diffs).max()
@@ -7,6 +7,7 @@ import numpy.ma as ma
 
 import awapIO as aio
 import awapRegion as ar
+import awapColours as acol
 
 import matplotlib.pyplot as plt
 from mpl_toolkits.basemap import Basemap
@@ -79,8 +80,7 @@ Begin plotting process.  First, set up colourMap, which is constant
 for all SubRegions.
 """
 cmapName = fieldName + 'Scale'
-colourDict = aio.readAWAP_ColourTable(colourTablePath,fieldName.lower())
-cMap = cols.LinearSegmentedColormap(cmapName, colourDict)
+cMap = acol.getColourMap(colourTablePath, fieldName, cmapName)
 
 """
 Make each subregion plot.
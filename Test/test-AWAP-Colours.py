@@ -23,6 +23,7 @@ import os.path
 import numpy as np
 
 import awapIO as aio
+import awapColours as acol
 
 import matplotlib
 from matplotlib import pyplot as plt
@@ -132,9 +133,7 @@ if plot:
         """
         Create matplotlib color map
         """
-        colorDict = aio.readAWAP_ColourTable(ColTabPath,fieldNames[fieldInd])
-        cmapName = fieldNames[fieldInd] + 'Scale'
-        cMap = cols.LinearSegmentedColormap(cmapName, colorDict)
+        cMap = acol.getColourMap(ColTabPath, fieldNames[fieldInd])
         """
         Create matplotlib pseudocolor plot.
         """
@@ -163,7 +162,6 @@ if plot:
         if DisplayPlots:
             plt.show()
         """
-        Clean up--clear plot and remove colour scale dictionary.
+        Clean up--clear plot.  The colour map is cached for reuse.
         """
         plt.close()
-        del colorDict
@@ -29,16 +29,20 @@ sample_type = 'mth'
 seasons = aio.SeasonAbbrs
 
 """
-Build seasonal DataCubes from input data.
+Build one DataCube of the whole record from input data, and derive
+the seasonal DataCubes from it, rather than reading each season's
+files separately.
 """
 season_cubes = {}
 print '%s:: Building DataCubes for variable %s...' % (my_name, field_name)
 tstart = time.time()
-for season in seasons:
-    print 'Ingest for season %s...' % season
-    season_cubes[season] = dc.DataCube(data_root, field_name, sample_type,
-                                       CycleFilter=season)
+full_cube = dc.DataCube(data_root, field_name, sample_type)
 print 'Ingest for field %s completed in %s sec.' % (field_name, time.time() - tstart)
+tstart = time.time()
+for season in seasons:
+    print 'Selecting season %s...' % season
+    season_cubes[season] = full_cube.viewByCycle(season)
+print 'Seasonal selection completed in %s sec.' % (time.time() - tstart)
 
 for season in seasons:
     print 80*'%'
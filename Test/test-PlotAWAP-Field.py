@@ -7,6 +7,7 @@ import numpy.ma as ma
 
 import awapIO as aio
 import awapRegion as ar
+import awapColours as acol
 
 import matplotlib.pyplot as plt
 from mpl_toolkits.basemap import Basemap
@@ -70,8 +71,7 @@ Begin plotting process....
 First, set up colourMap.
 """
 cmapName = fieldName + 'Scale'
-colourDict = aio.readAWAP_ColourTable(colourTablePath,fieldName.lower())
-cMap = cols.LinearSegmentedColormap(cmapName, colourDict)
+cMap = acol.getColourMap(colourTablePath, fieldName, cmapName)
 """
 Print the CONAUS bounding box as a check...
 """
@@ -7,9 +7,10 @@ import numpy.ma as ma
 
 import awapIO as aio
 import awapRegion as ar
+import awapColours as acol
+import awapBasemaps as abm
 
 import matplotlib.pyplot as plt
-from mpl_toolkits.basemap import Basemap
 from matplotlib import colors as cols
 
 """
@@ -71,8 +72,7 @@ Begin plotting process.  First, set up colourMap, which is constant
 for all SubRegions.
 """
 cmapName = fieldName + 'Scale'
-colourDict = aio.readAWAP_ColourTable(colourTablePath,fieldName.lower())
-cMap = cols.LinearSegmentedColormap(cmapName, colourDict)
+cMap = acol.getColourMap(colourTablePath, fieldName, cmapName)
 
 """
 Make each subregion plot.
@@ -96,12 +96,11 @@ for sr in subRegions:
     ax.axis('on')
 
     """
-    Create cylindrical projection basemap.
+    Get cylindrical projection basemap.  Full-resolution coastlines
+    are slow to build, so each subregion's basemap is pickled on the
+    first run and loaded by later ones.
     """
-    bMap = Basemap(projection='cyl',llcrnrlat=sr.minLat-2.*sr.dLat, 
-                   urcrnrlat=sr.maxLat+2.*sr.dLat, 
-                   llcrnrlon=sr.minLon-2.*sr.dLon,
-                   urcrnrlon=sr.maxLon+2.*sr.dLon,resolution='f')
+    bMap = abm.getAWAP_Cyl_Basemap(sr, PickleFile=sr.name + '.cyl.Basemap.p')
 
     """
     Pseudocolour plot using supplied masked field data.  The data 
@@ -110,7 +109,7 @@ for sr in subRegions:
     ULC of the cell).  Displace sr.lats/sr.lons accordingly for the 
     lat/lon to basemap coordinate transformation.
     """
-    x, y = bMap(*np.meshgrid(sr.lons-0.5*sr.dLon, sr.lats+0.5*sr.dLat))
+    x, y = sr.getCellCornerXY(bMap)
     im = bMap.pcolor(x, y, maskedSubField, cmap=cMap)
 
     """
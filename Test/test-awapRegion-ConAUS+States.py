@@ -3,7 +3,13 @@ Test code to read in an AWAP continental/state mask, create a
 Region instance for the continent, and SubRegion instances for
 the states.
 """
+from __future__ import print_function
+
+import os
 import sys
+import logging
+import multiprocessing
+from multiprocessing.pool import ThreadPool
 
 import numpy as np
 import numpy.ma as ma
@@ -12,6 +18,27 @@ import awapIO as aio
 import awapRegion as ar
 import awapRegionDefs as ard
 
+"""
+Diagnostics go through logging; AWAP_LOGLEVEL sets the level (default
+DEBUG, everything).
+"""
+logging.basicConfig(level=os.environ.get('AWAP_LOGLEVEL', 'DEBUG'),
+                    format='%(message)s', stream=sys.stdout)
+log = logging.getLogger('test-awapRegion-ConAUS+States')
+
+"""
+Print masks in summary, a few items per edge, rather than in full.
+"""
+np.set_printoptions(threshold=200, edgeitems=2)
+
+"""
+Separator lines for the diagnostics, built once.
+"""
+plusRule = 25*'+'
+hashRule = 50*'#'
+dashRule = 50*'-'
+pctRule = 70*'%'
+
 """
 Set up a dictionary for the AWAP continental mask.
 """
@@ -25,73 +52,144 @@ conAUS = ar.Region(ozDomainDict, RegionName='AUS', RegionType='Continent')
 """
 Create from conAUS a subdomain instance for each state.
 """
-stateNames = ard.StateIDs.keys()
+stateNames = list(ard.StateIDs)
+"""
+Freeze each state's (name, region ID, bounding box) once, in a fixed
+order shared by both constructions below.
+"""
+stateSpecs = tuple((state, ard.StateIDs[state], ard.StateBBoxes[state])
+                   for state in stateNames)
 """
 State SubRegions using predefined BoundingBox.
 """
-stateRegions = []
-for state in stateNames:
-    stateRegions.append(ar.SubRegion(conAUS, 
-                                     ard.StateIDs[state], 
-                                     ard.StateBBoxes[state], 
-                                     RegionName=state, 
-                                     RegionType='State'))
+def buildStateRegion(StateSpec):
+    (name, regionID, bBox) = StateSpec
+    return ar.SubRegion(conAUS, 
+                        regionID, 
+                        bBox, 
+                        RegionName=name, 
+                        RegionType='State')
+"""
+The states are independent, and SubRegion construction only reads
+the parent, so they are built concurrently; NumPy releases the GIL
+for the mask work.
+"""
+pool = ThreadPool(min(len(stateSpecs), multiprocessing.cpu_count()))
+stateRegions = pool.map(buildStateRegion, stateSpecs)
+pool.close()
+pool.join()
 """
 State SubRegions using automatically generated 
-BoundingBox.
-"""
-autoStateRegions = []
-for state in stateNames:
-    autoStateRegions.append(ar.SubRegion(conAUS, 
-                                         ard.StateIDs[state], 
-                                         RegionName=state, 
-                                         RegionType='State'))
-"""
-Print some diagnostics.
-"""
-print 'National, or "Parent" domain information:  '
-conAUS.printSummary()
-print 25*'+',' topoMask: ',25*'+'
-print 'conAUS.topoMask = ',conAUS.topoMask
-print 25*'+',' topoMask: ',25*'+'
-print 50*'#'
-print 'Summary of the state domains (created from hard-wired BBoxes)...'
-print 'States List = ',stateNames
-print 50*'#'
-stateUMPts = 0
-flagSum = 0
-for state in stateRegions:
-    state.printSummary()
-    print 25*'+',' topoMask: ',25*'+'
-    print state.name + '.topoMask = ',state.topoMask
-    print 25*'+',' topoMask: ',25*'+'
-    print 50*'-'
-    stateUMPts += state.numUnmaskedPoints
-    matchingIDs = (conAUS.topoMask == float(state.regionID)).sum()
-    print 'Number of grid points having this state regionID = ',matchingIDs
-    flagSum += matchingIDs
+BoundingBox.  The bounding boxes of all states are found
+together, in one scan of the continental mask.
+"""
+autoStateRegions = ar.buildSubRegions(conAUS,
+                                      [regionID for (name, regionID, bBox)
+                                       in stateSpecs],
+                                      RegionNames=[name for (name, regionID,
+                                                             bBox)
+                                                   in stateSpecs],
+                                      RegionType='State')
+"""
+Count the grid points carrying each region ID in a single pass over
+the continental mask's unmasked cells (region IDs are small
+non-negative integers), rather than rescanning the mask per state.
+The Region's 16-bit integer copy of the IDs is used where it has
+one, rather than the float mask.
+"""
+if conAUS.topoIDs is not None:
+    validIDs = conAUS.topoIDs[np.logical_not(conAUS.topoInvalid)]
+else:
+    validIDs = conAUS.topoData[np.logical_not(
+        conAUS.topoInvalid)].astype(np.intp)
+regionIDCounts = np.bincount(validIDs[validIDs >= 0])
+def countRegionID(RegionID):
+    if 0 <= RegionID < regionIDCounts.size:
+        return int(regionIDCounts[int(RegionID)])
+    return 0
 
-autoStateUMPts = 0
-print 50*'#'
-print 'Summary of the state domains (created from automatic BBoxes)...'
-print 'States List = ',stateNames
-print 50*'#'
-for state in autoStateRegions:
-    state.printSummary()
-    print 25*'+',' topoMask: ',25*'+'
-    print state.name + '.topoMask = ',state.topoMask
-    print 25*'+',' topoMask: ',25*'+'
-    print 50*'-'
-    autoStateUMPts += state.numUnmaskedPoints
-    matchingIDs = (conAUS.topoMask == float(state.regionID)).sum()
-    print 'Number of grid points in conAUS with this state regionID = ',matchingIDs
+"""
+Totals of unmasked grid points over the states, and of the states'
+region IDs on the continental mask.
+"""
+stateUMPts = sum([state.numUnmaskedPoints for state in stateRegions])
+autoStateUMPts = sum([state.numUnmaskedPoints for state in autoStateRegions])
+flagSum = sum([countRegionID(state.regionID) for state in stateRegions])
 
-print 70*'%'
-print 70*'%'
-print 'Total number of unmasked grid points on the conAUS domain:',conAUS.numUnmaskedPoints
-print 'State-by-state sum of unmasked grid points (hard-wired BBoxes):',stateUMPts
-print 'State-by-state sum of unmasked grid points (automatic BBoxes):',autoStateUMPts
-print 'State-by-state sum of unmasked grid points from scanning all of conAUS:',flagSum
+"""
+Print some diagnostics.  Masks are described by a one-line summary
+rather than printed.  Per-region detail is logged at DEBUG level,
+and is neither formatted nor computed when that level is disabled;
+set AWAP_LOGLEVEL=INFO (or WARNING) to keep only the totals.
+"""
+def maskSummary(Region):
+    regionIDs = np.unique(Region.topoData[np.logical_not(Region.topoInvalid)])
+    return 'shape=%s dtype=%s unmasked=%d IDs=%s' % (Region.topoMask.shape,
+                                                     Region.topoMask.dtype,
+                                                     Region.numUnmaskedPoints,
+                                                     regionIDs[:10])
+
+verbose = log.isEnabledFor(logging.DEBUG)
+if verbose:
+    log.debug('National, or "Parent" domain information:  ')
+    conAUS.printSummary()
+    log.debug('%s  topoMask:  %s', plusRule, plusRule)
+    log.debug('conAUS.topoMask:  %s', maskSummary(conAUS))
+    log.debug('%s  topoMask:  %s', plusRule, plusRule)
+    log.debug(hashRule)
+    log.debug('Summary of the state domains (created from hard-wired BBoxes)...')
+    log.debug('States List =  %s', stateNames)
+    log.debug(hashRule)
+for state in stateRegions:
+    matchingIDs = countRegionID(state.regionID)
+    if verbose:
+        state.printSummary()
+        log.debug('%s  topoMask:  %s', plusRule, plusRule)
+        log.debug('%s.topoMask:  %s', state.name, maskSummary(state))
+        log.debug('%s  topoMask:  %s', plusRule, plusRule)
+        log.debug(dashRule)
+        log.debug('Number of grid points having this state regionID =  %d',
+                  matchingIDs)
+    """
+    The state's unmasked points were counted within its bounding box
+    only; fewer than the continental count means the box clips it.
+    """
+    if state.numUnmaskedPoints != matchingIDs:
+        log.warning('%s:  only %d of %d grid points lie within the BBox',
+                    state.name, state.numUnmaskedPoints, matchingIDs)
 
+if verbose:
+    log.debug(hashRule)
+    log.debug('Summary of the state domains (created from automatic BBoxes)...')
+    log.debug('States List =  %s', stateNames)
+    log.debug(hashRule)
+    for state in autoStateRegions:
+        state.printSummary()
+        log.debug('%s  topoMask:  %s', plusRule, plusRule)
+        log.debug('%s.topoMask:  %s', state.name, maskSummary(state))
+        log.debug('%s  topoMask:  %s', plusRule, plusRule)
+        log.debug(dashRule)
+        log.debug('Number of grid points in conAUS with this state regionID =  %d',
+                  countRegionID(state.regionID))
 
+log.info(pctRule)
+log.info(pctRule)
+log.info('Total number of unmasked grid points on the conAUS domain: %d',
+         conAUS.numUnmaskedPoints)
+log.info('State-by-state sum of unmasked grid points (hard-wired BBoxes): %d',
+         stateUMPts)
+log.info('State-by-state sum of unmasked grid points (automatic BBoxes): %d',
+         autoStateUMPts)
+log.info('State-by-state sum of unmasked grid points from scanning all of conAUS: %d',
+         flagSum)
 
+"""
+Cross-check every region ID on the mask against the states, from the
+same single-pass counts.
+"""
+stateIDSet = set([int(state.regionID) for state in stateRegions])
+otherIDs = [regionID for regionID in np.flatnonzero(regionIDCounts)
+            if regionID not in stateIDSet]
+log.info('Region IDs on conAUS not belonging to any state: %s', otherIDs)
+log.info('Number of grid points on conAUS with those IDs: %d',
+         int(regionIDCounts[otherIDs].sum()))